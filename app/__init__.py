@@ -1,4 +1,5 @@
 """App factory para EconQuest (Flask)."""
+import click
 from flask import Flask
 from flask_sqlalchemy import SQLAlchemy
 from flask_migrate import Migrate
@@ -10,65 +11,66 @@ from time import perf_counter
 from flask import g, request
 
 
-db = SQLAlchemy()
+from .replica import RoutingSession
+
+
+db = SQLAlchemy(session_options={"class_": RoutingSession})
 migrate = Migrate()
 login_manager = LoginManager()
 csrf = CSRFProtect()
 jwt = JWTManager()
 
-def create_app(config_object: type = Config) -> Flask:
+def create_app(config_object: type = Config, profile: str = "web") -> Flask:
+    """
+    profile="web": la app completa (blueprints, CSRF, JWT, login, métricas de
+    request, reaper). profile="cli": solo config, BD, migraciones y comandos,
+    para `flask seed`, `flask db ...`, scripts y jobs (ver `get_profile`).
+    """
     app = Flask(__name__, template_folder="templates", static_folder="static")
     app.config.from_object(config_object)
+    app.config["APP_PROFILE"] = profile
+    from . import dbpool
+    dbpool.configure(app)  # antes de crear el engine
     db.init_app(app); migrate.init_app(app, db)
+    from . import replica
+    replica.init_app(app)
+
+    from . import counters
+    counters.register()
+
+    _register_commands(app)
+    if profile == "web":
+        _init_web(app)
+    return app
+
+
+def _init_web(app: Flask) -> None:
     login_manager.init_app(app); csrf.init_app(app); jwt.init_app(app)
     login_manager.login_view = "auth.login"
 
+    @jwt.token_in_blocklist_loader
+    def _jwt_revoked(jwt_header, jwt_payload):
+        # filtro de Bloom en memoria; solo los aciertos consultan la BD
+        from .revocation import is_revoked
+        return is_revoked(jwt_payload)
+
     from .auth.routes import auth_bp
     from .main.routes import main_bp
     from .student.routes import student_bp
     from .teacher.routes import teacher_bp
     from .admin.routes import admin_bp
+    from .api.routes import api_bp
 
     app.register_blueprint(main_bp)
     app.register_blueprint(auth_bp, url_prefix="/auth")
     app.register_blueprint(student_bp, url_prefix="/student")
     app.register_blueprint(teacher_bp, url_prefix="/teacher")
     app.register_blueprint(admin_bp, url_prefix="/admin")
+    app.register_blueprint(api_bp, url_prefix="/api")
 
-
-
-    @app.cli.command("seed")
-    def seed_command():
-        from .seed import run_seed; run_seed(); print("Seed listo.")
-
-    @app.cli.command("reset-db")
-    def reset_db_command():
-        """
-        Dev only: resetea la base.
-        - Si es SQLite, borra el archivo y crea tablas.
-        - Luego corre el seed.
-        """
-        import os
-        from pathlib import Path
-        uri = app.config.get("SQLALCHEMY_DATABASE_URI", "")
-        if uri.startswith("sqlite:///"):
-            db_path = uri.replace("sqlite:///", "")
-            p = Path(db_path)
-            if p.exists():
-                p.unlink()
-            with app.app_context():
-                db.create_all()
-                from .seed import run_seed
-                run_seed()
-            print(f"Base SQLite recreada en {db_path} y seed cargado.")
-        else:
-            # Fallback para otros engines en dev: drop_all/create_all (sin migraciones)
-            with app.app_context():
-                db.drop_all()
-                db.create_all()
-                from .seed import run_seed
-                run_seed()
-            print("Base recreada (drop_all/create_all) y seed cargado.")
+    if not app.testing and app.config.get("START_BACKGROUND_THREADS", True):
+        from .reaper import start_scheduler
+        start_scheduler(app)
 
     @app.before_request
     def _rq_start():
@@ -78,8 +80,8 @@ def create_app(config_object: type = Config) -> Flask:
     def _rq_stop(response):
         """Record duration/status for non-static requests so the admin dashboard can compute p95 & availability."""
         try:
-            # Skip static files and the admin heartbeat to avoid noise
-            if request.path.startswith("/static") or request.endpoint in ("admin.api_ping",):
+            # Skip static files, the admin heartbeat and readiness probes to avoid noise
+            if request.path.startswith("/static") or request.endpoint in ("admin.api_ping", "main.healthz_ready"):
                 return response
 
             t0 = getattr(g, "_rq_t0", None)
@@ -107,5 +109,108 @@ def create_app(config_object: type = Config) -> Flask:
                 pass
         return response
 
-    return app
 
+def _register_commands(app: Flask) -> None:
+    @app.cli.command("seed")
+    @click.option("--scale", type=int, default=0,
+                  help="Además, N unidades de datos sintéticos (10k estudiantes y 100k intentos c/u)")
+    @click.option("--seed", "rng_seed", type=int, default=42, show_default=True, help="Semilla del generador")
+    @click.option("--chunk-size", default=10000, show_default=True)
+    def seed_command(scale, rng_seed, chunk_size):
+        from .seed import run_seed; run_seed(); print("Seed listo.")
+        if scale > 0:
+            import time
+            from .synthetic import generate
+            t0 = time.perf_counter()
+            try:
+                counts = generate(scale, seed=rng_seed, chunk_size=chunk_size)
+            except RuntimeError as e:
+                raise click.ClickException(str(e))
+            print(f"Datos sintéticos (scale={scale}, seed={rng_seed}) en {time.perf_counter() - t0:.0f} s: "
+                  + ", ".join(f"{k}={v}" for k, v in counts.items()))
+
+    @app.cli.command("rescore-activity")
+    @click.argument("activity_id", type=int)
+    @click.option("--chunk-size", default=1000, show_default=True)
+    def rescore_activity_command(activity_id, chunk_size):
+        """Re-califica los intentos de una actividad con su contenido actual."""
+        from .scoring import rescore_activity
+        def report(st):
+            print(f"  {st['processed']}/{st['total']} procesados, {st['changed']} cambiados")
+        st = rescore_activity(activity_id, chunk_size=chunk_size, progress=report)
+        print(f"Re-score listo: {st['changed']} de {st['total']} intentos cambiaron.")
+
+    @app.cli.command("counters-reconcile")
+    def counters_reconcile_command():
+        """Recalcula los contadores del dashboard con COUNT(*) exactos."""
+        from .counters import reconcile
+        counts = reconcile()
+        print("Contadores:", ", ".join(f"{k}={v}" for k, v in counts.items()))
+
+    @app.cli.command("publish-modules")
+    def publish_modules_command():
+        """Crea la versión publicada de los módulos publicados que no la tienen."""
+        from .versions import publish_missing
+        print(f"Módulos publicados: {publish_missing()}")
+
+    @app.cli.command("check-plans")
+    @click.option("--verbose", "-v", is_flag=True, help="Imprime el plan de cada consulta")
+    def check_plans_command(verbose):
+        """EXPLAIN de las consultas calientes; sale con 1 si alguna hace seq scan en una tabla grande."""
+        from .plans import check
+        results = check()
+        for r in results:
+            if r["skipped"]:
+                print(f"  SKIP {r['name']}: {r['skipped']}")
+                continue
+            status = "ok  " if r["ok"] else "FAIL"
+            extra = f" (seq scan en {', '.join(r['seq_scans'])})" if r["seq_scans"] else ""
+            print(f"  {status} {r['name']}{extra}")
+            if verbose or not r["ok"]:
+                for line in r["plan"]:
+                    print(f"         {line}")
+        failed = [r["name"] for r in results if not r["ok"]]
+        if failed:
+            print(f"Planes con seq scan: {', '.join(failed)}")
+            raise SystemExit(1)
+        print("Planes OK.")
+
+    @app.cli.command("reap-sessions")
+    @click.option("--idle-minutes", type=int, default=None, help="Default: SESSION_IDLE_MINUTES")
+    @click.option("--retention-days", type=int, default=None, help="Default: SESSION_RETENTION_DAYS (0 = no borrar)")
+    @click.option("--chunk-size", default=1000, show_default=True)
+    def reap_sessions_command(idle_minutes, retention_days, chunk_size):
+        """Cierra sesiones inactivas, borra las cerradas hace tiempo y los tokens revocados ya vencidos."""
+        from .reaper import reap
+        st = reap(idle_minutes, retention_days, chunk_size)
+        print(f"Sesiones cerradas: {st['closed']}, borradas: {st['purged']}, "
+              f"tokens revocados vencidos: {st['tokens_purged']}")
+
+    @app.cli.command("reset-db")
+    def reset_db_command():
+        """
+        Dev only: resetea la base.
+        - Si es SQLite, borra el archivo y crea tablas.
+        - Luego corre el seed.
+        """
+        import os
+        from pathlib import Path
+        uri = app.config.get("SQLALCHEMY_DATABASE_URI", "")
+        if uri.startswith("sqlite:///"):
+            db_path = uri.replace("sqlite:///", "")
+            p = Path(db_path)
+            if p.exists():
+                p.unlink()
+            with app.app_context():
+                db.create_all()
+                from .seed import run_seed
+                run_seed()
+            print(f"Base SQLite recreada en {db_path} y seed cargado.")
+        else:
+            # Fallback para otros engines en dev: drop_all/create_all (sin migraciones)
+            with app.app_context():
+                db.drop_all()
+                db.create_all()
+                from .seed import run_seed
+                run_seed()
+            print("Base recreada (drop_all/create_all) y seed cargado.")
@@ -0,0 +1,200 @@
+"""
+Helpers del Data Browser de admin (`admin.data_table`).
+
+Paginación por keyset sobre `id` (más nuevo primero): cada página es
+`WHERE id < :cursor ORDER BY id DESC LIMIT n`, así que cuesta lo mismo en la
+página 1 que en la 10.000, sin OFFSET ni COUNT(*) por carga. El total que se
+muestra es exacto en tablas chicas y la estimación del catálogo en
+PostgreSQL cuando contar sería caro.
+
+Filtros: solo sobre columnas que encabezan un índice (PK, UNIQUE o Index del
+modelo), con operadores según el tipo: igualdad y rango (números, fechas),
+igualdad y prefijo (texto). Se pasan como `?<columna>__<op>=valor`; lo que no
+está en la lista blanca se rechaza. Las columnas Text grandes se difieren y
+solo se cargan al abrir una fila (`?open=<id>`).
+"""
+from datetime import datetime
+from types import SimpleNamespace
+
+from sqlalchemy import Boolean, DateTime, Float, Integer, Numeric, String, Text, func, select, text
+from sqlalchemy.orm import defer
+
+from .. import db
+
+PER_PAGE = 25
+# por debajo de esto (según el catálogo) un COUNT(*) exacto es barato
+EXACT_COUNT_BELOW = 20000
+
+
+def _int_arg(args, name):
+    try:
+        v = int(args.get(name, ""))
+    except (TypeError, ValueError):
+        return None
+    return v if v > 0 else None
+
+
+def keyset_page(Model, args, per_page: int = PER_PAGE, stmt=None):
+    """
+    Página de `Model` según `?before=<id>` (más viejos) o `?after=<id>` (más nuevos).
+    Devuelve items (ORM, id desc), has_next/has_prev y los cursores para los links.
+    """
+    pk = Model.id
+    base = select(Model) if stmt is None else stmt
+    stmt = base
+    before, after = _int_arg(args, "before"), _int_arg(args, "after")
+
+    if after is not None:
+        rows = db.session.execute(
+            stmt.where(pk > after).order_by(pk.asc()).limit(per_page + 1)
+        ).scalars().unique().all()
+        has_prev = len(rows) > per_page
+        items = list(reversed(rows[:per_page]))
+        has_next = True
+    else:
+        if before is not None:
+            stmt = stmt.where(pk < before)
+        # unique(): modelos con colecciones lazy="joined" (p. ej. Groups.students)
+        rows = db.session.execute(stmt.order_by(pk.desc()).limit(per_page + 1)).scalars().unique().all()
+        has_next = len(rows) > per_page
+        items = rows[:per_page]
+        has_prev = before is not None
+
+    if not items and (before is not None or after is not None):
+        # cursor fuera de rango (p. ej. se borraron filas): volver al inicio
+        return keyset_page(Model, {}, per_page, base)
+
+    return SimpleNamespace(
+        items=items,
+        has_next=has_next,
+        has_prev=has_prev,
+        next_cursor=items[-1].id if items else None,
+        prev_cursor=items[0].id if items else None,
+    )
+
+
+def estimate_rows(table_name: str):
+    """Filas según pg_class.reltuples (None fuera de PostgreSQL o sin ANALYZE)."""
+    if db.engine.dialect.name != "postgresql":
+        return None
+    n = db.session.execute(
+        text("SELECT reltuples::bigint FROM pg_class WHERE relkind = 'r' AND relname = :t"),
+        {"t": table_name},
+    ).scalar()
+    return int(n) if n is not None and n >= 0 else None
+
+
+def table_total(Model):
+    """(total, exacto?) — exacto si la tabla es chica, estimado si no."""
+    est = estimate_rows(Model.__tablename__)
+    if est is not None and est >= EXACT_COUNT_BELOW:
+        return est, False
+    return db.session.execute(select(func.count()).select_from(Model)).scalar(), True
+
+
+# --- filtros sobre columnas indexadas ---
+OP_LABELS = {"eq": "=", "gte": "≥", "lte": "≤", "prefix": "empieza con"}
+FILTER_COUNT_CAP = 10000
+
+
+def filterable_columns(Model) -> dict:
+    """{columna: nombre del índice que la encabeza} — la lista blanca de filtros."""
+    t = Model.__table__
+    out = {}
+    for col in t.primary_key.columns:
+        out.setdefault(col.name, t.primary_key.name or f"{t.name}_pkey")
+        break
+    for ix in sorted(t.indexes, key=lambda i: i.name or ""):
+        cols = list(ix.columns)
+        if cols:
+            out.setdefault(cols[0].name, ix.name)
+    for cons in t.constraints:
+        cols = list(getattr(cons, "columns", []))
+        if cons.__class__.__name__ == "UniqueConstraint" and cols:
+            out.setdefault(cols[0].name, cons.name or f"{t.name}_{cols[0].name}_key")
+    return out
+
+
+def ops_for(col) -> tuple:
+    if isinstance(col.type, Boolean):
+        return ("eq",)
+    if isinstance(col.type, (Integer, Float, Numeric, DateTime)):
+        return ("eq", "gte", "lte")
+    if isinstance(col.type, String):
+        return ("eq", "prefix")
+    return ()
+
+
+def _parse_value(col, raw: str):
+    if isinstance(col.type, Boolean):
+        if raw.lower() in ("1", "true", "on", "yes", "si", "sí"):
+            return True
+        if raw.lower() in ("0", "false", "off", "no"):
+            return False
+        raise ValueError("usa true/false")
+    if isinstance(col.type, Integer):
+        return int(raw)
+    if isinstance(col.type, (Float, Numeric)):
+        return float(raw)
+    if isinstance(col.type, DateTime):
+        return datetime.fromisoformat(raw)
+    return raw
+
+
+def parse_filters(Model, args):
+    """
+    Lee `?<col>__<op>=valor`. Devuelve (cláusulas, aplicados, errores);
+    `aplicados` dice qué índice respalda cada filtro.
+    """
+    allowed = filterable_columns(Model)
+    cols = Model.__table__.columns
+    clauses, applied, errors = [], [], []
+    for key in args:
+        if "__" not in key:
+            continue
+        name, op = key.rsplit("__", 1)
+        raw = (args.get(key) or "").strip()
+        if not raw:
+            continue
+        if name not in allowed or op not in ops_for(cols[name]):
+            errors.append(f"Filtro no permitido: {key}")
+            continue
+        col = cols[name]
+        try:
+            value = _parse_value(col, raw)
+        except ValueError as e:
+            errors.append(f"{name}: valor inválido ({e})")
+            continue
+        if op == "eq":
+            clauses.append(col == value)
+        elif op == "gte":
+            clauses.append(col >= value)
+        elif op == "lte":
+            clauses.append(col <= value)
+        elif op == "prefix":
+            # LIKE 'x%' puede usar el B-tree (en PG requiere collation C o text_pattern_ops)
+            clauses.append(col.startswith(value, autoescape=True))
+        applied.append({"column": name, "op": op, "label": OP_LABELS[op],
+                        "value": raw, "index": allowed[name]})
+    return clauses, applied, errors
+
+
+def bounded_count(stmt, cap: int = FILTER_COUNT_CAP):
+    """COUNT que se detiene en `cap` filas: (n, exacto?)."""
+    sub = stmt.with_only_columns(text("1")).limit(cap + 1).subquery()
+    n = db.session.execute(select(func.count()).select_from(sub)).scalar()
+    return (cap, False) if n > cap else (n, True)
+
+
+# --- proyección ---
+def deferred_columns(Model) -> list:
+    """Columnas Text (content_json, answers_json, ...) que no se cargan en el listado."""
+    return [c.key for c in Model.__table__.columns if isinstance(c.type, Text)]
+
+
+def listing_select(Model, clauses=()):
+    big = deferred_columns(Model)
+    stmt = select(Model).options(*(defer(getattr(Model, k)) for k in big))
+    if clauses:
+        stmt = stmt.where(*clauses)
+    return stmt
@@ -0,0 +1,119 @@
+"""
+Acciones en lote del Data Browser (editar / borrar muchas filas).
+
+Nada se carga como objeto del ORM: se recorren los ids que cumplen la
+condición por keyset (id > último, de a `chunk_size`) y cada bloque es un
+solo UPDATE/DELETE ... WHERE id IN (...) con su propio commit. Corre en un
+hilo del worker y reporta progreso en `background_jobs` (app/jobs.py), igual
+que el re-score.
+
+Como estos cambios no pasan por la sesión del ORM, al terminar se
+reconcilian los contadores del dashboard y se re-publican los módulos
+afectados. Borrar usuarios o cambiarles el rol revoca sus JWT.
+"""
+from sqlalchemy import delete, func, select, update
+
+from .. import db, jobs
+from ..models import Activities, Attempts, GroupMembers, ModuleAssignments, Modules, Users
+
+CHUNK = 500
+
+# tablas cuyos totales mantiene app/counters.py
+_COUNTED = (Users, Modules, Activities, Attempts)
+# tablas que cambian el contenido de un gradebook (filas, columnas o celdas)
+_GRADEBOOK = (Attempts, Activities, GroupMembers, ModuleAssignments)
+
+
+def count_matching(Model, where) -> int:
+    """Dry-run: cuántas filas tocaría la acción."""
+    return db.session.execute(select(func.count()).select_from(Model).where(*where)).scalar()
+
+
+def _affected_modules(Model, ids) -> set:
+    if Model is Modules:
+        return set(ids)
+    if Model is Activities:
+        return set(db.session.execute(
+            select(Activities.module_id).where(Activities.id.in_(ids)).distinct()
+        ).scalars())
+    return set()
+
+
+def run_bulk(Model, action: str, where, values=None, chunk_size: int = CHUNK, progress=None) -> dict:
+    """
+    `action` es "update" (con `values` {columna: valor}) o "delete".
+    `where` es la lista de condiciones (ids seleccionados o filtros indexados).
+    """
+    if action not in ("update", "delete"):
+        raise ValueError(f"acción desconocida: {action}")
+    if action == "update" and not values:
+        raise ValueError("nada que actualizar")
+
+    stats = {"total": count_matching(Model, where), "processed": 0}
+    if progress:
+        progress(stats)
+
+    pk = Model.id
+    modules = set()  # solo de bloques ya confirmados
+    last_id = 0
+    try:
+        while True:
+            ids = db.session.execute(
+                select(pk).where(*where, pk > last_id).order_by(pk.asc()).limit(chunk_size)
+            ).scalars().all()
+            if not ids:
+                break
+            last_id = ids[-1]
+            chunk_modules = _affected_modules(Model, ids)
+
+            if action == "update":
+                stmt = update(Model).where(pk.in_(ids)).values(**values)
+            else:
+                stmt = delete(Model).where(pk.in_(ids))
+            res = db.session.execute(stmt.execution_options(synchronize_session=False))
+            if Model is Users and (action == "delete" or "role" in values):
+                from .. import revocation
+                revocation.revoke_users(ids, commit=False)  # mismo commit que el bloque
+            db.session.commit()
+
+            modules |= chunk_modules
+            stats["processed"] += res.rowcount if res.rowcount is not None and res.rowcount >= 0 else len(ids)
+            if progress:
+                progress(stats)
+    except Exception:
+        db.session.rollback()  # el bloque que falló; los anteriores ya están confirmados
+        raise
+    finally:
+        # aunque un bloque falle (p. ej. una FK), los anteriores ya cambiaron la BD
+        if stats["processed"]:
+            _after_bulk(Model, modules)
+    return stats
+
+
+def _after_bulk(Model, module_ids) -> None:
+    if Model in _COUNTED:
+        from .. import counters
+        counters.reconcile()
+    if Model is Users:
+        from .. import identity
+        identity.invalidate_all()
+    if Model in _GRADEBOOK:
+        from ..teacher import gradebook
+        gradebook.invalidate_all()
+    if module_ids:
+        from .. import versions
+        for m in Modules.query.filter(Modules.id.in_(module_ids)).all():
+            versions.sync_publication(m, commit=False)
+        db.session.commit()
+
+
+def job_status(job_id: str, user=None):
+    """Estado del lote (ver app/jobs.py); None si no existe o `user` no lo pidió."""
+    return jobs.status(job_id, "bulk", user)
+
+
+def start_bulk_job(app, model_name: str, Model, action: str, where, values=None, requested_by=None) -> str:
+    def work(progress):
+        run_bulk(Model, action, where, values, progress=progress)
+    return jobs.start(app, "bulk", work, params={"model": model_name, "action": action},
+                      stats={"total": None, "processed": 0}, requested_by=requested_by)
@@ -4,67 +4,15 @@ from flask import (
     flash, jsonify, session as flask_session
 )
 from flask_login import login_required, current_user
-from ..models import (
-    Users, Modules, Activities, Attempts, AuthSession, db,
-    ROLE_ADMIN, ROLE_TEACHER, ROLE_STUDENT
-)
 from sqlalchemy import and_
 
-try:
-    from ..models import Groups, GroupMembers, ModuleAssignments
-except Exception:
-    Groups = GroupMembers = ModuleAssignments = None
-
-try:
-    from ..models import UserProfile
-except Exception:
-    UserProfile = None
-
-try:
-    from ..models import GameSettings
-except Exception:
-    GameSettings = None
-
-try:
-    from .. import csrf
-except Exception:
-    csrf = None
-
-from . import admin_bp
-
+from .. import csrf
 from ..models import (
-    db, Users, Modules, Activities, Attempts, AuthSession,
+    db, Users, Modules, Activities, Attempts, AuthSession, GameSettings,
+    Groups, GroupMembers, ModuleAssignments, RequestLog,
     ROLE_ADMIN, ROLE_TEACHER, ROLE_STUDENT
 )
-
-try:
-    from ..models import GameSettings
-except Exception:
-    GameSettings = None
-
-# --- imports arriba del archivo (añade si faltan) ---
-from sqlalchemy import and_
-
-# intenta traer tablas opcionales para el Data Browser
-try:
-    from ..models import Groups, GroupMembers, ModuleAssignments
-except Exception:
-    Groups = GroupMembers = ModuleAssignments = None
-
-try:
-    from ..models import UserProfile
-except Exception:
-    UserProfile = None
-
-try:
-    from ..models import GameSettings
-except Exception:
-    GameSettings = None
-
-try:
-    from ..models import RequestLog
-except Exception:
-    RequestLog = None
+from . import admin_bp
 
 
 ALLOWED_MODELS = {
@@ -73,20 +21,43 @@ ALLOWED_MODELS = {
     "activities": Activities,
     "attempts": Attempts,
     "auth_sessions": AuthSession,
+    "game_settings": GameSettings,
+    "groups": Groups,
+    "group_members": GroupMembers,
+    "module_assignments": ModuleAssignments,
+}
+# Solo lectura de logs (no hay campos editables)
+ALLOWED_MODELS["request_log"] = RequestLog
+
+
+# Campos editables por tabla en el Data Browser (uno a uno y en lote)
+EDITABLE_FIELDS = {
+    "users": ["name", "email", "role", "locale"],
+    "modules": ["title", "summary", "is_published", "level", "xp_reward"],
+    "activities": ["title", "type", "max_points", "module_id", "position",
+                   "is_published", "attempt_limit", "default_xp", "content_json"],
+    "attempts": ["score"],
+    "groups": ["name", "teacher_id", "grade_level", "section"],
+    "group_members": ["group_id", "user_id"],
+    "module_assignments": ["group_id", "module_id"],
+    "game_settings": ["xp_base", "xp_growth", "max_attempts_default"],
+    "auth_sessions": ["active"],  #  mín
 }
-if GameSettings:
-    ALLOWED_MODELS["game_settings"] = GameSettings
-if Groups:
-    ALLOWED_MODELS["groups"] = Groups
-if GroupMembers:
-    ALLOWED_MODELS["group_members"] = GroupMembers
-if ModuleAssignments:
-    ALLOWED_MODELS["module_assignments"] = ModuleAssignments
-if UserProfile:
-    ALLOWED_MODELS["user_profiles"] = UserProfile
-if RequestLog:
-    # Solo lectura de logs (no hay campos editables)
-    ALLOWED_MODELS["request_log"] = RequestLog
+
+
+def _editable_fields(model, Model) -> list:
+    """Campos editables que de verdad son columnas de la tabla."""
+    return [f for f in EDITABLE_FIELDS.get(model, []) if f in Model.__table__.columns]
+
+
+def _coerce_field(Model, field, val):
+    coltype = getattr(Model, field).type.__class__.__name__.lower()
+    if "integer" in coltype:
+        val = int(val) if val not in (None, "",) else None
+    elif "boolean" in coltype:
+        # checkboxes llegan como "on" si están marcados
+        val = val in ("1", "true", "on", "True", "on")
+    return val
 
 
 # Helpers
@@ -97,10 +68,7 @@ def is_admin() -> bool:
 def _get_settings():
     """
     Obtiene (o crea) la fila única de GameSettings.
-    Si el modelo no existe, devuelve None.
     """
-    if not GameSettings:
-        return None
     s = GameSettings.query.get(1)
     if not s:
         s = GameSettings(id=1, xp_base=100, xp_growth=50, max_attempts_default=3)
@@ -127,25 +95,23 @@ def guard():
 @admin_bp.route("/dashboard")
 @login_required
 def dashboard():
-    # --- existing counts ---
-    total_users = Users.query.count()
-    total_students = Users.query.filter_by(role=ROLE_STUDENT).count()
-    total_teachers = Users.query.filter_by(role=ROLE_TEACHER).count()
-
-    modules_count = Modules.query.count()
-    published_mod = Modules.query.filter_by(is_published=True).count() if hasattr(Modules, "is_published") else 0
-    activities_ct = Activities.query.count()
-    attempts_ct = Attempts.query.count()
+    # --- headline counts: una sola lectura de global_counters ---
+    from .. import counters
+    c = counters.read()
 
     # --- NEW: live metrics (last 60 minutes) ---
     from ..models import RequestLog  # local import to avoid circulars
     window_start = datetime.utcnow() - timedelta(hours=1)
 
     # availability = % of successful (status < 500) among all requests in window
-    total_reqs = RequestLog.query.filter(RequestLog.created_at >= window_start).count()
-    ok_reqs = RequestLog.query.filter(
-        and_(RequestLog.created_at >= window_start, RequestLog.status_code < 500)
-    ).count()
+    total_reqs, ok_reqs = (
+        db.session.query(
+            db.func.count(RequestLog.id),
+            db.func.coalesce(db.func.sum(db.case((RequestLog.status_code < 500, 1), else_=0)), 0),
+        )
+        .filter(RequestLog.created_at >= window_start)
+        .one()
+    )
     availability_pct = (ok_reqs / total_reqs * 100.0) if total_reqs else 100.0
 
     # p95 for /student/dashboard (you can change the path if you prefer)
@@ -164,42 +130,54 @@ def dashboard():
         p95_ms = 0
 
     stats = {
-        "total_users": total_users,
-        "students": total_students,
-        "teachers": total_teachers,
-        "modules": modules_count,
-        "published": published_mod,
-        "activities": activities_ct,
-        "attempts": attempts_ct,
+        "total_users": c["users"],
+        "students": c["students"],
+        "teachers": c["teachers"],
+        "modules": c["modules"],
+        "published": c["published"],
+        "activities": c["activities"],
+        "attempts": c["attempts"],
+        "estimated": c["estimated"],
+        "stale": c["stale"],
 
         # Replaces the hard-coded strings
         "availability_pct": availability_pct,  # float
         "p95_ms": p95_ms,                      # int milliseconds
     }
 
-    cutoff = datetime.utcnow() - timedelta(minutes=2)
-    online = (AuthSession.query
-              .filter_by(active=True)
-              .filter(AuthSession.last_seen >= cutoff)
-              .count())
+    from .. import presence
+    online = presence.store.online_count()
 
     recent_users = Users.query.order_by(Users.created_at.desc()).limit(8).all()
-    settings = _get_settings()
-    modules = Modules.query.order_by(Modules.id.desc()).all()
-    recent_activities = Activities.query.order_by(Activities.id.desc()).limit(20).all()
+
+    from .. import ratelimit
+    login_limits = ratelimit.login_limiter.stats()
+
+    from .. import dbpool
+    db_pool = dbpool.snapshot(db.engine)
 
     return render_template(
         "admin/dashboard.html",
         stats=stats,
         online=online,
+        login_limits=login_limits,
+        db_pool=db_pool,
         recent_users=recent_users,
-        settings=settings,
-        modules=modules,
-        recent_activities=recent_activities,
         ALLOWED_MODELS=ALLOWED_MODELS,
     )
 
 
+@admin_bp.route("/api/db-pool")
+@login_required
+def api_db_pool():
+    """Espera de checkout y saturación del pool de este worker (para dimensionar workers)."""
+    from .. import dbpool, replica
+    data = dbpool.snapshot(db.engine)
+    if replica.BIND in db.engines:
+        data["replica"] = {**replica.snapshot(), "pool": dbpool.snapshot(db.engines[replica.BIND])}
+    return jsonify(data)
+
+
 # Live Sessions (vista + API)
 @admin_bp.route("/sessions")
 @login_required
@@ -210,90 +188,53 @@ def sessions_live():
 @admin_bp.route("/api/active-sessions")
 @login_required
 def api_active_sessions():
-    cutoff = datetime.utcnow() - timedelta(minutes=5)
-    rows = (
-        AuthSession.query
-        .filter(AuthSession.active == True, AuthSession.last_seen >= cutoff)
-        .order_by(AuthSession.last_seen.desc())
-        .limit(200)
-        .all()
-    )
+    from .. import presence
     data = []
-    for s in rows:
+    for e in presence.store.active():
         data.append({
-            "id": s.id,
-            "user_id": s.user_id,
-            "name": getattr(s.user, "name", ""),
-            "role": getattr(s.user, "role", ""),
-            "email": getattr(s.user, "email", ""),
-            "login_at": s.login_at.isoformat(timespec="seconds") if s.login_at else None,
-            "last_seen": s.last_seen.isoformat(timespec="seconds") if s.last_seen else None,
-            "ip": getattr(s, "ip", None),
+            "id": e["id"],
+            "user_id": e["user_id"],
+            "name": e["name"] or "",
+            "role": e["role"] or "",
+            "email": e["email"] or "",
+            "login_at": e["login_at"].isoformat(timespec="seconds") if e["login_at"] else None,
+            "last_seen": e["last_seen"].isoformat(timespec="seconds") if e["last_seen"] else None,
+            "ip": e["ip"],
         })
     return jsonify(data)
 
 
-if csrf:
-    @admin_bp.route("/api/ping", methods=["POST", "GET"])
-    @csrf.exempt
-    @login_required
-    def api_ping():
-        now = datetime.utcnow()
-        ip  = request.headers.get("X-Forwarded-For", request.remote_addr)
-
-        sid = flask_session.get("auth_session_id")
-        s = AuthSession.query.get(sid) if sid else None
-
-        if not s:
-            s = AuthSession(
-                user_id=current_user.id,
-                login_at=now,
-                last_seen=now,
-                ip=ip,
-                active=True,
-            )
-            db.session.add(s)
-            db.session.commit()
-            flask_session["auth_session_id"] = s.id
-        else:
-            s.last_seen = now
-            s.active = True
-            if not s.ip:
-                s.ip = ip
-            db.session.commit()
+def _ping():
+    """Heartbeat: solo toca la presencia en memoria; la BD se actualiza en lote."""
+    from .. import presence
+    ip = request.headers.get("X-Forwarded-For", request.remote_addr)
 
-        return ("", 204)
-else:
-    @admin_bp.route("/api/ping", methods=["POST", "GET"])
-    @login_required
-    def api_ping():
+    sid = flask_session.get("auth_session_id")
+    if not sid:
         now = datetime.utcnow()
-        ip  = request.headers.get("X-Forwarded-For", request.remote_addr)
-
-        sid = flask_session.get("auth_session_id")
-        s = AuthSession.query.get(sid) if sid else None
-
-        if not s:
-            s = AuthSession(
-                user_id=current_user.id,
-                login_at=now,
-                last_seen=now,
-                ip=ip,
-                active=True,
-            )
-            db.session.add(s)
-            db.session.commit()
-            flask_session["auth_session_id"] = s.id
-        else:
-            s.last_seen = now
-            s.active = True
-            if not s.ip:
-                s.ip = ip
-            db.session.commit()
+        s = AuthSession(
+            user_id=current_user.id,
+            login_at=now,
+            last_seen=now,
+            ip=ip,
+            active=True,
+        )
+        db.session.add(s)
+        db.session.commit()
+        sid = flask_session["auth_session_id"] = s.id
+        presence.store.touch(sid, current_user, ip=ip, login_at=now, flushed=now)
+    else:
+        presence.store.touch(sid, current_user, ip=ip)
 
-        return ("", 204)
+    return ("", 204)
 
 
+@admin_bp.route("/api/ping", methods=["POST", "GET"])
+@csrf.exempt
+@login_required
+def api_ping():
+    return _ping()
+
 
 @admin_bp.route("/data")
 @login_required
@@ -308,29 +249,22 @@ def data_table(model):
         return abort(404)
     Model = ALLOWED_MODELS[model]
 
-    editable = {
-        "users": ["name", "email", "role", "locale"],
-        "modules": ["title", "summary", "is_published", "level", "xp_reward"],
-        "activities": ["title", "type", "max_points", "module_id", "position",
-                       "is_published", "attempt_limit", "default_xp", "content_json"],
-        "attempts": ["score"],
-        "groups": ["name", "teacher_id", "grade_level", "section"] if Groups else [],
-        "group_members": ["group_id", "user_id"] if GroupMembers else [],
-        "module_assignments": ["module_id", "target_type", "target_id"] if ModuleAssignments else [],
-        "user_profiles": ["credit_score", "cash_balance", "salary_monthly", "has_car",
-                          "car_payment_monthly", "level", "xp", "energy"] if UserProfile else [],
-        "game_settings": ["xp_base", "xp_growth", "max_attempts_default"] if GameSettings else [],
-        "auth_sessions": ["active"],  #  mín
-    }
-
     if request.method == "POST":
         _ = request.form.get("csrf_token")
         action = request.form.get("action")
+        if action in ("bulk_preview", "bulk_apply"):
+            return _bulk_action(model, Model, action)
         if action == "delete":
             rid = int(request.form.get("id"))
             row = Model.query.get_or_404(rid)
             db.session.delete(row)
+            if model == "users":
+                from .. import revocation
+                revocation.revoke_user(rid, commit=False)
             db.session.commit()
+            if model == "users":
+                from .. import identity
+                identity.invalidate_all()  # que ningún worker siga dejándolo entrar
             flash("Registro eliminado.", "success")
             return redirect(url_for("admin.data_table", model=model))
         elif action == "save":
@@ -341,36 +275,140 @@ def data_table(model):
                 row = Model()
                 db.session.add(row)
 
-            allowed = editable.get(model, [])
+            old_role = getattr(row, "role", None) if model == "users" else None
+            allowed = _editable_fields(model, Model)
             for f in allowed:
                 if f in request.form:
-                    val = request.form.get(f)
-
-                    coltype = getattr(Model, f).type.__class__.__name__.lower()
-                    if "integer" in coltype:
-                        val = int(val) if val not in (None, "",) else None
-                    elif "boolean" in coltype:
-                        # checkboxes llegan como "on" si están marcados
-                        val = val in ("1", "true", "on", "True", "on")
-                    setattr(row, f, val)
+                    setattr(row, f, _coerce_field(Model, f, request.form.get(f)))
 
+            if model == "users" and rid and row.role != old_role:
+                # el rol viaja en los JWT ya emitidos
+                from .. import revocation
+                revocation.revoke_user(row.id, commit=False)
             db.session.commit()
+            if model == "users":
+                from .. import identity
+                identity.invalidate_all()  # rol/nombre: en todos los workers
             flash("Guardado.", "success")
             return redirect(url_for("admin.data_table", model=model))
 
-    page = max(1, int(request.args.get("page", 1)))
-    per  = 25
-    pag  = Model.query.order_by(getattr(Model, "id").desc()).paginate(page=page, per_page=per, error_out=False)
+    # keyset por id (sin OFFSET ni COUNT(*) por página), filtros solo sobre índices
+    from . import browser
+    clauses, filters, filter_errors = browser.parse_filters(Model, request.args)
+    for msg in filter_errors:
+        flash(msg, "error")
+    stmt = browser.listing_select(Model, clauses)
+    pag = browser.keyset_page(Model, request.args, stmt=stmt)
+    if clauses:
+        total, total_exact = browser.bounded_count(stmt)
+    else:
+        total, total_exact = browser.table_total(Model)
 
+    # las columnas Text grandes no se cargan hasta abrir la fila
+    deferred = browser.deferred_columns(Model)
     columns = [c.key for c in Model.__table__.columns]
     records = []
     for row in pag.items:
         d = {}
         for c in columns:
-            d[c] = getattr(row, c)
+            d[c] = None if c in deferred else getattr(row, c)
         records.append(d)
 
-    return render_template("admin/data_table.html", model=model, columns=columns, page=pag, records=records)
+    opened = None
+    open_id = request.args.get("open", type=int)
+    if open_id:
+        row = db.session.get(Model, open_id)
+        if row is not None:
+            opened = {c: getattr(row, c) for c in columns}
+
+    filterable = browser.filterable_columns(Model)
+    table_cols = Model.__table__.columns
+    filter_fields = [
+        {"column": c, "index": ix, "ops": browser.ops_for(table_cols[c])}
+        for c, ix in filterable.items() if browser.ops_for(table_cols[c])
+    ]
+    # para que paginar/abrir conserve los filtros
+    filter_args = {k: v for k, v in request.args.items() if "__" in k and v}
+
+    return render_template(
+        "admin/data_table.html", model=model, columns=columns, page=pag, records=records,
+        total=total, total_exact=total_exact, deferred=deferred, opened=opened,
+        filters=filters, filter_fields=filter_fields, filter_args=filter_args,
+        op_labels=browser.OP_LABELS, bulk_fields=_editable_fields(model, Model),
+    )
+
+
+def _bulk_action(model, Model, action):
+    """Editar / borrar en lote: filas marcadas o todas las que cumplen los filtros."""
+    from flask import current_app
+    from . import browser, bulk
+
+    # los filtros viajan como campos ocultos para volver a la misma vista
+    filter_args = {k: v for k, v in request.form.items() if "__" in k and v}
+    back = url_for("admin.data_table", model=model, **filter_args)
+
+    if request.form.get("scope") == "filter":
+        where, _, errors = browser.parse_filters(Model, request.form)
+        if errors or not where:
+            flash(errors[0] if errors else "Aplica al menos un filtro para una acción en lote.", "error")
+            return redirect(back)
+    else:
+        ids = [int(x) for x in request.form.getlist("ids") if x.isdigit()]
+        if not ids:
+            flash("No hay filas seleccionadas.", "error")
+            return redirect(back)
+        where = [Model.id.in_(ids)]
+
+    bulk_action = request.form.get("bulk_action")
+    values = None
+    if bulk_action == "update":
+        field = request.form.get("field")
+        if field not in _editable_fields(model, Model):
+            flash("Campo no editable.", "error")
+            return redirect(back)
+        try:
+            values = {field: _coerce_field(Model, field, request.form.get("value"))}
+        except ValueError:
+            flash(f"Valor inválido para {field}.", "error")
+            return redirect(back)
+    elif bulk_action != "delete":
+        flash("Acción inválida.", "error")
+        return redirect(back)
+
+    n = bulk.count_matching(Model, where)
+    verb = "actualizarían" if bulk_action == "update" else "eliminarían"
+    if action == "bulk_preview" or n == 0:
+        flash(f"Se {verb} {n} registros (sin cambios todavía).", "success")
+        return redirect(back)
+
+    job_id = bulk.start_bulk_job(
+        current_app._get_current_object(), model, Model, bulk_action, where, values,
+        requested_by=current_user.id,
+    )
+    flash(f"Procesando {n} registros en lote (job {job_id}).", "success")
+    return redirect(url_for("admin.data_table", model=model, bulk_job=job_id, **filter_args))
+
+
+@admin_bp.route("/api/bulk/<job_id>")
+@login_required
+def api_bulk_status(job_id):
+    from . import bulk
+    st = bulk.job_status(job_id, current_user)
+    if not st:
+        abort(404)
+    return jsonify(st)
+
+
+# Export (streaming) de todos los intentos
+@admin_bp.route("/export/attempts")
+@login_required
+def export_attempts():
+    from ..export import attempts_select, apply_filters, stream_attempts
+    return stream_attempts(
+        apply_filters(attempts_select(), request.args),
+        fmt=(request.args.get("format") or "csv").lower(),
+        gzip=request.args.get("gzip") in ("1", "true", "on"),
+    )
 
 
 # Users (roles)
@@ -388,8 +426,13 @@ def users_view():
         if u.id == current_user.id and new_role != ROLE_ADMIN:
             flash("No puedes quitarte tu propio rol de admin.", "error")
             return redirect(url_for("admin.users_view"))
+        if u.role != new_role:
+            from .. import revocation
+            revocation.revoke_user(u.id, commit=False)  # el rol viaja en los JWT ya emitidos
         u.role = new_role
         db.session.commit()
+        from .. import identity
+        identity.invalidate_all()  # el rol cacheado da acceso: se invalida en todos los workers
         flash("Rol actualizado.", "success")
         return redirect(url_for("admin.users_view"))
 
@@ -403,9 +446,6 @@ def users_view():
 @login_required
 def settings_view():
     settings = _get_settings()
-    if GameSettings is None:
-        flash("GameSettings no está definido en modelos o migraciones.", "error")
-        return redirect(url_for("admin.dashboard"))
 
     if request.method == "POST":
         _ = request.form.get("csrf_token")
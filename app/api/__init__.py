@@ -0,0 +1 @@
+"""API JSON (JWT) para clientes fuera del navegador; ver `routes.py`."""
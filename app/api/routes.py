@@ -0,0 +1,126 @@
+# app/api/routes.py
+"""
+API JSON del estudiante, autenticada con JWT (token de POST /auth/api/login,
+en el header `Authorization: Bearer <token>`).
+
+Usa las mismas funciones que las vistas HTML (`app/student/services.py`), así
+que calificación, límites de intentos, gate por nivel y misiones se comportan
+igual en los dos caminos. Sin sesión de navegador: no hay CSRF.
+"""
+from flask import Blueprint, jsonify, request
+from flask_jwt_extended import jwt_required, get_jwt_identity
+
+from app import csrf
+from app.models import Activities, Missions, Modules
+from app.student import services
+from app.student.services import StudentFlowError
+
+api_bp = Blueprint("api", __name__, url_prefix="/api")
+csrf.exempt(api_bp)
+
+
+@api_bp.errorhandler(StudentFlowError)
+def _flow_error(e):
+    return jsonify({"msg": e.message}), e.status
+
+
+@api_bp.errorhandler(404)
+def _not_found(e):
+    return jsonify({"msg": "not found"}), 404
+
+
+def _uid() -> int:
+    return int(get_jwt_identity())
+
+
+# --- serialización ---
+def _profile_json(p):
+    return {
+        "level": p.level, "xp": p.xp, "energy": p.energy,
+        "credit_score": p.credit_score, "cash_balance": p.cash_balance,
+    }
+
+
+def _module_json(m):
+    return {"id": m.id, "title": m.title, "summary": m.summary, "level": m.level, "xp_reward": m.xp_reward}
+
+
+def _activity_json(a):
+    return {
+        "id": a.id, "module_id": a.module_id, "title": a.title, "type": a.type,
+        "position": a.position, "max_points": a.max_points,
+    }
+
+
+def _mission_json(m, prog):
+    return {
+        "id": m.id, "title": m.title, "description": m.description,
+        "xp_reward": m.xp_reward, "cash_reward": m.cash_reward,
+        "is_completed": bool(prog.is_completed), "is_collected": bool(prog.is_collected),
+    }
+
+
+# --- endpoints ---
+@api_bp.get("/student/dashboard")
+@jwt_required()
+def student_dashboard():
+    data = services.dashboard_data(_uid())
+    return jsonify(
+        profile=_profile_json(data["profile"]),
+        modules=[_module_json(m) for m in data["modules"]],
+        activities=[_activity_json(a) for a in data["activities"]],
+        missions=[_mission_json(m, p) for m, p in data["missions"]],
+        mission_summary=data["mission_summary"],
+    )
+
+
+@api_bp.get("/student/modules/<int:module_id>")
+@jwt_required()
+def student_module(module_id):
+    module = Modules.query.get_or_404(module_id)
+    view = services.module_view(module, services.get_or_create_profile(_uid()))
+    return jsonify(
+        module=_module_json(view.module),
+        can_access=view.can_access,
+        sections=view.sections,
+        activities=[_activity_json(a) for a in view.activities],
+        version=(view.snapshot or {}).get("hash"),
+    )
+
+
+@api_bp.get("/student/activities/<int:activity_id>")
+@jwt_required()
+def student_activity(activity_id):
+    ctx = services.activity_context(Activities.query.get_or_404(activity_id), _uid())
+    if ctx.locked:
+        raise services.level_error(ctx)
+    return jsonify(
+        activity=_activity_json(ctx.activity),
+        content=services.public_content(ctx, services.activity_content(ctx)),
+        attempts_used=ctx.used,
+        attempts_left=ctx.attempts_left,
+        attempt_limit=ctx.limit,
+        blocked=ctx.blocked,
+    )
+
+
+@api_bp.post("/student/activities/<int:activity_id>/attempts")
+@jwt_required()
+def student_submit_attempt(activity_id):
+    """Body: {"answers": {"0": "<key de la opción>", "1": ...}} (índice de pregunta -> key)."""
+    uid = _uid()
+    ctx = services.activity_context(Activities.query.get_or_404(activity_id), uid)
+    answers = (request.get_json(silent=True) or {}).get("answers") or {}
+    if isinstance(answers, list):
+        answers = {str(i): v for i, v in enumerate(answers) if v is not None}
+    if not isinstance(answers, dict):
+        return jsonify({"msg": "answers debe ser un objeto o una lista"}), 400
+    answers = {str(k): str(v) for k, v in answers.items()}
+    return jsonify(services.submit_attempt(ctx, uid, answers)), 201
+
+
+@api_bp.post("/student/missions/<int:mission_id>/collect")
+@jwt_required()
+def student_collect_mission(mission_id):
+    mission = Missions.query.get_or_404(mission_id)
+    return jsonify(services.collect_mission(_uid(), mission))
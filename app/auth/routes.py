@@ -1,15 +1,14 @@
-from flask import render_template, redirect, url_for, flash, request, jsonify
+from flask import render_template, redirect, url_for, flash, request, jsonify, make_response
 from flask_login import login_user, logout_user, current_user, login_required
 from flask_jwt_extended import create_access_token, jwt_required, get_jwt_identity, get_jwt
 from . import auth_bp
 from ..admin import admin_bp
 from ..forms import LoginForm, RegisterForm
 from ..models import db, Users, ROLE_STUDENT
-from .. import csrf
+from .. import csrf, passwords, ratelimit, revocation
 from datetime import datetime, timedelta
 from flask import session as flask_session, request
 from ..models import AuthSession, db  # importa el modelo nuevo
-from werkzeug.security import check_password_hash
 
 def _record_login(user):
     now = datetime.utcnow()
@@ -30,10 +29,15 @@ def _record_login(user):
     db.session.commit()
     flask_session["auth_session_id"] = s.id
 
+    from .. import presence
+    presence.store.touch(s.id, user, ip=ip, login_at=now, flushed=now)
+
 def _record_logout():
     sid = flask_session.pop("auth_session_id", None)
     if not sid:
         return
+    from .. import presence
+    presence.store.end(sid)
     s = AuthSession.query.get(sid)
     if not s:
         return
@@ -43,6 +47,19 @@ def _record_logout():
         s.logout_at = datetime.utcnow()
     db.session.commit()
 
+def _busy(template, form):
+    """503 rápido cuando el pool de contraseñas está lleno."""
+    flash("Hay muchos inicios de sesión en este momento. Intenta de nuevo en unos segundos.", "error")
+    resp = make_response(render_template(template, form=form), 503)
+    resp.headers["Retry-After"] = "2"
+    return resp
+
+def _throttled(template, form, retry_after):
+    flash(f"Demasiados intentos. Espera {retry_after} s y vuelve a intentar.", "error")
+    resp = make_response(render_template(template, form=form), 429)
+    resp.headers["Retry-After"] = str(retry_after)
+    return resp
+
 def _redirect_by_role(user):
     role = (user.role or "student").strip().lower()
     if role == "admin":
@@ -73,7 +90,10 @@ def register():
             role=ROLE_STUDENT,
             locale="es",
         )
-        user.set_password(form.password.data)
+        try:
+            user.hashed_pw = passwords.hash_password(form.password.data)
+        except passwords.PoolBusy:
+            return _busy("auth/register.html", form)
         db.session.add(user)
         db.session.commit()
 
@@ -116,30 +136,27 @@ def login():
     form = LoginForm()
     if form.validate_on_submit():
         email = (form.email.data or "").strip().lower()
+        # antes de tocar la BD o el pool de hashing
+        retry_after = ratelimit.check_login(email)
+        if retry_after:
+            return _throttled("auth/login.html", form, retry_after)
+
         user = Users.query.filter_by(email=email).first()
 
-        if user and check_password_hash(user.hashed_pw, form.password.data):
+        try:
+            ok = passwords.verify_and_upgrade(user, form.password.data)
+        except passwords.PoolBusy:
+            return _busy("auth/login.html", form)
+
+        if ok:
+            ratelimit.login_succeeded(email)
             # Normaliza y persiste role por si estuviera con mayúsculas/espacios
+            # (y el hash re-calculado, si cambiaron los parámetros)
             user.role = (user.role or "student").strip().lower()
             db.session.commit()
 
             login_user(user, remember=getattr(form, "remember_me", False))
-            if user and check_password_hash(user.hashed_pw, form.password.data):
-                user.role = (user.role or "student").strip().lower()
-                db.session.commit()
-
-                login_user(user, remember=getattr(form, "remember_me", False))
-                _record_login(user)  # <---- IMPORTANTE
-
-                nxt = request.args.get("next")
-                if nxt:
-                    return redirect(nxt)
-                if user.role == "admin":
-                    return redirect(url_for("admin.dashboard"))
-                elif user.role == "teacher":
-                    return redirect(url_for("teacher.dashboard"))
-                else:
-                    return redirect(url_for("student_ui.dashboard"))
+            _record_login(user)  # <---- IMPORTANTE
 
             # Respeta ?next si viene de @login_required
             nxt = request.args.get("next")
@@ -171,9 +188,19 @@ def logout():
 def api_login():
     data = request.get_json() or {}
     email = data.get("email","").lower(); password = data.get("password","")
+    retry_after = ratelimit.check_login(email)
+    if retry_after:
+        return jsonify({"msg": "too many attempts"}), 429, {"Retry-After": str(retry_after)}
     user = Users.query.filter_by(email=email).first()
-    if not user or not user.check_password(password):
+    try:
+        ok = passwords.verify_and_upgrade(user, password)
+    except passwords.PoolBusy:
+        return jsonify({"msg": "busy, retry"}), 503, {"Retry-After": "2"}
+    if not ok:
         return jsonify({"msg":"invalid credentials"}), 401
+    ratelimit.login_succeeded(email)
+    if db.session.dirty:
+        db.session.commit()  # hash actualizado
 
     # 👇 identity como string; metadatos en additional_claims
     token = create_access_token(
@@ -182,6 +209,14 @@ def api_login():
     )
     return jsonify(access_token=token)
 
+@auth_bp.route("/api/logout", methods=["POST"])
+@csrf.exempt
+@jwt_required()
+def api_logout():
+    claims = get_jwt()
+    revocation.revoke_token(claims["jti"], int(get_jwt_identity()), claims.get("exp"))
+    return jsonify({"msg": "token revoked"})
+
 @auth_bp.route("/api/me")
 @csrf.exempt
 @jwt_required()
@@ -0,0 +1,66 @@
+"""Caché en memoria (por proceso) con TTL para resultados calculados."""
+from threading import RLock
+from time import monotonic
+
+
+class TTLCache:
+    """
+    Diccionario thread-safe con expiración por entrada.
+    Pensado para datos baratos de recalcular: si el worker se recicla
+    o la entrada expira, simplemente se vuelve a calcular.
+    """
+
+    def __init__(self, ttl: float = 60.0, maxsize: int = 1024):
+        self.ttl = ttl
+        self.maxsize = maxsize
+        self._data = {}
+        self._lock = RLock()
+
+    def get(self, key, default=None):
+        with self._lock:
+            hit = self._data.get(key)
+            if hit is None:
+                return default
+            expires, value = hit
+            if expires < monotonic():
+                self._data.pop(key, None)
+                return default
+            return value
+
+    def set(self, key, value, ttl: float = None):
+        with self._lock:
+            if len(self._data) >= self.maxsize and key not in self._data:
+                # descarta primero lo expirado; si no alcanza, la entrada más vieja
+                now = monotonic()
+                for k in [k for k, (exp, _) in self._data.items() if exp < now]:
+                    self._data.pop(k, None)
+                if len(self._data) >= self.maxsize:
+                    self._data.pop(next(iter(self._data)), None)
+            self._data[key] = (monotonic() + (self.ttl if ttl is None else ttl), value)
+        return value
+
+    def get_or_set(self, key, factory, ttl: float = None):
+        value = self.get(key)
+        if value is None:
+            value = self.set(key, factory(), ttl)
+        return value
+
+    def pop(self, key):
+        with self._lock:
+            hit = self._data.pop(key, None)
+        return hit[1] if hit else None
+
+    def pop_where(self, predicate):
+        """Elimina las entradas cuyo valor cumple `predicate(value)`."""
+        with self._lock:
+            keys = [k for k, (_, v) in self._data.items() if predicate(v)]
+            for k in keys:
+                self._data.pop(k, None)
+        return keys
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self):
+        return len(self._data)
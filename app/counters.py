@@ -0,0 +1,234 @@
+"""
+Contadores globales para el dashboard de admin.
+
+En vez de siete COUNT(*) por carga, `global_counters` guarda los totales y se
+mantiene de forma incremental desde la sesión del ORM (after_flush, dentro de
+la misma transacción que el INSERT/DELETE). Cada contador se reparte en
+varias filas ("shards") para que los intentos concurrentes no se peleen por
+una sola fila; leer es un `SUM ... GROUP BY name` sobre una tabla diminuta.
+
+Lo que no pasa por el ORM (inserts en lote, cascadas de la BD) se corrige con
+`reconcile()`: `flask counters-reconcile` o cada COUNTERS_RECONCILE_SECONDS
+desde el hilo de tareas periódicas (`reaper.start_scheduler`). El dashboard
+solo lee: nunca corre los COUNT(*) dentro del request.
+"""
+import random
+import time
+
+from flask import current_app
+from sqlalchemy import bindparam, event, func, inspect, select, text, update
+from sqlalchemy.orm import Session
+
+from . import db
+from .models import (
+    Users, Modules, Activities, Attempts, GlobalCounters,
+    ROLE_STUDENT, ROLE_TEACHER, ROLE_ADMIN,
+)
+
+SHARDS = 8
+RECONCILED_AT = "_reconciled_at"
+COUNTER_NAMES = (
+    "users", "students", "teachers", "admins",
+    "modules", "published", "activities", "attempts",
+)
+_ROLE_COUNTER = {ROLE_STUDENT: "students", ROLE_TEACHER: "teachers", ROLE_ADMIN: "admins"}
+# tabla física por contador, para la estimación por catálogo (pg_class.reltuples)
+_ESTIMABLE = {"users": "users", "modules": "modules", "activities": "activities", "attempts": "attempts"}
+
+
+def _role_counter(role):
+    return _ROLE_COUNTER.get((role or "").strip().lower())
+
+
+def _deltas_for(session) -> dict:
+    deltas = {}
+
+    def bump(name, d):
+        if name:
+            deltas[name] = deltas.get(name, 0) + d
+
+    for obj, sign in [(o, 1) for o in session.new] + [(o, -1) for o in session.deleted]:
+        if isinstance(obj, Users):
+            bump("users", sign)
+            bump(_role_counter(obj.role), sign)
+        elif isinstance(obj, Modules):
+            bump("modules", sign)
+            if obj.is_published:
+                bump("published", sign)
+        elif isinstance(obj, Activities):
+            bump("activities", sign)
+        elif isinstance(obj, Attempts):
+            bump("attempts", sign)
+
+    for obj in session.dirty:
+        if isinstance(obj, Users):
+            hist = inspect(obj).attrs.role.history
+            if hist.has_changes():
+                for old in hist.deleted:
+                    bump(_role_counter(old), -1)
+                for new in hist.added:
+                    bump(_role_counter(new), 1)
+        elif isinstance(obj, Modules):
+            hist = inspect(obj).attrs.is_published.history
+            if hist.has_changes():
+                was = any(bool(v) for v in hist.deleted)
+                now = any(bool(v) for v in hist.added)
+                if was != now:
+                    bump("published", 1 if now else -1)
+    return {k: v for k, v in deltas.items() if v}
+
+
+def _after_flush(session, flush_context):
+    deltas = _deltas_for(session)
+    if not deltas:
+        return
+    conn = session.connection()
+    stmt = text(
+        "UPDATE global_counters SET value = value + :d "
+        "WHERE name = :n AND shard = :s"
+    )
+    shard = random.randrange(SHARDS)
+    for name, d in deltas.items():
+        conn.execute(stmt, {"d": d, "n": name, "s": shard})
+
+
+def _keep_old_value(target, value, oldvalue, initiator):
+    return value
+
+
+def register() -> None:
+    """Engancha el mantenimiento incremental a todas las sesiones del ORM."""
+    if not event.contains(Session, "after_flush", _after_flush):
+        event.listen(Session, "after_flush", _after_flush)
+        # sin active_history, asignar sobre un objeto expirado no guarda el
+        # valor anterior y no sabríamos qué contador restar
+        for attr in (Users.role, Modules.is_published):
+            event.listen(attr, "set", _keep_old_value, active_history=True, retval=True)
+
+
+def exact_counts(bind_arguments=None) -> dict:
+    """Todos los COUNT(*) exactos en una sola sentencia (para reconciliar)."""
+    def count(model, *where):
+        return select(func.count()).select_from(model).where(*where).scalar_subquery()
+
+    row = db.session.execute(select(
+        count(Users).label("users"),
+        count(Users, func.lower(func.trim(Users.role)) == ROLE_STUDENT).label("students"),
+        count(Users, func.lower(func.trim(Users.role)) == ROLE_TEACHER).label("teachers"),
+        count(Users, func.lower(func.trim(Users.role)) == ROLE_ADMIN).label("admins"),
+        count(Modules).label("modules"),
+        count(Modules, Modules.is_published == True).label("published"),
+        count(Activities).label("activities"),
+        count(Attempts).label("attempts"),
+    ), bind_arguments=bind_arguments).one()
+    return dict(row._mapping)
+
+
+def _primary() -> dict:
+    # todo lo de reconcile va al primario, aunque sea un GET del dashboard (réplica)
+    return {"bind": db.engine}
+
+
+def _lock_counters() -> None:
+    """
+    Frena los incrementos concurrentes hasta el commit, para que ninguno caiga
+    entre el COUNT y el reemplazo. Va antes del COUNT: los que ya incrementaron
+    terminan primero y el COUNT los ve.
+    """
+    if db.engine.dialect.name == "postgresql":
+        # EXCLUSIVE deja leer pero no escribir la tabla
+        db.session.execute(text("LOCK TABLE global_counters IN EXCLUSIVE MODE"), bind_arguments=_primary())
+    else:
+        # SQLite: cualquier escritura toma el lock de escritura de toda la base
+        db.session.execute(
+            update(GlobalCounters).where(GlobalCounters.name == RECONCILED_AT)
+            .values(value=GlobalCounters.value)
+        )
+
+
+def reconcile() -> dict:
+    """Reemplaza los contadores por los conteos exactos (en una transacción)."""
+    _lock_counters()
+    counts = exact_counts(bind_arguments=_primary())
+    rows = [{"name": n, "shard": 0, "value": int(v)} for n, v in counts.items()]
+    rows += [{"name": n, "shard": s, "value": 0} for n in counts for s in range(1, SHARDS)]
+    rows.append({"name": RECONCILED_AT, "shard": 0, "value": int(time.time())})
+
+    # UPDATE en el lugar (no DELETE + INSERT): un incremento que esperaba el
+    # lock se aplica sobre el valor nuevo en vez de perderse con la fila borrada
+    table = GlobalCounters.__table__
+    existing = set(db.session.execute(select(table.c.name, table.c.shard), bind_arguments=_primary()).all())
+    old = [{"k_name": r["name"], "k_shard": r["shard"], "v": r["value"]}
+           for r in rows if (r["name"], r["shard"]) in existing]
+    new = [r for r in rows if (r["name"], r["shard"]) not in existing]
+    if old:
+        db.session.execute(
+            table.update()
+            .where(table.c.name == bindparam("k_name"), table.c.shard == bindparam("k_shard"))
+            .values(value=bindparam("v")),
+            old,
+        )
+    if new:
+        db.session.execute(table.insert(), new)
+    db.session.commit()
+    return counts
+
+
+def estimated_counts() -> dict:
+    """Estimación por estadísticas del catálogo (solo PostgreSQL; {} en otros motores)."""
+    if db.engine.dialect.name != "postgresql":
+        return {}
+    rows = db.session.execute(
+        text("SELECT relname, GREATEST(reltuples, 0)::bigint FROM pg_class "
+             "WHERE relkind = 'r' AND relname = ANY(:names)"),
+        {"names": list(_ESTIMABLE.values())},
+    ).all()
+    by_table = dict(rows)
+    return {name: int(by_table[t]) for name, t in _ESTIMABLE.items() if t in by_table}
+
+
+def _reconciled_at(bind_arguments=None):
+    return db.session.execute(
+        select(GlobalCounters.value)
+        .where(GlobalCounters.name == RECONCILED_AT, GlobalCounters.shard == 0),
+        bind_arguments=bind_arguments,
+    ).scalar()
+
+
+def reconcile_if_stale(max_age: int):
+    """
+    Reconcilia si la última reconciliación tiene más de `max_age` s; si no,
+    None. La corren todos los workers: después del lock se vuelve a mirar,
+    así que solo el primero hace los COUNT(*).
+    """
+    at = _reconciled_at(bind_arguments=_primary())
+    if at is not None and time.time() - at < max_age:
+        return None
+    _lock_counters()
+    at = _reconciled_at(bind_arguments=_primary())
+    if at is not None and time.time() - at < max_age:
+        db.session.rollback()  # otro worker acaba de reconciliar; suelta el lock
+        return None
+    return reconcile()
+
+
+def read() -> dict:
+    """
+    Contadores para el dashboard con una sola consulta barata, sin escribir.
+    Con la tabla vacía (nunca se reconcilió) devuelve la estimación del
+    catálogo en PostgreSQL o ceros; `stale` avisa que falta reconciliar.
+    """
+    rows = db.session.execute(
+        select(GlobalCounters.name, func.sum(GlobalCounters.value)).group_by(GlobalCounters.name)
+    ).all()
+    values = {name: int(total or 0) for name, total in rows}
+
+    zeros = {n: 0 for n in COUNTER_NAMES}
+    if not values:
+        est = estimated_counts()
+        return {**zeros, **est, "estimated": bool(est), "stale": True}
+
+    max_age = current_app.config.get("COUNTERS_RECONCILE_SECONDS", 3600)
+    at = values.pop(RECONCILED_AT, 0)
+    stale = bool(max_age) and time.time() - at > 2 * max_age  # margen: el hilo corre cada max_age
+    return {**zeros, **values, "estimated": False, "stale": stale}
@@ -0,0 +1,174 @@
+"""
+Pool de conexiones: métricas y statement_timeout por rol.
+
+- `TimedQueuePool` es el QueuePool de SQLAlchemy que además mide cuánto
+  espera cada checkout (y cuántos fallan por pool_timeout). Con eso y la
+  saturación (conexiones en uso / pool_size + max_overflow) se dimensionan
+  los workers de gunicorn contra las conexiones de Postgres con datos.
+  Las métricas son por proceso (y por engine): `/admin/api/db-pool` y la tarjeta del
+  dashboard muestran las del worker que atiende.
+
+- `statement_timeout` según quién hace el request (DB_STATEMENT_TIMEOUTS):
+  el valor "default" va en la conexión (`-c statement_timeout`) y los roles
+  con otro valor lo cambian con `SET LOCAL` al empezar cada transacción. Con
+  PgBouncer en modo transacción (DB_PGBOUNCER=1) no se pueden mandar
+  parámetros de arranque, así que siempre va por `SET LOCAL`.
+
+La configuración sale de variables de entorno (ver `engine_options_from_env`
+en config.py y `ProductionConfig`).
+"""
+import threading
+import time
+from collections import deque
+
+from flask import current_app, g, has_request_context
+from sqlalchemy import event, exc
+from sqlalchemy.orm import Session
+from sqlalchemy.pool import NullPool, QueuePool
+
+_WAIT_SAMPLES = 2000
+
+
+class PoolMetrics:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.waits = deque(maxlen=_WAIT_SAMPLES)  # segundos, últimos checkouts
+        self.checkouts = 0
+        self.timeouts = 0
+        self.wait_total = 0.0
+        self.wait_max = 0.0
+        self.in_use_max = 0
+
+    def record(self, seconds: float, in_use: int) -> None:
+        with self._lock:
+            self.waits.append(seconds)
+            self.checkouts += 1
+            self.wait_total += seconds
+            self.wait_max = max(self.wait_max, seconds)
+            self.in_use_max = max(self.in_use_max, in_use)
+
+    def timeout(self) -> None:
+        with self._lock:
+            self.timeouts += 1
+
+    def snapshot(self, pool=None) -> dict:
+        with self._lock:
+            waits = sorted(self.waits)
+            out = {
+                "checkouts": self.checkouts,
+                "timeouts": self.timeouts,
+                "wait_avg_ms": round(1000 * self.wait_total / self.checkouts, 2) if self.checkouts else 0.0,
+                "wait_p95_ms": round(1000 * waits[int(0.95 * (len(waits) - 1))], 2) if waits else 0.0,
+                "wait_max_ms": round(1000 * self.wait_max, 2),
+                "in_use_max": self.in_use_max,
+            }
+        if isinstance(pool, QueuePool):
+            capacity = pool.size() + max(0, pool._max_overflow)
+            in_use = pool.checkedout()
+            out.update({
+                "pool_size": pool.size(),
+                "max_overflow": pool._max_overflow,
+                "in_use": in_use,
+                "idle": pool.checkedin(),
+                "saturation": round(in_use / capacity, 3) if capacity else 0.0,
+                "saturation_max": round(self.in_use_max / capacity, 3) if capacity else 0.0,
+            })
+        return out
+
+
+_UNMEASURED = PoolMetrics()  # pools sin medición (NullPool, SQLite en memoria): solo lo que reporta el pool
+
+
+_depth = threading.local()
+
+
+class TimedQueuePool(QueuePool):
+    """QueuePool que registra el tiempo de espera de cada checkout."""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.metrics = PoolMetrics()  # una por engine (primario / réplica)
+
+    def recreate(self):
+        # engine.dispose() crea un pool nuevo; las métricas siguen
+        pool = super().recreate()
+        pool.metrics = self.metrics
+        return pool
+
+    def _do_get(self):
+        # QueuePool._do_get se llama a sí mismo; solo se mide la llamada externa
+        if getattr(_depth, "n", 0):
+            return super()._do_get()
+        _depth.n = 1
+        t0 = time.perf_counter()
+        try:
+            rec = super()._do_get()
+        except exc.TimeoutError:
+            self.metrics.timeout()
+            raise
+        finally:
+            _depth.n = 0
+        self.metrics.record(time.perf_counter() - t0, self.checkedout())
+        return rec
+
+
+def configure(app) -> None:
+    """Antes de `db.init_app`: usa TimedQueuePool si el engine va con QueuePool."""
+    # copia: el dict vive en la clase de config y lo comparten todas las apps
+    opts = app.config["SQLALCHEMY_ENGINE_OPTIONS"] = dict(app.config.get("SQLALCHEMY_ENGINE_OPTIONS") or {})
+    in_memory = ":memory:" in app.config.get("SQLALCHEMY_DATABASE_URI", "")
+    if app.config.get("DB_POOL_METRICS") and "poolclass" not in opts and not in_memory:
+        opts["poolclass"] = TimedQueuePool
+    if opts.get("poolclass") is NullPool:
+        for k in ("pool_size", "max_overflow", "pool_timeout"):
+            opts.pop(k, None)
+    if app.config.get("DB_STATEMENT_TIMEOUTS"):
+        _register_timeouts()
+
+
+def snapshot(engine) -> dict:
+    pool = engine.pool
+    return getattr(pool, "metrics", _UNMEASURED).snapshot(pool)
+
+
+# --- statement_timeout por rol ---
+_registered = False
+
+
+def _request_role():
+    """Rol del request sin disparar consultas (solo si ya se cargó el usuario)."""
+    if not has_request_context():
+        return "background"
+    claims = g.get("_jwt_extended_jwt")
+    if claims and claims.get("role"):
+        return claims["role"]
+    user = g.get("_login_user")
+    role = getattr(user, "role", None) if user is not None else None
+    return role or "anonymous"
+
+
+def statement_timeout_for(config, role):
+    timeouts = config.get("DB_STATEMENT_TIMEOUTS") or {}
+    return timeouts.get(role, timeouts.get("default"))
+
+
+def _after_begin(session, transaction, connection):
+    if connection.dialect.name != "postgresql":
+        return
+    try:
+        cfg = current_app.config
+    except RuntimeError:  # fuera del app context
+        return
+    ms = statement_timeout_for(cfg, _request_role())
+    if ms is None:
+        return
+    if ms == statement_timeout_for(cfg, "default") and not cfg.get("DB_PGBOUNCER"):
+        return  # ya viene en la conexión
+    connection.exec_driver_sql(f"SET LOCAL statement_timeout = {int(ms)}")
+
+
+def _register_timeouts() -> None:
+    global _registered
+    if not _registered:
+        event.listen(Session, "after_begin", _after_begin)
+        _registered = True
@@ -0,0 +1,133 @@
+"""
+Exportación en streaming de `attempts` (CSV o NDJSON, opcionalmente gzip).
+
+Las filas se leen con cursor del lado del servidor (`stream_results` +
+`yield_per`) y se escriben por bloques, así que la memoria se mantiene
+constante sin importar cuántos intentos haya.
+"""
+import csv
+import io
+import json
+import zlib
+from datetime import datetime
+
+from flask import Response, stream_with_context
+from sqlalchemy import select
+
+from . import db
+from .models import Users, Activities, Attempts
+
+EXPORT_FORMATS = ("csv", "ndjson")
+EXPORT_COLUMNS = (
+    "id", "user_id", "user_email", "user_name", "activity_id", "activity_title",
+    "module_id", "score", "answers_json", "started_at", "ended_at",
+)
+YIELD_PER = 2000
+FLUSH_ROWS = 500
+
+
+def attempts_select():
+    """SELECT base (solo columnas, sin objetos ORM) para la exportación."""
+    return (
+        select(
+            Attempts.id,
+            Attempts.user_id,
+            Users.email.label("user_email"),
+            Users.name.label("user_name"),
+            Attempts.activity_id,
+            Activities.title.label("activity_title"),
+            Activities.module_id,
+            Attempts.score,
+            Attempts.answers_json,
+            Attempts.started_at,
+            Attempts.ended_at,
+        )
+        .select_from(Attempts)
+        .outerjoin(Users, Users.id == Attempts.user_id)
+        .outerjoin(Activities, Activities.id == Attempts.activity_id)
+        .order_by(Attempts.id.asc())
+    )
+
+
+def apply_filters(stmt, args):
+    """Filtros opcionales comunes: activity_id, module_id, since/until (ISO)."""
+    activity_id = args.get("activity_id", type=int)
+    module_id = args.get("module_id", type=int)
+    if activity_id:
+        stmt = stmt.where(Attempts.activity_id == activity_id)
+    if module_id:
+        stmt = stmt.where(Activities.module_id == module_id)
+    for name, op in (("since", "__ge__"), ("until", "__lt__")):
+        raw = (args.get(name) or "").strip()
+        if raw:
+            try:
+                stmt = stmt.where(getattr(Attempts.started_at, op)(datetime.fromisoformat(raw)))
+            except ValueError:
+                pass
+    return stmt
+
+
+def _iter_rows(stmt):
+    result = db.session.execute(
+        stmt.execution_options(stream_results=True, yield_per=YIELD_PER)
+    )
+    try:
+        for partition in result.partitions():
+            yield from partition
+    finally:
+        result.close()
+
+
+def _jsonable(v):
+    return v.isoformat() if isinstance(v, datetime) else v
+
+
+def _csv_chunks(rows):
+    buf = io.StringIO()
+    w = csv.writer(buf)
+    w.writerow(EXPORT_COLUMNS)
+    n = 0
+    for r in rows:
+        w.writerow(["" if v is None else _jsonable(v) for v in r])
+        n += 1
+        if n % FLUSH_ROWS == 0:
+            yield buf.getvalue()
+            buf.seek(0); buf.truncate()
+    yield buf.getvalue()
+
+
+def _ndjson_chunks(rows):
+    parts = []
+    for r in rows:
+        parts.append(json.dumps(dict(zip(EXPORT_COLUMNS, map(_jsonable, r))), ensure_ascii=False))
+        if len(parts) >= FLUSH_ROWS:
+            yield "\n".join(parts) + "\n"
+            parts = []
+    if parts:
+        yield "\n".join(parts) + "\n"
+
+
+def _gzip(chunks):
+    z = zlib.compressobj(6, zlib.DEFLATED, 31)  # wbits=31 -> contenedor gzip
+    for chunk in chunks:
+        data = z.compress(chunk.encode("utf-8"))
+        if data:
+            yield data
+    yield z.flush()
+
+
+def stream_attempts(stmt, fmt: str = "csv", gzip: bool = False, filename: str = "attempts") -> Response:
+    """Response generadora para `stmt` (ver `attempts_select`)."""
+    fmt = fmt if fmt in EXPORT_FORMATS else "csv"
+    chunks = (_csv_chunks if fmt == "csv" else _ndjson_chunks)(_iter_rows(stmt))
+    mimetype = "text/csv" if fmt == "csv" else "application/x-ndjson"
+    name = f"{filename}.{fmt}"
+    if gzip:
+        chunks = _gzip(chunks)
+        mimetype, name = "application/gzip", name + ".gz"
+
+    resp = Response(stream_with_context(chunks), mimetype=mimetype)
+    resp.headers["Content-Disposition"] = f'attachment; filename="{name}"'
+    resp.headers["Cache-Control"] = "no-store"
+    resp.headers["X-Accel-Buffering"] = "no"  # que nginx no bufferice el stream
+    return resp
@@ -0,0 +1,67 @@
+"""
+Invalidación de cachés por proceso entre workers.
+
+Cada caché en memoria (gradebook, identidad...) vive en un worker; limpiarla
+con `clear()` solo afecta a ese proceso. Para invalidarla en todos, se sube
+su generación en `cache_generations` (`bump`) y cada worker compara la
+generación con la que tenía al llenar la caché (`current`). La lectura de la
+tabla se hace como mucho cada CACHE_SYNC_SECONDS por proceso, así que un
+`bump` llega a los demás workers con ese retraso y no cuesta una consulta
+por request.
+"""
+import threading
+import time
+
+from flask import current_app
+from sqlalchemy import select, update
+
+from . import db
+from .models import CacheGenerations
+
+# estado por proceso
+_seen = {}       # name -> generación leída de la BD
+_synced_at = 0.0
+_lock = threading.Lock()
+
+
+def _sync(force: bool = False) -> None:
+    global _synced_at
+    every = float(current_app.config.get("CACHE_SYNC_SECONDS", 2))
+    if not force and time.monotonic() - _synced_at < every:
+        return
+    try:
+        rows = db.session.execute(select(CacheGenerations.name, CacheGenerations.value)).all()
+    except Exception:
+        db.session.rollback()  # sin la tabla (BD vieja): solo invalidación local
+        rows = []
+    with _lock:
+        _seen.update({name: int(value) for name, value in rows})
+        _synced_at = time.monotonic()
+
+
+def current(name: str) -> int:
+    """Generación vigente de `name` (0 si nunca se invalidó)."""
+    _sync()
+    return _seen.get(name, 0)
+
+
+def bump(name: str) -> int:
+    """Invalida `name` en todos los workers (commit propio)."""
+    res = db.session.execute(
+        update(CacheGenerations).where(CacheGenerations.name == name)
+        .values(value=CacheGenerations.value + 1)
+    )
+    if not res.rowcount:
+        db.session.add(CacheGenerations(name=name, value=1))
+    try:
+        db.session.commit()
+    except Exception:
+        # dos workers insertando la primera fila a la vez: el otro ganó
+        db.session.rollback()
+        db.session.execute(
+            update(CacheGenerations).where(CacheGenerations.name == name)
+            .values(value=CacheGenerations.value + 1)
+        )
+        db.session.commit()
+    _sync(force=True)
+    return _seen.get(name, 0)
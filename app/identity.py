@@ -0,0 +1,112 @@
+"""
+Identidad cacheada para Flask-Login.
+
+`load_user` corría `Users.query.get` en cada request autenticado y los layouts
+además tocaban `current_user.profile` (otra consulta). Aquí se cachean, por
+proceso y con TTL corto, los campos del usuario y de su perfil en un dict;
+con un hit, `current_user` se arma sin tocar la BD.
+
+`current_user` pasa a ser un `CachedUser`: los campos de arriba y `profile`
+son copias de solo lectura. Cualquier otro atributo (relaciones, métodos del
+modelo) carga el `Users` real la primera vez que se pide. Las escrituras
+siguen yendo por el modelo (p. ej. `_get_or_create_profile`) y deben llamar a
+`invalidate(user_id)` después del commit. `invalidate_all` (acciones en lote
+sobre usuarios) llega a todos los workers vía app/generations.py.
+"""
+from types import SimpleNamespace
+
+from flask import current_app
+from flask_login import UserMixin
+from sqlalchemy import select
+
+from . import db, generations
+from .cache import TTLCache
+from .models import Users, StudentProfiles
+
+USER_FIELDS = ("id", "name", "email", "role", "locale", "created_at")
+PROFILE_FIELDS = (
+    "id", "user_id", "credit_score", "cash_balance", "salary_monthly", "has_car",
+    "car_payment_monthly", "level", "xp", "energy", "created_at",
+)
+
+# user_id -> {"user": {...}, "profile": {...} | None, "gen": generación}
+_cache = TTLCache(ttl=30, maxsize=10000)
+_GENERATION = "identity"
+
+
+class CachedUser(UserMixin):
+    """`current_user` liviano; lo que no está cacheado cae al modelo `Users`."""
+
+    def __init__(self, data: dict):
+        self.__dict__.update(data["user"])
+        p = data["profile"]
+        self.__dict__["profile"] = SimpleNamespace(**p) if p else None
+
+    def get_id(self):
+        return str(self.id)
+
+    def _orm(self):
+        u = self.__dict__.get("_orm_user")
+        if u is None:
+            u = db.session.get(Users, self.id)
+            self.__dict__["_orm_user"] = u
+        return u
+
+    def __getattr__(self, name):
+        # solo se llama si el atributo no está en la copia cacheada
+        if name.startswith("_"):
+            raise AttributeError(name)
+        u = self._orm()
+        if u is None:
+            raise AttributeError(name)
+        return getattr(u, name)
+
+    def __repr__(self):
+        return f"<CachedUser {self.id} {self.role}>"
+
+
+def _fetch(user_id: int):
+    u_cols = [getattr(Users, f) for f in USER_FIELDS]
+    p_cols = [getattr(StudentProfiles, f).label(f"p_{f}") for f in PROFILE_FIELDS]
+    row = db.session.execute(
+        select(*u_cols, *p_cols)
+        .outerjoin(StudentProfiles, StudentProfiles.user_id == Users.id)
+        .where(Users.id == user_id)
+    ).first()
+    if row is None:
+        return None
+    m = row._mapping
+    user = {f: m[f] for f in USER_FIELDS}
+    profile = {f: m[f"p_{f}"] for f in PROFILE_FIELDS} if m["p_id"] is not None else None
+    return {"user": user, "profile": profile}
+
+
+def load_identity(user_id: int):
+    """Loader de Flask-Login: CachedUser (o el modelo, si la caché está apagada)."""
+    ttl = current_app.config.get("IDENTITY_CACHE_SECONDS", 30)
+    if not ttl:
+        return db.session.get(Users, user_id)
+    gen = generations.current(_GENERATION)
+    data = _cache.get(user_id)
+    if data is None or data["gen"] != gen:
+        data = _fetch(user_id)
+        if data is None:
+            return None  # no se cachea: así un usuario recién creado entra enseguida
+        data["gen"] = gen
+        _cache.set(user_id, data, ttl=ttl)
+    return CachedUser(data)
+
+
+def invalidate(user_id) -> None:
+    """
+    Llamar después de cambiar el perfil del usuario. Solo limpia este worker:
+    para rol, nombre o borrado (lo que da o quita acceso) usar `invalidate_all`.
+    """
+    if user_id is not None:
+        _cache.pop(int(user_id))
+
+
+def invalidate_all() -> None:
+    """Limpia la caché en todos los workers (commit propio)."""
+    _cache.clear()
+    generations.bump(_GENERATION)
@@ -0,0 +1,93 @@
+"""
+Jobs en segundo plano (re-score, acciones en lote) con estado compartido.
+
+El trabajo corre en un hilo del worker que lo lanzó, pero el estado
+(progreso, error, quién lo pidió) vive en `background_jobs`: el endpoint de
+estado responde lo mismo sin importar qué worker de gunicorn atienda el poll.
+Cada reporte de progreso es un UPDATE en su propia conexión, fuera de la
+transacción del trabajo.
+
+Si el worker muere a mitad de camino el job queda "running" sin avanzar;
+después de STALE_SECONDS sin progreso se informa como "error". Los jobs
+terminados hace más de RETENTION_DAYS se borran al lanzar uno nuevo.
+"""
+import json
+import threading
+import uuid
+from datetime import datetime, timedelta
+
+from sqlalchemy import delete, update
+
+from . import db
+from .models import BackgroundJobs, ROLE_ADMIN
+
+STALE_SECONDS = 600
+RETENTION_DAYS = 7
+
+
+def _save(job_id: str, **values) -> None:
+    if "stats" in values:
+        values["stats_json"] = json.dumps(values.pop("stats"))
+    values["updated_at"] = datetime.utcnow()
+    if values.get("state") in ("done", "error"):
+        values["finished_at"] = values["updated_at"]
+    with db.engine.begin() as conn:
+        conn.execute(update(BackgroundJobs.__table__)
+                     .where(BackgroundJobs.id == job_id).values(**values))
+
+
+def start(app, kind: str, work, params=None, stats=None, requested_by=None) -> str:
+    """
+    Registra el job y corre `work(progress)` en un hilo con app context.
+    `progress(stats)` guarda el dict de progreso; una excepción deja el job en "error".
+    """
+    job_id = uuid.uuid4().hex[:12]
+    now = datetime.utcnow()
+    db.session.execute(delete(BackgroundJobs).where(
+        BackgroundJobs.finished_at < now - timedelta(days=RETENTION_DAYS)))
+    db.session.add(BackgroundJobs(
+        id=job_id, kind=kind, requested_by=requested_by, state="running",
+        params_json=json.dumps(params or {}), stats_json=json.dumps(stats or {}),
+        started_at=now, updated_at=now,
+    ))
+    db.session.commit()
+
+    def progress(st):
+        _save(job_id, stats=st)
+
+    def run():
+        with app.app_context():
+            try:
+                work(progress)
+                _save(job_id, state="done")
+            except Exception as e:  # el error queda en el estado del job
+                db.session.rollback()
+                _save(job_id, state="error", error=str(e))
+            finally:
+                db.session.remove()
+
+    threading.Thread(target=run, name=f"{kind}-{job_id}", daemon=True).start()
+    return job_id
+
+
+def status(job_id: str, kind: str, user=None):
+    """
+    Estado del job como dict (params y progreso aplanados), o None si no
+    existe, es de otro tipo o `user` no lo pidió (los admins ven todos).
+    """
+    row = db.session.get(BackgroundJobs, job_id)
+    if row is None or row.kind != kind:
+        return None
+    if user is not None and row.requested_by != user.id and user.role != ROLE_ADMIN:
+        return None
+    st = {
+        "id": row.id, "kind": row.kind, "requested_by": row.requested_by,
+        **json.loads(row.params_json or "{}"), **json.loads(row.stats_json or "{}"),
+        "state": row.state, "error": row.error,
+        "started_at": row.started_at.isoformat(timespec="seconds"),
+        "finished_at": row.finished_at.isoformat(timespec="seconds") if row.finished_at else None,
+    }
+    if row.state == "running" and datetime.utcnow() - row.updated_at > timedelta(seconds=STALE_SECONDS):
+        st["state"] = "error"
+        st["error"] = "el job dejó de reportar progreso (¿se reinició el worker?)"
+    return st
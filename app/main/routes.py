@@ -1,7 +1,16 @@
-from flask import render_template
+from flask import render_template, jsonify
 from flask_login import current_user
 from . import main_bp
 
 @main_bp.route("/")
 def index():
     return render_template("main/index.html", user=current_user if current_user.is_authenticated else None)
+
+
+@main_bp.route("/healthz/ready")
+def healthz_ready():
+    """Readiness del worker que atiende: 503 hasta terminar el warm-up (ver app/warmup.py)."""
+    from flask import current_app
+    from app import warmup
+    st = warmup.run_once(current_app._get_current_object())  # sin gunicorn nadie lo corrió
+    return jsonify(st), (200 if st["ready"] else 503)
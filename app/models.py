@@ -25,7 +25,9 @@ class Users(UserMixin, db.Model):
 
 @login_manager.user_loader
 def load_user(user_id: str) -> Optional["Users"]:
-    return Users.query.get(int(user_id))
+    # usuario + perfil desde la caché de identidad (ver app/identity.py)
+    from .identity import load_identity
+    return load_identity(int(user_id))
 
 # --- Lightweight request metrics (for admin dashboard) ---
 class RequestLog(db.Model):
@@ -37,10 +39,54 @@ class RequestLog(db.Model):
     duration_ms = db.Column(db.Integer, nullable=False)  # rounded ms
     created_at = db.Column(db.DateTime, default=datetime.utcnow, index=True)
 
+    # p95 por ruta en una ventana (dashboard de admin)
+    __table_args__ = (db.Index("ix_request_log_path_created_at", "path", "created_at"),)
+
     def __repr__(self):
         return f"<RequestLog {self.method} {self.path} {self.status_code} {self.duration_ms}ms>"
 
 
+# --- Contadores globales del dashboard (ver app/counters.py) ---
+class GlobalCounters(db.Model):
+    __tablename__ = "global_counters"
+    name = db.Column(db.String(40), primary_key=True)
+    shard = db.Column(db.SmallInteger, primary_key=True, default=0)
+    value = db.Column(db.BigInteger, nullable=False, default=0)
+
+
+# --- Tokens JWT revocados (ver app/revocation.py) ---
+class RevokedTokens(db.Model):
+    __tablename__ = "revoked_tokens"
+    id = db.Column(db.Integer, primary_key=True)
+    jti = db.Column(db.String(64), unique=True)  # NULL = todos los tokens del usuario
+    user_id = db.Column(db.Integer, nullable=False, index=True)  # sin FK: sobrevive al borrado
+    not_before = db.Column(db.DateTime)  # tokens con iat anterior quedan revocados
+    expires_at = db.Column(db.DateTime, index=True)
+    created_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+
+
+# --- Jobs en segundo plano (ver app/jobs.py) ---
+class BackgroundJobs(db.Model):
+    __tablename__ = "background_jobs"
+    id = db.Column(db.String(32), primary_key=True)
+    kind = db.Column(db.String(32), nullable=False)  # "rescore", "bulk"
+    requested_by = db.Column(db.Integer, index=True)  # sin FK: el job sobrevive al usuario
+    state = db.Column(db.String(16), nullable=False, default="running")
+    params_json = db.Column(db.Text)   # lo que identifica el job (actividad, tabla, acción)
+    stats_json = db.Column(db.Text)    # progreso: total, processed, changed...
+    error = db.Column(db.Text)
+    started_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow, index=True)
+    updated_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+    finished_at = db.Column(db.DateTime)
+
+
+# --- Generaciones de cachés por proceso (ver app/generations.py) ---
+class CacheGenerations(db.Model):
+    __tablename__ = "cache_generations"
+    name = db.Column(db.String(40), primary_key=True)
+    value = db.Column(db.BigInteger, nullable=False, default=0)
+
+
 class Classes(db.Model):
     __tablename__ = "classes"
     id = db.Column(db.Integer, primary_key=True)
@@ -72,6 +118,9 @@ class Attempts(db.Model):
     user = db.relationship("Users", lazy="joined")
     activity = db.relationship("Activities", lazy="joined")
 
+    # intentos usados por actividad y avance por módulo (ver app/plans.py)
+    __table_args__ = (db.Index("ix_attempts_user_activity", "user_id", "activity_id"),)
+
 
 
 
@@ -154,6 +203,10 @@ class Modules(db.Model):
     level = db.Column(db.Integer)
     xp_reward = db.Column(db.Integer)
     content_json = db.Column(db.Text, nullable=True)
+    # sube en cada guardado de content_json (autosave con control de concurrencia)
+    content_version = db.Column(db.Integer, nullable=False, default=0, server_default="0")
+    # versión inmutable que ven los estudiantes (ver app/versions.py)
+    published_version_id = db.Column(db.Integer, nullable=True)
 
 
     # one-to-many: a module has many activities
@@ -164,6 +217,16 @@ class Modules(db.Model):
         cascade="all, delete-orphan"
     )
 
+class ModuleVersions(db.Model):
+    """Foto inmutable (módulo + actividades publicadas), direccionada por hash."""
+    __tablename__ = "module_versions"
+    id = db.Column(db.Integer, primary_key=True)
+    module_id = db.Column(db.Integer, db.ForeignKey("modules.id", ondelete="CASCADE"), nullable=False, index=True)
+    content_hash = db.Column(db.String(64), nullable=False)
+    snapshot_json = db.Column(db.Text, nullable=False)
+    created_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+    __table_args__ = (db.UniqueConstraint("module_id", "content_hash", name="uq_module_versions_module_hash"),)
+
 class Activities(db.Model):
     __tablename__ = "activities"
     id = db.Column(db.Integer, primary_key=True)
@@ -191,6 +254,11 @@ class Activities(db.Model):
     module = db.relationship("Modules", back_populates="activities")
     xp_on_finish = db.Column(db.Integer, nullable=True, default=0)
 
+    # actividades publicadas de un módulo, en orden
+    __table_args__ = (
+        db.Index("ix_activities_module_published_position", "module_id", "is_published", "position"),
+    )
+
 # —— Global game knobs teachers can tune (single row id=1) ——
 class GameSettings(db.Model):
     __tablename__ = "game_settings"
@@ -285,17 +353,20 @@ class GroupMembers(db.Model):
     __tablename__ = "group_members"
     id = db.Column(db.Integer, primary_key=True)
     group_id = db.Column(db.Integer, db.ForeignKey("groups.id", ondelete="CASCADE"))
-    user_id = db.Column(db.Integer, db.ForeignKey("users.id", ondelete="CASCADE"))
+    user_id = db.Column(db.Integer, db.ForeignKey("users.id", ondelete="CASCADE"), index=True)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
 
     # relación al usuario (estudiante)
     user = db.relationship("Users", backref=backref("group_memberships", lazy="select"))
 
+    # roster del grupo y "¿está en el grupo?"
+    __table_args__ = (db.Index("ix_group_members_group_user", "group_id", "user_id"),)
+
 
 class ModuleAssignments(db.Model):
     __tablename__ = "module_assignments"
     id = db.Column(db.Integer, primary_key=True)
-    group_id = db.Column(db.Integer, db.ForeignKey("groups.id", ondelete="CASCADE"))
+    group_id = db.Column(db.Integer, db.ForeignKey("groups.id", ondelete="CASCADE"), index=True)
     module_id = db.Column(db.Integer, db.ForeignKey("modules.id", ondelete="CASCADE"))
     due_date = db.Column(db.DateTime)
 
@@ -341,6 +412,8 @@ class MissionProgress(db.Model):
 
     __table_args__ = (
         db.UniqueConstraint("mission_id", "user_id", name="uq_mission_user"),
+        # el unique empieza por mission_id; las misiones de un usuario van por acá
+        db.Index("ix_mission_progress_user_mission", "user_id", "mission_id"),
     )
 
 
@@ -0,0 +1,132 @@
+"""
+Hash y verificación de contraseñas fuera del worker de requests.
+
+PBKDF2/scrypt son caros a propósito; si 40 estudiantes entran a la vez, el
+cálculo ocupaba todos los workers. Aquí se hace en un pool de procesos
+acotado (PASSWORD_POOL_WORKERS) con un límite de trabajos en cola
+(PASSWORD_POOL_MAX_PENDING): si está lleno se lanza `PoolBusy` de inmediato
+y la vista contesta 503 + Retry-After en vez de encolar sin límite.
+
+El método de hash es configurable (PASSWORD_HASH_METHOD, formato de
+Werkzeug, p. ej. "scrypt:32768:8:1" o "pbkdf2:sha256:600000"); cuando un
+login correcto trae un hash con otros parámetros, se re-hashea.
+"""
+import threading
+from concurrent.futures import ProcessPoolExecutor, TimeoutError as FutureTimeout
+from functools import lru_cache
+
+from flask import current_app
+from werkzeug.security import check_password_hash, generate_password_hash
+
+
+class PoolBusy(RuntimeError):
+    """No hay cupo en el pool de hashing; el cliente debe reintentar."""
+
+
+# se crean perezosamente en cada proceso (después del fork de gunicorn)
+_pool = None
+_slots = None
+_pool_lock = threading.Lock()
+
+
+def _hash(raw: str, method: str) -> str:
+    return generate_password_hash(raw, method=method)
+
+
+def _verify(hashed: str, raw: str) -> bool:
+    return check_password_hash(hashed, raw)
+
+
+def _config():
+    cfg = current_app.config
+    return (
+        int(cfg.get("PASSWORD_POOL_WORKERS", 2)),
+        int(cfg.get("PASSWORD_POOL_MAX_PENDING", 16)),
+        float(cfg.get("PASSWORD_POOL_TIMEOUT", 10)),
+    )
+
+
+def _get_pool():
+    global _pool, _slots
+    workers, max_pending, _ = _config()
+    if workers <= 0:
+        return None
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                _slots = threading.BoundedSemaphore(max_pending)
+                _pool = ProcessPoolExecutor(max_workers=workers)
+    return _pool
+
+
+def _run(fn, *args):
+    pool = _get_pool()
+    if pool is None:  # PASSWORD_POOL_WORKERS=0: en línea (dev/CLI)
+        return fn(*args)
+    if not _slots.acquire(blocking=False):
+        raise PoolBusy("password pool saturated")
+    try:
+        fut = pool.submit(fn, *args)
+    except Exception:
+        _slots.release()
+        raise
+    fut.add_done_callback(lambda _f: _slots.release())
+    try:
+        return fut.result(timeout=_config()[2])
+    except FutureTimeout:
+        raise PoolBusy("password pool timeout")
+
+
+def shutdown() -> None:
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool.shutdown(wait=False, cancel_futures=True)
+            _pool = None
+
+
+def reset_after_fork() -> None:
+    """En un worker recién forkeado: el pool del padre no sirve, se crea otro al usarlo."""
+    global _pool, _slots, _pool_lock
+    _pool = None
+    _slots = None
+    _pool_lock = threading.Lock()
+
+
+def hash_method() -> str:
+    return current_app.config.get("PASSWORD_HASH_METHOD") or "scrypt:32768:8:1"
+
+
+@lru_cache(maxsize=8)
+def _method_prefix(method: str) -> str:
+    """Prefijo completo que Werkzeug escribe para `method` (rellena defaults)."""
+    return generate_password_hash("x", method=method).split("$", 1)[0]
+
+
+def needs_rehash(hashed: str) -> bool:
+    return (hashed or "").split("$", 1)[0] != _method_prefix(hash_method())
+
+
+def hash_password(raw: str) -> str:
+    return _run(_hash, raw, hash_method())
+
+
+def verify_password(hashed: str, raw: str) -> bool:
+    if not hashed or raw is None:
+        return False
+    return _run(_verify, hashed, raw)
+
+
+def verify_and_upgrade(user, raw: str) -> bool:
+    """
+    Verifica la contraseña de `user`; si es correcta y el hash usa otros
+    parámetros, lo reemplaza (el caller hace commit). Puede lanzar PoolBusy.
+    """
+    if user is None or not verify_password(user.hashed_pw, raw):
+        return False
+    if needs_rehash(user.hashed_pw):
+        try:
+            user.hashed_pw = hash_password(raw)
+        except PoolBusy:
+            pass  # se actualiza en el próximo login
+    return True
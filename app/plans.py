@@ -0,0 +1,151 @@
+"""
+Planes de las consultas calientes y chequeo de regresiones (`flask check-plans`).
+
+Cada consulta de `hot_queries` replica un filtro del camino caliente
+(intentos usados, avance por módulo, grupos del estudiante, misiones, p95 del
+dashboard...). `check` corre EXPLAIN de cada una y la marca como fallida si
+hace un seq scan sobre una tabla de LARGE_TABLES, o sea si se perdió (o nunca
+se creó) el índice que la sostiene.
+
+En PostgreSQL el EXPLAIN va con `enable_seqscan = off`: con pocas filas el
+planner prefiere un seq scan aunque el índice exista, así que se le pide que
+lo evite y, si igual lo hace, es porque no tiene índice que usar. Así el
+chequeo sirve con el seed chico y con `flask seed --scale N`. En SQLite se
+usa `EXPLAIN QUERY PLAN` ("SCAN <tabla>" sin índice = seq scan).
+
+Si cambia una consulta del camino caliente, actualizar la de acá.
+"""
+import json
+import re
+from datetime import datetime, timedelta
+
+from sqlalchemy import func, inspect, select
+
+from . import db
+from .models import (
+    Activities, Attempts, GroupMembers, MissionProgress, ModuleAssignments,
+    RequestLog,
+)
+
+LARGE_TABLES = {
+    "attempts", "group_members", "module_assignments", "mission_progress",
+    "activities", "request_log",
+}
+
+
+def _first(column, default=1):
+    return db.session.scalar(select(func.min(column))) or default
+
+
+def _sample() -> dict:
+    """Ids reales si hay datos (el plan casi no depende del valor)."""
+    return {
+        "user_id": _first(Attempts.user_id),
+        "activity_id": _first(Attempts.activity_id),
+        "module_id": _first(Activities.module_id),
+        "group_id": _first(GroupMembers.group_id),
+        "since": datetime.utcnow() - timedelta(hours=1),
+    }
+
+
+def hot_queries(s: dict) -> list:
+    """(nombre, tablas, select) de cada consulta del camino caliente."""
+    uid, gid = s["user_id"], s["group_id"]
+    return [
+        # intentos usados en una actividad (student/services.activity_context)
+        ("attempts_used", ("attempts",),
+         select(func.count()).select_from(Attempts)
+         .where(Attempts.user_id == uid, Attempts.activity_id == s["activity_id"])),
+        # avance del estudiante en un módulo (_module_completed, modules_index)
+        ("module_progress", ("attempts", "activities"),
+         select(func.count()).select_from(Attempts)
+         .join(Activities, Activities.id == Attempts.activity_id)
+         .where(Attempts.user_id == uid, Activities.module_id == s["module_id"])),
+        # grupos del estudiante (dashboard)
+        ("student_groups", ("group_members",),
+         select(GroupMembers.group_id).where(GroupMembers.user_id == uid)),
+        # roster del grupo (gradebook) y "¿ya está en el grupo?"
+        ("group_roster", ("group_members",),
+         select(GroupMembers.user_id).where(GroupMembers.group_id == gid)),
+        ("group_membership", ("group_members",),
+         select(GroupMembers.id).where(GroupMembers.group_id == gid, GroupMembers.user_id == uid)),
+        # módulos asignados a los grupos del estudiante
+        ("group_assignments", ("module_assignments",),
+         select(ModuleAssignments.module_id).where(ModuleAssignments.group_id.in_([gid]))),
+        # progreso de misiones del estudiante
+        ("mission_progress", ("mission_progress",),
+         select(MissionProgress.mission_id, MissionProgress.is_completed)
+         .where(MissionProgress.user_id == uid)),
+        # actividades publicadas de un módulo, en orden
+        ("module_activities", ("activities",),
+         select(Activities.id)
+         .where(Activities.module_id == s["module_id"], Activities.is_published == True)  # noqa: E712
+         .order_by(Activities.position.asc())),
+        # p95 de una ruta en la última hora (dashboard de admin)
+        ("dashboard_p95", ("request_log",),
+         select(RequestLog.duration_ms)
+         .where(RequestLog.path == "/student/dashboard", RequestLog.created_at >= s["since"])),
+    ]
+
+
+def _compile(conn, stmt):
+    # render_postcompile: los IN (...) quedan expandidos para exec_driver_sql
+    return stmt.compile(dialect=conn.dialect, compile_kwargs={"render_postcompile": True})
+
+
+def _explain_postgres(conn, stmt):
+    compiled = _compile(conn, stmt)
+    conn.exec_driver_sql("SET LOCAL enable_seqscan = off")
+    raw = conn.exec_driver_sql("EXPLAIN (FORMAT JSON) " + str(compiled), compiled.params).scalar()
+    plan = json.loads(raw) if isinstance(raw, str) else raw
+    lines, seq = [], []
+
+    def walk(node, depth=0):
+        rel = node.get("Relation Name")
+        idx = node.get("Index Name")
+        lines.append("  " * depth + node["Node Type"]
+                     + (f" on {rel}" if rel else "") + (f" using {idx}" if idx else ""))
+        if node["Node Type"] == "Seq Scan" and rel:
+            seq.append(rel)
+        for child in node.get("Plans", []):
+            walk(child, depth + 1)
+
+    walk(plan[0]["Plan"])
+    return lines, seq
+
+
+_SQLITE_SCAN = re.compile(r"^SCAN (\w+)")
+
+
+def _explain_sqlite(conn, stmt):
+    compiled = _compile(conn, stmt)
+    params = tuple(compiled.params[k] for k in compiled.positiontup)
+    rows = conn.exec_driver_sql("EXPLAIN QUERY PLAN " + str(compiled), params).all()
+    lines, seq = [], []
+    for row in rows:
+        detail = row[-1]
+        lines.append(detail)
+        m = _SQLITE_SCAN.match(detail)
+        if m and "INDEX" not in detail:
+            seq.append(m.group(1))
+    return lines, seq
+
+
+def check(large_tables=LARGE_TABLES) -> list:
+    """EXPLAIN de cada consulta caliente: [{name, ok, skipped, plan, seq_scans}]."""
+    engine = db.engine
+    existing = set(inspect(engine).get_table_names())
+    explain = _explain_postgres if engine.dialect.name == "postgresql" else _explain_sqlite
+    results = []
+    for name, tables, stmt in hot_queries(_sample()):
+        missing = [t for t in tables if t not in existing]
+        if missing:
+            results.append({"name": name, "ok": True, "skipped": f"sin tabla {', '.join(missing)}",
+                            "plan": [], "seq_scans": []})
+            continue
+        with engine.connect() as conn, conn.begin() as tx:
+            lines, seq = explain(conn, stmt)
+            tx.rollback()  # SET LOCAL muere acá
+        bad = [t for t in seq if t in large_tables]
+        results.append({"name": name, "ok": not bad, "skipped": None, "plan": lines, "seq_scans": bad})
+    return results
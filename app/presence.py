@@ -0,0 +1,161 @@
+"""
+Presencia en línea (sesiones activas) servida desde memoria.
+
+Cada heartbeat (`admin.api_ping`) solo actualiza un diccionario del proceso
+indexado por id de `auth_sessions`. El `last_seen` durable se escribe en lote:
+como mucho una vez cada PRESENCE_FLUSH_SECONDS, con un solo UPDATE
+(executemany) para todas las sesiones que cambiaron.
+
+El conteo de "en línea" y el listado de sesiones activas se leen del mismo
+diccionario. Con varios workers, cada uno además re-sincroniza desde la BD
+cada PRESENCE_FLUSH_SECONDS para ver las sesiones que atienden los demás
+(y olvidar las que se cerraron en otro worker).
+"""
+import time
+from datetime import datetime, timedelta
+from threading import RLock
+
+from flask import current_app
+from sqlalchemy import bindparam, select, update
+
+from . import db
+from .models import AuthSession, Users
+
+ONLINE_SECONDS = 120     # "en línea" en el dashboard
+ACTIVE_SECONDS = 300     # listado de /admin/sessions
+
+
+class PresenceStore:
+    def __init__(self):
+        # sid -> {user_id, name, role, email, ip, login_at, last_seen, flushed}
+        self._entries = {}
+        self._lock = RLock()
+        self._last_flush = 0.0
+        self._last_sync = 0.0
+
+    # --- escrituras ---
+    def touch(self, sid: int, user, ip=None, login_at=None, flushed=None) -> None:
+        """Registra actividad de la sesión (sin tocar la BD)."""
+        now = datetime.utcnow()
+        with self._lock:
+            e = self._entries.get(sid)
+            if e is None:
+                e = self._entries[sid] = {
+                    "id": sid,
+                    "user_id": user.id,
+                    "name": getattr(user, "name", ""),
+                    "role": getattr(user, "role", ""),
+                    "email": getattr(user, "email", ""),
+                    "ip": ip,
+                    "login_at": login_at,  # si no se sabe, lo completa _sync
+                    "flushed": flushed,
+                }
+            elif ip and not e.get("ip"):
+                e["ip"] = ip
+            e["last_seen"] = now
+        self.maybe_flush()
+
+    def end(self, sid: int) -> None:
+        """La sesión se cerró (logout): deja de contar en este worker."""
+        with self._lock:
+            self._entries.pop(sid, None)
+
+    def _interval(self) -> float:
+        return float(current_app.config.get("PRESENCE_FLUSH_SECONDS", 60))
+
+    def maybe_flush(self) -> int:
+        if time.monotonic() - self._last_flush < self._interval():
+            return 0
+        try:
+            return self.flush()
+        except Exception:
+            # un heartbeat nunca debe fallar por esto; se reintenta luego
+            current_app.logger.exception("presence flush failed")
+            return 0
+
+    def flush(self) -> int:
+        """Escribe el último `last_seen` de cada sesión pendiente en un solo lote."""
+        with self._lock:
+            self._last_flush = time.monotonic()
+            pending = [
+                {"sid": e["id"], "ts": e["last_seen"]}
+                for e in self._entries.values()
+                if e["flushed"] is None or e["last_seen"] > e["flushed"]
+            ]
+            for p in pending:
+                self._entries[p["sid"]]["flushed"] = p["ts"]
+        if not pending:
+            return 0
+        t = AuthSession.__table__
+        try:
+            db.session.execute(
+                update(t)
+                .where(t.c.id == bindparam("sid"), t.c.last_seen < bindparam("ts"))
+                .values(last_seen=bindparam("ts"), active=True),
+                pending,
+            )
+            db.session.commit()
+        except Exception:
+            db.session.rollback()
+            with self._lock:  # se reintenta en el próximo flush
+                for p in pending:
+                    e = self._entries.get(p["sid"])
+                    if e is not None:
+                        e["flushed"] = None
+            raise
+        return len(pending)
+
+    # --- lecturas ---
+    def _sync(self) -> None:
+        """Trae de la BD las sesiones vistas por otros workers (máx. una vez por intervalo)."""
+        if time.monotonic() - self._last_sync < self._interval():
+            return
+        self._last_sync = time.monotonic()
+        cutoff = datetime.utcnow() - timedelta(seconds=ACTIVE_SECONDS)
+        rows = db.session.execute(
+            select(
+                AuthSession.id, AuthSession.user_id, AuthSession.active,
+                AuthSession.login_at, AuthSession.last_seen, AuthSession.ip,
+                Users.name, Users.role, Users.email,
+            )
+            .join(Users, Users.id == AuthSession.user_id)
+            .where(AuthSession.last_seen >= cutoff)
+        ).all()
+        with self._lock:
+            for r in rows:
+                e = self._entries.get(r.id)
+                if not r.active:
+                    self._entries.pop(r.id, None)
+                elif e is None:
+                    self._entries[r.id] = {
+                        "id": r.id, "user_id": r.user_id, "name": r.name,
+                        "role": r.role, "email": r.email, "ip": r.ip,
+                        "login_at": r.login_at, "last_seen": r.last_seen,
+                        "flushed": r.last_seen,
+                    }
+                else:
+                    if e["login_at"] is None:
+                        e["login_at"] = r.login_at
+                    if r.last_seen > e["last_seen"]:
+                        e["last_seen"] = e["flushed"] = r.last_seen
+
+    def _recent(self, seconds: int) -> list:
+        self._sync()
+        cutoff = datetime.utcnow() - timedelta(seconds=seconds)
+        with self._lock:
+            # lo que ya no está activo (y ya se escribió) se olvida
+            stale = datetime.utcnow() - timedelta(seconds=ACTIVE_SECONDS)
+            for sid in [s for s, e in self._entries.items()
+                        if e["last_seen"] < stale and e["flushed"] == e["last_seen"]]:
+                del self._entries[sid]
+            return [dict(e) for e in self._entries.values() if e["last_seen"] >= cutoff]
+
+    def online_count(self, seconds: int = ONLINE_SECONDS) -> int:
+        return len(self._recent(seconds))
+
+    def active(self, seconds: int = ACTIVE_SECONDS, limit: int = 200) -> list:
+        rows = sorted(self._recent(seconds), key=lambda e: e["last_seen"], reverse=True)
+        return rows[:limit]
+
+
+store = PresenceStore()
@@ -0,0 +1,110 @@
+"""
+Limitador de intentos de login (token bucket) en memoria del proceso.
+
+Cada IP y cada cuenta (email) tienen un balde con `capacity` fichas que se
+rellena a `capacity / period` fichas por segundo; cada intento gasta una.
+Se consulta ANTES de buscar el usuario o calcular hashes, así que un cliente
+que insiste no le cuesta nada a la BD ni al pool de contraseñas.
+
+Límites (formato "N/segundos"): LOGIN_RATE_IP y LOGIN_RATE_ACCOUNT. Son por
+proceso: con varios workers el límite efectivo se multiplica por su número.
+"""
+import time
+from threading import Lock
+
+from flask import current_app, request
+
+MAX_BUCKETS = 50000
+
+
+def parse_rate(spec: str):
+    """"20/60" -> (capacidad 20, 20/60 fichas por segundo)."""
+    n, _, per = (spec or "").partition("/")
+    capacity = float(n)
+    period = float(per or 60)
+    if capacity <= 0 or period <= 0:
+        raise ValueError(f"rate inválido: {spec!r}")
+    return capacity, capacity / period
+
+
+class TokenBucketLimiter:
+    def __init__(self):
+        self._buckets = {}   # key -> [tokens, last_monotonic]
+        self._lock = Lock()
+        self.counters = {"allowed": 0, "rejected_ip": 0, "rejected_account": 0}
+
+    def _take(self, key, capacity, rate, now) -> float:
+        """Gasta una ficha; devuelve 0 si pudo, o los segundos hasta la próxima."""
+        b = self._buckets.get(key)
+        if b is None:
+            if len(self._buckets) >= MAX_BUCKETS:
+                self._prune(now)
+            b = self._buckets[key] = [capacity, now]
+        else:
+            b[0] = min(capacity, b[0] + (now - b[1]) * rate)
+            b[1] = now
+        if b[0] >= 1:
+            b[0] -= 1
+            return 0.0
+        return (1 - b[0]) / rate
+
+    def _prune(self, now) -> None:
+        # se descartan los de uso menos reciente; si vuelven, arrancan llenos
+        for key in sorted(self._buckets, key=lambda k: self._buckets[k][1])[: MAX_BUCKETS // 10]:
+            del self._buckets[key]
+
+    def hit(self, checks):
+        """
+        `checks` = [(tipo, key, (capacity, rate)), ...]. Si alguno está vacío no
+        se gasta ninguna ficha y devuelve (tipo, segundos); si no, None.
+        """
+        now = time.monotonic()
+        with self._lock:
+            # se revisan todos antes de gastar, para no castigar la cuenta si la IP ya falló
+            for kind, key, (capacity, rate) in checks:
+                b = self._buckets.get(key)
+                if b is not None:
+                    tokens = min(capacity, b[0] + (now - b[1]) * rate)
+                    if tokens < 1:
+                        self.counters[f"rejected_{kind}"] += 1
+                        return kind, (1 - tokens) / rate
+            for kind, key, (capacity, rate) in checks:
+                self._take(key, capacity, rate, now)
+            self.counters["allowed"] += 1
+        return None
+
+    def reset(self, key) -> None:
+        with self._lock:
+            self._buckets.pop(key, None)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {**self.counters, "buckets": len(self._buckets)}
+
+
+login_limiter = TokenBucketLimiter()
+
+
+def client_ip() -> str:
+    if current_app.config.get("LOGIN_RATE_TRUST_FORWARDED") and request.access_route:
+        # el último salto lo agrega nuestro proxy; lo anterior lo controla el cliente
+        return request.access_route[-1]
+    return request.remote_addr or "?"
+
+
+def check_login(email: str):
+    """None si se permite el intento; si no, segundos para Retry-After."""
+    cfg = current_app.config
+    checks = [("ip", f"ip:{client_ip()}", parse_rate(cfg.get("LOGIN_RATE_IP", "60/60")))]
+    email = (email or "").strip().lower()
+    if email:
+        checks.append(("account", f"acct:{email}", parse_rate(cfg.get("LOGIN_RATE_ACCOUNT", "5/60"))))
+    denied = login_limiter.hit(checks)
+    if denied is None:
+        return None
+    return max(1, int(denied[1] + 0.999))
+
+
+def login_succeeded(email: str) -> None:
+    """Un login correcto devuelve las fichas de la cuenta (no las de la IP)."""
+    login_limiter.reset(f"acct:{(email or '').strip().lower()}")
@@ -0,0 +1,146 @@
+"""
+Limpieza de `auth_sessions`.
+
+Las sesiones solo se cerraban con logout explícito, así que las abandonadas
+quedaban `active=True` para siempre. Aquí:
+
+  - `close_idle`: cierra las sesiones sin actividad por más de
+    SESSION_IDLE_MINUTES (logout_at = último last_seen).
+  - `purge_closed`: borra las cerradas hace más de SESSION_RETENTION_DAYS.
+
+Ambas trabajan por bloques de ids (UPDATE/DELETE ... WHERE id IN (...)) con
+commit por bloque, para no retener locks ni inflar una sola transacción.
+De paso se borran las filas vencidas de `revoked_tokens` (app/revocation.py).
+
+Se corren con `flask reap-sessions` o, si SESSION_REAPER_INTERVAL > 0, desde
+un hilo del propio proceso. El mismo hilo reconcilia los contadores del
+dashboard cada COUNTERS_RECONCILE_SECONDS (app/counters.py).
+"""
+import threading
+import time
+from datetime import datetime, timedelta
+
+from flask import current_app
+from sqlalchemy import delete, func, select, update
+
+from . import db
+from .models import AuthSession
+
+CHUNK = 1000
+
+
+def _chunks(stmt, chunk_size: int):
+    """Ids del select por keyset (id > último), de a `chunk_size`."""
+    last_id = 0
+    while True:
+        ids = db.session.execute(
+            stmt.where(AuthSession.id > last_id).order_by(AuthSession.id.asc()).limit(chunk_size)
+        ).scalars().all()
+        if not ids:
+            return
+        last_id = ids[-1]
+        yield ids
+
+
+def close_idle(idle_minutes: int, chunk_size: int = CHUNK) -> int:
+    cutoff = datetime.utcnow() - timedelta(minutes=idle_minutes)
+    idle = select(AuthSession.id).where(AuthSession.active == True, AuthSession.last_seen < cutoff)
+    closed = 0
+    for ids in _chunks(idle, chunk_size):
+        res = db.session.execute(
+            update(AuthSession)
+            .where(AuthSession.id.in_(ids), AuthSession.active == True,
+                   AuthSession.last_seen < cutoff)  # por si hubo un heartbeat entremedio
+            .values(active=False, logout_at=AuthSession.last_seen)
+            .execution_options(synchronize_session=False)
+        )
+        db.session.commit()
+        closed += res.rowcount or 0
+    return closed
+
+
+def purge_closed(retention_days: int, chunk_size: int = CHUNK) -> int:
+    cutoff = datetime.utcnow() - timedelta(days=retention_days)
+    old = select(AuthSession.id).where(
+        AuthSession.active == False,
+        func.coalesce(AuthSession.logout_at, AuthSession.last_seen) < cutoff,
+    )
+    purged = 0
+    for ids in _chunks(old, chunk_size):
+        res = db.session.execute(
+            delete(AuthSession)
+            .where(AuthSession.id.in_(ids))
+            .execution_options(synchronize_session=False)
+        )
+        db.session.commit()
+        purged += res.rowcount or 0
+    return purged
+
+
+def reap(idle_minutes=None, retention_days=None, chunk_size: int = CHUNK) -> dict:
+    cfg = current_app.config
+    if idle_minutes is None:
+        idle_minutes = cfg.get("SESSION_IDLE_MINUTES", 30)
+    if retention_days is None:
+        retention_days = cfg.get("SESSION_RETENTION_DAYS", 90)
+
+    # lo que este proceso tiene en memoria va primero a la BD
+    from . import presence
+    presence.store.flush()
+
+    stats = {"closed": close_idle(idle_minutes, chunk_size)}
+    stats["purged"] = purge_closed(retention_days, chunk_size) if retention_days else 0
+
+    from . import revocation
+    stats["tokens_purged"] = revocation.purge_expired()
+    return stats
+
+
+def _reap_task():
+    stats = reap()
+    return stats if any(stats.values()) else None
+
+
+def _counters_task(max_age):
+    from . import counters
+    return counters.reconcile_if_stale(max_age)
+
+
+def start_scheduler(app):
+    """
+    Hilo daemon con las tareas periódicas: `reap()` cada SESSION_REAPER_INTERVAL
+    segundos y la reconciliación de contadores cada COUNTERS_RECONCILE_SECONDS.
+    """
+    tasks = []  # (nombre, cada cuántos segundos, función)
+    interval = int(app.config.get("SESSION_REAPER_INTERVAL") or 0)
+    if interval > 0:
+        tasks.append(("session reaper", interval, _reap_task))
+    counters_every = int(app.config.get("COUNTERS_RECONCILE_SECONDS") or 0)
+    if counters_every > 0:
+        tasks.append(("counters reconcile", counters_every, lambda: _counters_task(counters_every)))
+    if not tasks:
+        return None
+    stop = threading.Event()
+    # los contadores se revisan enseguida: con la tabla vacía el dashboard solo estima
+    due = {name: time.monotonic() + (0 if name == "counters reconcile" else every)
+           for name, every, _ in tasks}
+
+    def run():
+        while not stop.wait(max(1.0, min(due.values()) - time.monotonic())):
+            for name, every, fn in tasks:
+                if time.monotonic() < due[name]:
+                    continue
+                due[name] = time.monotonic() + every
+                with app.app_context():
+                    try:
+                        stats = fn()
+                        if stats:
+                            app.logger.info("%s: %s", name, stats)
+                    except Exception:
+                        db.session.rollback()
+                        app.logger.exception("%s failed", name)
+                    finally:
+                        db.session.remove()
+
+    threading.Thread(target=run, name="scheduler", daemon=True).start()
+    return stop
@@ -0,0 +1,150 @@
+"""
+Lecturas en la réplica (opcional).
+
+Con DATABASE_REPLICA_URL se crea un segundo engine (bind "replica") y
+`db.session` pasa a ser un `RoutingSession`, que elige el engine en cada
+consulta:
+
+  - va a la réplica solo un GET/HEAD de un endpoint de REPLICA_ENDPOINTS
+    (vistas de solo lectura: dashboards, detalle de módulo, data browser);
+  - flush, INSERT/UPDATE/DELETE y todo request que no sea GET van al primario;
+  - si el request ya escribió algo, el resto de sus lecturas van al primario;
+  - read-your-own-writes: un usuario que escribió lee del primario durante
+    REPLICA_RYOW_SECONDS (marca en la cookie de sesión y, para la API JWT, en
+    memoria del worker);
+  - staleness: si el lag de la réplica pasa REPLICA_MAX_LAG_SECONDS, o no se
+    puede medir, se lee del primario. El lag se mide como mucho cada
+    REPLICA_LAG_CHECK_SECONDS por proceso.
+
+REPLICA_RYOW_SECONDS debe ser mayor que REPLICA_MAX_LAG_SECONDS: así lo que un
+usuario acaba de escribir ya está en la réplica cuando vuelve a leer de ella.
+
+Para probar en local: `docker compose --profile replica up` (primario en 5433,
+réplica en 5434) o dos archivos SQLite (la "réplica" es una copia; no hay lag).
+"""
+import threading
+import time
+
+from flask import current_app, g, has_request_context, request, session as flask_session
+from flask_sqlalchemy.session import Session as FlaskSession
+from sqlalchemy import event, text
+from sqlalchemy.sql.dml import UpdateBase
+
+from .cache import TTLCache
+
+BIND = "replica"
+
+# user_id -> hasta cuándo lee del primario (API sin cookie; por proceso)
+_recent_writers = TTLCache(ttl=60, maxsize=50000)
+
+_lag = {"value": None, "checked_at": 0.0}
+_lag_lock = threading.Lock()
+stats = {"replica": 0, "primary_ryow": 0, "primary_stale": 0, "primary_written": 0}
+
+
+class RoutingSession(FlaskSession):
+    """Session de Flask-SQLAlchemy que manda las lecturas permitidas a la réplica."""
+
+    def get_bind(self, mapper=None, clause=None, bind=None, **kwargs):
+        if bind is None and not self._flushing and not isinstance(clause, UpdateBase):
+            engine = self._db.engines.get(BIND)
+            if engine is not None and _use_replica():
+                return engine
+        return super().get_bind(mapper=mapper, clause=clause, bind=bind, **kwargs)
+
+
+def _user_key():
+    """Id del usuario del request sin cargarlo (JWT o Flask-Login ya resuelto)."""
+    claims = g.get("_jwt_extended_jwt")
+    if claims and claims.get("sub") is not None:
+        return str(claims["sub"])
+    user = g.get("_login_user")
+    uid = getattr(user, "id", None) if user is not None else None
+    return str(uid) if uid is not None else None
+
+
+def _use_replica() -> bool:
+    if not has_request_context():
+        return False
+    if "_replica_ok" in g:
+        return g._replica_ok  # una decisión por request (salvo que escriba)
+
+    ok = False
+    if request.method in ("GET", "HEAD") and request.endpoint in current_app.config.get("REPLICA_ENDPOINTS", ()):
+        now = time.time()
+        uid = _user_key()
+        if flask_session.get("_primary_until", 0) > now or (uid and (_recent_writers.get(uid) or 0) > now):
+            stats["primary_ryow"] += 1
+        elif not _fresh_enough():
+            stats["primary_stale"] += 1
+        else:
+            stats["replica"] += 1
+            ok = True
+    g._replica_ok = ok
+    return ok
+
+
+def replica_lag():
+    """Segundos de atraso de la réplica (cacheado); None si no se pudo medir."""
+    cfg = current_app.config
+    every = float(cfg.get("REPLICA_LAG_CHECK_SECONDS", 5))
+    now = time.monotonic()
+    if now - _lag["checked_at"] < every:
+        return _lag["value"]
+    with _lag_lock:
+        if now - _lag["checked_at"] < every:
+            return _lag["value"]
+        from . import db
+        engine = db.engines[BIND]
+        try:
+            with engine.connect() as conn:
+                if engine.dialect.name == "postgresql":
+                    # sin WAL pendiente = al día (replay_timestamp envejece si el primario está quieto)
+                    value = conn.execute(text(
+                        "SELECT CASE WHEN NOT pg_is_in_recovery() "
+                        "  OR pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0 "
+                        "ELSE EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp()) END"
+                    )).scalar()
+                    value = float(value) if value is not None else None
+                else:
+                    conn.execute(text("SELECT 1"))
+                    value = 0.0
+        except Exception:
+            current_app.logger.warning("replica: no se pudo medir el lag", exc_info=True)
+            value = None
+        _lag.update(value=value, checked_at=now)
+    return value
+
+
+def _fresh_enough() -> bool:
+    lag = replica_lag()
+    return lag is not None and lag <= float(current_app.config.get("REPLICA_MAX_LAG_SECONDS", 10))
+
+
+def _mark_write(session, flush_context):
+    """after_flush: el request escribió; sus lecturas siguientes van al primario."""
+    if not has_request_context():
+        return
+    from .models import RequestLog
+    touched = [o for o in (*session.new, *session.dirty, *session.deleted) if not isinstance(o, RequestLog)]
+    if not touched:
+        return  # la métrica de after_request no cuenta como escritura del usuario
+    if g.get("_replica_ok"):
+        stats["primary_written"] += 1
+    g._replica_ok = False
+    ryow = float(current_app.config.get("REPLICA_RYOW_SECONDS", 30))
+    if ryow > 0:
+        until = time.time() + ryow
+        flask_session["_primary_until"] = until
+        uid = _user_key()
+        if uid:
+            _recent_writers.set(uid, until, ttl=ryow)
+
+
+def snapshot() -> dict:
+    return {**stats, "lag_seconds": _lag["value"]}
+
+
+def init_app(app) -> None:
+    if BIND in (app.config.get("SQLALCHEMY_BINDS") or {}) and not event.contains(RoutingSession, "after_flush", _mark_write):
+        event.listen(RoutingSession, "after_flush", _mark_write)
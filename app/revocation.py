@@ -0,0 +1,204 @@
+"""
+Revocación de tokens JWT (API) sin consulta a la BD en cada request.
+
+Lo durable está en `revoked_tokens`, con dos tipos de fila:
+  - un token puntual (`jti`), p. ej. en POST /auth/api/logout;
+  - todos los tokens de un usuario emitidos antes de `not_before` (cambio de
+    rol o borrado: el rol viaja dentro del token).
+
+Cada proceso tiene un filtro de Bloom con las claves revocadas ("j:<jti>" y
+"u:<user_id>"). Se arma la primera vez que se valida un token, y después se
+le suman las filas nuevas: las de este proceso al revocar, y las de otros
+workers cada JWT_REVOCATION_SYNC_SECONDS (una consulta por `id > último`).
+Un token que no está en el filtro seguro no está revocado; solo los aciertos
+(los reales y ~JWT_REVOCATION_FP_RATE de falsos positivos) van a la BD.
+
+Las filas vencen con el token (`expires_at`); `purge_expired` las borra
+(lo corre `flask reap-sessions`).
+"""
+import hashlib
+import math
+import threading
+import time
+from datetime import datetime, timedelta
+
+from flask import current_app
+from sqlalchemy import delete, func, select
+
+from . import db
+from .models import RevokedTokens
+
+
+class BloomFilter:
+    """Bits en un bytearray; k posiciones por doble hashing sobre blake2b."""
+
+    def __init__(self, capacity: int, fp_rate: float = 0.01):
+        self.capacity = max(1, int(capacity))
+        self.nbits = max(64, int(-self.capacity * math.log(fp_rate) / (math.log(2) ** 2)))
+        self.k = max(1, round(self.nbits / self.capacity * math.log(2)))
+        self.bits = bytearray((self.nbits + 7) // 8)
+        self.count = 0
+
+    def _positions(self, key: str):
+        d = hashlib.blake2b(key.encode(), digest_size=16).digest()
+        h1 = int.from_bytes(d[:8], "little")
+        h2 = int.from_bytes(d[8:], "little") | 1
+        for i in range(self.k):
+            yield (h1 + i * h2) % self.nbits
+
+    def add(self, key: str) -> None:
+        for p in self._positions(key):
+            self.bits[p >> 3] |= 1 << (p & 7)
+        self.count += 1
+
+    def __contains__(self, key: str) -> bool:
+        return all(self.bits[p >> 3] & (1 << (p & 7)) for p in self._positions(key))
+
+
+# estado por proceso
+_filter = None
+_last_id = 0
+_synced_at = 0.0
+_lock = threading.Lock()
+stats = {"checks": 0, "filter_hits": 0, "db_checks": 0, "revoked": 0}
+
+
+def _keys(row):
+    return f"j:{row.jti}" if row.jti else f"u:{row.user_id}"
+
+
+def _live_rows(after_id: int = 0):
+    now = datetime.utcnow()
+    return db.session.execute(
+        select(RevokedTokens.id, RevokedTokens.jti, RevokedTokens.user_id)
+        .where(RevokedTokens.id > after_id)
+        .where((RevokedTokens.expires_at.is_(None)) | (RevokedTokens.expires_at > now))
+        .order_by(RevokedTokens.id.asc())
+    ).all()
+
+
+def rebuild() -> BloomFilter:
+    """Arma el filtro desde la tabla (solo filas vigentes)."""
+    global _filter, _last_id, _synced_at
+    cfg = current_app.config
+    rows = _live_rows()
+    capacity = max(int(cfg.get("JWT_REVOCATION_CAPACITY", 100000)), 2 * len(rows))
+    bf = BloomFilter(capacity, float(cfg.get("JWT_REVOCATION_FP_RATE", 0.01)))
+    for row in rows:
+        bf.add(_keys(row))
+    with _lock:
+        _filter = bf
+        _last_id = max((r.id for r in rows), default=_last_id)
+        _synced_at = time.monotonic()
+    return bf
+
+
+def _sync() -> None:
+    """Suma al filtro lo que revocaron otros procesos desde la última vez."""
+    global _last_id, _synced_at
+    every = float(current_app.config.get("JWT_REVOCATION_SYNC_SECONDS", 30))
+    if _filter is None:
+        rebuild()
+        return
+    if time.monotonic() - _synced_at < every:
+        return
+    rows = _live_rows(_last_id)
+    if _filter.count + len(rows) > _filter.capacity:
+        rebuild()  # lleno: la tasa de falsos positivos subiría
+        return
+    with _lock:
+        for row in rows:
+            _filter.add(_keys(row))
+        if rows:
+            _last_id = max(_last_id, rows[-1].id)
+        _synced_at = time.monotonic()
+
+
+def _add_local(rows) -> None:
+    if _filter is None:
+        return  # se arma completo en el próximo check
+    with _lock:
+        for row in rows:
+            _filter.add(_keys(row))
+
+
+def is_revoked(payload: dict) -> bool:
+    """Loader de flask_jwt_extended (`token_in_blocklist_loader`)."""
+    _sync()
+    stats["checks"] += 1
+    jti, uid = payload.get("jti"), payload.get("sub")
+    hit_jti = bool(jti) and f"j:{jti}" in _filter
+    hit_user = uid is not None and f"u:{uid}" in _filter
+    if not (hit_jti or hit_user):
+        return False
+
+    stats["filter_hits"] += 1
+    stats["db_checks"] += 1
+    if hit_jti and db.session.execute(
+        select(RevokedTokens.id).where(RevokedTokens.jti == jti).limit(1)
+    ).first():
+        stats["revoked"] += 1
+        return True
+    if hit_user:
+        cutoff = db.session.execute(
+            select(func.max(RevokedTokens.not_before))
+            .where(RevokedTokens.user_id == int(uid), RevokedTokens.jti.is_(None))
+        ).scalar()
+        iat = payload.get("iat")
+        if cutoff is not None and iat is not None and datetime.utcfromtimestamp(iat) < cutoff:
+            stats["revoked"] += 1
+            return True
+    return False
+
+
+def _token_ttl():
+    ttl = current_app.config.get("JWT_ACCESS_TOKEN_EXPIRES", timedelta(minutes=15))
+    if ttl is False:
+        return None  # tokens sin vencimiento: la fila no se purga
+    return ttl if isinstance(ttl, timedelta) else timedelta(seconds=int(ttl))
+
+
+def revoke_token(jti: str, user_id: int, exp=None, commit: bool = True) -> None:
+    """Revoca un token puntual; `exp` es el claim del token (epoch)."""
+    row = RevokedTokens(
+        jti=jti, user_id=int(user_id),
+        expires_at=datetime.utcfromtimestamp(exp) if exp else None,
+    )
+    db.session.add(row)
+    if commit:
+        db.session.commit()
+    _add_local([row])
+
+
+def revoke_users(user_ids, commit: bool = True) -> None:
+    """Revoca todos los tokens ya emitidos de esos usuarios (rol cambiado, borrado)."""
+    now = datetime.utcnow()
+    # `iat` viene en segundos enteros: se trunca al segundo para que un token
+    # emitido después (p. ej. el login con el rol nuevo) no quede revocado.
+    # Un token del mismo segundo pero anterior a la revocación sigue valiendo.
+    not_before = now.replace(microsecond=0)
+    ttl = _token_ttl()
+    rows = [
+        RevokedTokens(user_id=int(uid), not_before=not_before,
+                      expires_at=(not_before + ttl) if ttl else None)
+        for uid in set(user_ids)
+    ]
+    db.session.add_all(rows)
+    if commit:
+        db.session.commit()
+    _add_local(rows)
+
+
+def revoke_user(user_id: int, commit: bool = True) -> None:
+    revoke_users([user_id], commit=commit)
+
+
+def purge_expired() -> int:
+    """Borra las filas cuyo token ya venció (el filtro las suelta en el próximo rebuild)."""
+    res = db.session.execute(
+        delete(RevokedTokens)
+        .where(RevokedTokens.expires_at < datetime.utcnow())
+        .execution_options(synchronize_session=False)
+    )
+    db.session.commit()
+    return res.rowcount or 0
@@ -0,0 +1,161 @@
+"""
+Calificación de actividades y re-calificación en lote.
+
+`score_submission` es la única regla de puntaje: la usa `play_activity` al
+recibir un intento y `rescore_activity` al re-aplicar `answers_json` guardados
+contra el contenido actual (p. ej. cuando el profesor corrige un `points`).
+"""
+import json
+
+from sqlalchemy import update
+
+from . import db, jobs
+from .models import Activities, Attempts
+
+QUIZ_TYPES = ("quiz", "scenario", "mcq_sim")
+RESCORE_CHUNK = 1000
+
+
+def is_quiz_like(atype) -> bool:
+    return (atype or "text").lower() in QUIZ_TYPES
+
+
+def option_table(content) -> list:
+    """Por pregunta: {key(str): opción}. Se arma una vez por actividad."""
+    table = []
+    for q in (content or {}).get("questions", []) or []:
+        opts = {}
+        for opt in q.get("options", []) or []:
+            opts.setdefault(str(opt.get("key")), opt)
+        table.append(opts)
+    return table
+
+
+def score_submission(activity, content, answers, table=None) -> dict:
+    """
+    Puntaje y efectos de un envío. `answers` es {"<idx>": key} (como en
+    answers_json). Devuelve score, delta_credit, delta_cash, delta_energy, xp.
+    """
+    score = 0
+    delta_credit = 0
+    delta_cash = 0.0
+    delta_energy = 0
+    xp_gain = None
+
+    if is_quiz_like(activity.type):
+        table = option_table(content) if table is None else table
+        for idx, opts in enumerate(table):
+            sel = answers.get(str(idx))
+            if sel is None:
+                continue
+            opt = opts.get(str(sel))
+            if opt is None:
+                continue
+            score += int(opt.get("points", 0) or 0)
+            delta_credit += int(opt.get("delta_credit", 0) or 0)
+            delta_cash += float(opt.get("delta_cash", 0.0) or 0.0)
+            delta_energy += int(opt.get("delta_energy", 0) or 0)
+            if xp_gain is None and opt.get("xp") is not None:
+                xp_gain = int(opt["xp"])
+    else:
+        # actividades tipo texto / lectura
+        score = int(activity.max_points or 0)
+        xp_gain = (
+            activity.default_xp
+            or content.get("xp_reward")
+            or activity.max_points
+            or 25
+        )
+
+    # Fallback sólido para XP (evita None)
+    if xp_gain is None:
+        xp_gain = (
+            activity.default_xp
+            or content.get("xp_reward")
+            or (activity.max_points if activity.max_points is not None else 25)
+        )
+
+    return {
+        "score": score,
+        "delta_credit": delta_credit,
+        "delta_cash": delta_cash,
+        "delta_energy": delta_energy,
+        "xp": int(xp_gain),
+    }
+
+
+def rescore_activity(activity_id: int, chunk_size: int = RESCORE_CHUNK, progress=None) -> dict:
+    """
+    Re-califica todos los intentos de la actividad contra su contenido actual.
+
+    Recorre por keyset (id > último) en bloques de `chunk_size`, calcula los
+    puntajes de todo el bloque (memoizando respuestas repetidas) y escribe
+    solo los que cambiaron con un UPDATE por lotes; cada bloque hace commit,
+    así ninguna transacción retiene locks mucho tiempo.
+    """
+    a = db.session.get(Activities, activity_id)
+    if a is None:
+        raise LookupError(f"actividad {activity_id} no existe")
+    try:
+        content = json.loads(a.content_json or "{}")
+    except Exception:
+        content = {}
+    table = option_table(content)
+
+    total = Attempts.query.filter(Attempts.activity_id == activity_id).count()
+    stats = {"total": total, "processed": 0, "changed": 0}
+    if progress:
+        progress(stats)
+
+    memo = {}
+    last_id = 0
+    while True:
+        rows = (
+            db.session.query(Attempts.id, Attempts.score, Attempts.answers_json)
+            .filter(Attempts.activity_id == activity_id, Attempts.id > last_id)
+            .order_by(Attempts.id.asc())
+            .limit(chunk_size)
+            .all()
+        )
+        if not rows:
+            break
+        last_id = rows[-1].id
+
+        changes = []
+        for rid, old, raw in rows:
+            new = memo.get(raw)
+            if new is None:
+                try:
+                    answers = json.loads(raw or "{}")
+                except Exception:
+                    answers = {}
+                new = float(score_submission(a, content, answers if isinstance(answers, dict) else {}, table)["score"])
+                memo[raw] = new
+            if old is None or float(old) != new:
+                changes.append({"id": rid, "score": new})
+
+        if changes:
+            db.session.execute(update(Attempts), changes)
+        db.session.commit()
+
+        stats["processed"] += len(rows)
+        stats["changed"] += len(changes)
+        if progress:
+            progress(stats)
+    return stats
+
+
+def job_status(job_id: str, user=None):
+    """Estado del re-score (ver app/jobs.py); None si no existe o `user` no lo pidió."""
+    return jobs.status(job_id, "rescore", user)
+
+
+def start_rescore_job(app, activity_id: int, requested_by=None) -> str:
+    """Lanza el re-score en un hilo del worker y devuelve el id del job."""
+    def work(progress):
+        rescore_activity(activity_id, progress=progress)
+        from .teacher import gradebook
+        gradebook.invalidate_all()
+
+    return jobs.start(app, "rescore", work, params={"activity_id": activity_id},
+                      stats={"total": None, "processed": 0, "changed": 0}, requested_by=requested_by)
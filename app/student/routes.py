@@ -1,17 +1,20 @@
 # app/student/routes.py
-from datetime import datetime
-
 from flask_login import login_required, current_user
 from app import db
-from app.models import Activities, Attempts, StudentProfiles, Modules, GroupMembers, ModuleAssignments, GameSettings
-import json
-from app.models import Missions, MissionProgress
+from app.models import Activities, Attempts, StudentProfiles, Modules, Missions
+from app import versions, identity
+from app.student import services
+from app.student.services import (
+    StudentFlowError,
+    get_or_create_profile as _get_or_create_profile,
+    evaluate_missions as _evaluate_missions_for_user,
+)
 
 
 from flask import (
     Blueprint, render_template,
     request as flask_request,
-    redirect, url_for, flash, abort,
+    redirect, url_for, flash, make_response,
     session as flask_session
 )
 
@@ -34,6 +37,7 @@ def _ensure_profile(u):
         )
         db.session.add(p)
         db.session.commit()
+        identity.invalidate(u.id)
         u.profile = p
     return u.profile
 
@@ -48,7 +52,7 @@ def modules_index():
     # (opcional) progreso por módulo
     progress = {}
     for m in mods:
-        total = len(m.activities)
+        total = m.activities.count()
         if total:
             done = (Attempts.query.filter_by(user_id=current_user.id)
                     .join(Activities)
@@ -65,6 +69,7 @@ def modules_index():
         profile=prof,       # <-- ¡importante!
     )
 
+
 @student_bp.route("/dashboard", endpoint="dashboard")
 @login_required
 def dashboard():
@@ -72,58 +77,14 @@ def dashboard():
     Student dashboard: muestra módulos asignados a los grupos del estudiante.
     Si no hay asignaciones, cae a módulos publicados. También lista actividades de esos módulos.
     """
-    profile = _get_or_create_profile(current_user.id)
-
-    # --- 1) grupos del estudiante ---
-    my_memberships = GroupMembers.query.filter_by(user_id=current_user.id).all()
-    group_ids = [m.group_id for m in my_memberships]
-
-    # --- 2) módulos asignados a esos grupos ---
-    assigned_module_ids = []
-    if group_ids:
-        assigned_module_ids = [
-            ma.module_id
-            for ma in ModuleAssignments.query
-                .filter(ModuleAssignments.group_id.in_(group_ids))
-                .all()
-        ]
-
-    # --- 3) query de módulos a mostrar ---
-    q = Modules.query
-    if assigned_module_ids:
-        q = q.filter(Modules.id.in_(assigned_module_ids))
-    else:
-        # fallback: publicados (o null)
-        q = q.filter((Modules.is_published == True) | (Modules.is_published.is_(None)))
-
-    # Orden seguro en SQLite: usa COALESCE para nulls primero/último
-    modules = q.order_by(
-        db.func.coalesce(Modules.level, 9999).asc(),
-        Modules.id.desc()
-    ).all()
-
-    # --- 4) actividades de esos módulos (solo publicadas) ---
-    activities = []
-    if modules:
-        mids = [m.id for m in modules]
-        activities = (
-            Activities.query
-            .filter(Activities.module_id.in_(mids))
-            .filter((Activities.is_published == True) | (Activities.is_published.is_(None)))
-            .order_by(Activities.module_id.asc(), Activities.position.asc(), Activities.id.asc())
-            .limit(10)
-            .all()
-        )
-
-    # misiones (para usar resumen si quieres en el dashboard)
-    mission_rows, mission_summary = _evaluate_missions_for_user(current_user.id)
+    data = services.dashboard_data(current_user.id)
 
     return render_template(
         "student/dashboard.html",
-        modules=modules,
-        activities=activities,
-        profile=profile,
-        mission_summary=mission_summary,
+        modules=data["modules"],
+        activities=data["activities"],
+        profile=data["profile"],
+        mission_summary=data["mission_summary"],
     )
 
 @student_bp.route("/missions")
@@ -142,42 +103,13 @@ def missions():
 @student_bp.route("/missions/<int:mission_id>/collect", methods=["POST"], endpoint="collect_mission")
 @login_required
 def collect_mission(mission_id):
-    profile = _get_or_create_profile(current_user.id)
     mission = Missions.query.get_or_404(mission_id)
-
-    prog = MissionProgress.query.filter_by(
-        mission_id=mission.id,
-        user_id=current_user.id
-    ).first()
-
-    if not prog or not prog.is_completed:
-        flash("Esta misión todavía no está completa.", "error")
-        return redirect(url_for("student_ui.missions"))
-
-    if prog.is_collected:
-        flash("Ya cobraste la recompensa de esta misión.", "error")
+    try:
+        services.collect_mission(current_user.id, mission)
+    except StudentFlowError as e:
+        flash(e.message, "error")
         return redirect(url_for("student_ui.missions"))
 
-    # aplicar recompensas
-    profile.xp = int((profile.xp or 0) + int(mission.xp_reward or 0))
-    profile.cash_balance = float(profile.cash_balance or 0.0) + float(mission.cash_reward or 0.0)
-
-    # recalcular level-ups usando la misma lógica que las actividades
-    s = get_settings()
-    level_ups = 0
-    while True:
-        need = xp_needed_for_next(int(profile.level or 1), s)
-        if profile.xp >= need:
-            profile.xp -= need
-            profile.level = int(profile.level or 1) + 1
-            level_ups += 1
-        else:
-            break
-
-    prog.is_collected = True
-    prog.collected_at = datetime.utcnow()
-
-    db.session.commit()
     flash("Recompensa de misión cobrada.", "success")
     return redirect(url_for("student_ui.missions"))
 
@@ -207,176 +139,56 @@ def help_page():
     return render_template("student/placeholder.html", title="Ayuda", profile=profile)
 
 
-def _get_or_create_profile(user_id):
-    prof = StudentProfiles.query.filter_by(user_id=user_id).first()
-    if not prof:
-        prof = StudentProfiles(user_id=user_id)
-        db.session.add(prof)
-        db.session.commit()
-    return prof
-
-def get_settings():
-    s = GameSettings.query.get(1)
-    if not s:
-        s = GameSettings(id=1)
-        db.session.add(s); db.session.commit()
-    return s
-
-def xp_needed_for_next(level:int, s:GameSettings) -> int:
-    # simple arithmetic progression: base + growth*(level-1)
-    return int((s.xp_base or 100) + (level - 1) * (s.xp_growth or 50))
-
 @student_bp.route("/activity/<int:activity_id>", methods=["GET", "POST"], endpoint="play_activity")
 @login_required
 def play_activity(activity_id):
-    a = Activities.query.get_or_404(activity_id)
-    s = get_settings()
-    atype = (a.type or "text").lower()
-
-    # Tipos que se comportan como quiz
-    quiz_like = atype in ("quiz", "scenario", "mcq_sim")
+    ctx = services.activity_context(Activities.query.get_or_404(activity_id), current_user.id)
+    a = ctx.activity
 
     # --- Gate por nivel del módulo ---
-    profile = _get_or_create_profile(current_user.id)
-    module = Modules.query.get(a.module_id)
-    required_level = (module.level or 1) if module and module.level is not None else None
-    current_level = profile.level or 1
-
-    if required_level is not None and current_level < required_level:
-        flash(
-            f"Necesitas nivel {required_level} para hacer esta actividad. "
-            f"Tu nivel actual es {current_level}.",
-            "error"
-        )
+    if ctx.locked:
+        flash(services.level_error(ctx).message, "error")
         return redirect(url_for("student_ui.module_detail", module_id=a.module_id))
 
-    # --- Límite de intentos ---
-    used = Attempts.query.filter_by(user_id=current_user.id, activity_id=a.id).count()
-    limit = a.attempt_limit if a.attempt_limit is not None else s.max_attempts_default
-    blocked = (limit is not None) and (used >= limit)
-
-    # --- Cargar contenido JSON ---
-    content = {}
-    if a.content_json:
-        try:
-            content = json.loads(a.content_json)
-        except Exception:
-            content = {}
+    # --- 304 si el cliente ya tiene esta versión de la página ---
+    etag = None
+    snap = ctx.snapshot
+    if ctx.published is not None and flask_request.method == "GET":
+        etag = versions.etag_for(snap["hash"], a.id, ctx.used, ctx.limit, *_viewer_key(ctx.profile))
+        cached = versions.not_modified(etag, snap["created_at"])
+        if cached is not None:
+            return cached
 
     # =================== POST: procesar intento ===================
     if flask_request.method == "POST":
-        if blocked:
-            flash("Ya alcanzaste el límite de intentos para esta actividad.", "error")
-            return redirect(url_for("student_ui.module_detail", module_id=a.module_id))
-
-        profile = _get_or_create_profile(current_user.id)
-
-        score = 0
-        delta_credit = 0
-        delta_cash = 0.0
-        delta_energy = 0
-        xp_gain = None
-        answers = {}
-
-        if quiz_like:
-            # leer respuestas y acumular efectos
-            for idx, q in enumerate(content.get("questions", [])):
-                sel = flask_request.form.get(f"q{idx}")
-                if sel is None:
-                    continue
-
-                answers[str(idx)] = sel
-
-                for opt in q.get("options", []):
-                    if str(opt.get("key")) == str(sel):
-                        score += int(opt.get("points", 0) or 0)
-                        delta_credit += int(opt.get("delta_credit", 0) or 0)
-                        delta_cash += float(opt.get("delta_cash", 0.0) or 0.0)
-                        delta_energy += int(opt.get("delta_energy", 0) or 0)
-
-                        if xp_gain is None and opt.get("xp") is not None:
-                            xp_gain = int(opt["xp"])
-                        break
-        else:
-            # actividades tipo texto / lectura
-            score = int(a.max_points or 0)
-            xp_gain = (
-                a.default_xp
-                or content.get("xp_reward")
-                or a.max_points
-                or 25
-            )
-
-        # Fallback sólido para XP (evita None)
-        if xp_gain is None:
-            xp_gain = (
-                a.default_xp
-                or content.get("xp_reward")
-                or (a.max_points if a.max_points is not None else 25)
-            )
-
-        xp_gain = int(xp_gain)
-
-        # --- Aplicar efectos al perfil ---
-        if delta_credit:
-            profile.credit_score = max(
-                300,
-                min(850, (profile.credit_score or 650) + delta_credit),
-            )
-        if delta_cash:
-            profile.cash_balance = (profile.cash_balance or 0.0) + delta_cash
-        if delta_energy:
-            profile.energy = max(0, (profile.energy or 100) + delta_energy)
-
-        # --- XP + level up ---
-        level_ups = 0
-        profile.xp = int((profile.xp or 0) + xp_gain)
-        while True:
-            need = xp_needed_for_next(int(profile.level or 1), s)
-            if profile.xp >= need:
-                profile.xp -= need
-                profile.level = int(profile.level or 1) + 1
-                level_ups += 1
-            else:
-                break
-
-        # --- Guardar intento ---
-        att = Attempts(
-            user_id=current_user.id,
-            activity_id=a.id,
-            score=float(score),
-            answers_json=json.dumps(answers),
-            ended_at=datetime.utcnow(),
-        )
-        db.session.add(att)
-        db.session.commit()
-
-        flask_session["last_result"] = {
-            "activity_id": a.id,
-            "title": a.title,
-            "score": int(score),
-            "xp": int(xp_gain),
-            "delta_credit": int(delta_credit),
-            "delta_cash": float(delta_cash),
-            "delta_energy": int(delta_energy),
-            "level_ups": int(level_ups),
-            "attempts_left": (max(0, (limit - (used + 1))) if limit is not None else None),
+        # leer respuestas q0, q1, ... del formulario
+        answers = {
+            k[1:]: v for k, v in flask_request.form.items()
+            if k.startswith("q") and k[1:].isdigit()
         }
+        try:
+            flask_session["last_result"] = services.submit_attempt(ctx, current_user.id, answers)
+        except StudentFlowError as e:
+            flash(e.message, "error")
+            return redirect(url_for("student_ui.module_detail", module_id=a.module_id))
 
         return redirect(url_for("student_ui.activity_result", activity_id=a.id))
 
     # =================== GET: mostrar actividad ===================
-    template_name = "student/activity_quiz.html" if quiz_like else "student/activity_text.html"
+    template_name = "student/activity_quiz.html" if ctx.quiz_like else "student/activity_text.html"
 
-    return render_template(
+    html = render_template(
         template_name,
         activity=a,
-        content=content,
-        attempts_used=used,
-        attempts_left=(None if limit is None else max(0, limit - used)),
-        attempt_limit=limit,
-        blocked=blocked,
+        content=services.activity_content(ctx),
+        attempts_used=ctx.used,
+        attempts_left=ctx.attempts_left,
+        attempt_limit=ctx.limit,
+        blocked=ctx.blocked,
     )
+    if etag is None:
+        return html
+    return versions.with_cache_headers(make_response(html), etag, snap["created_at"])
 
 
 @student_bp.route("/activity/<int:activity_id>/result", methods=["GET"], endpoint="activity_result")
@@ -395,144 +207,32 @@ def module_detail(module_id):
     module = Modules.query.get_or_404(module_id)
     profile = _get_or_create_profile(current_user.id)
 
-    # --- parsear el JSON del módulo (builder) ---
-    raw = {}
-    if module.content_json:
-        try:
-            raw = json.loads(module.content_json)
-        except Exception:
-            raw = {}
-
-    sections_raw = []
-    if isinstance(raw, dict):
-        sections_raw = raw.get("sections", [])
-
-    module_sections = []
-    for sec in sections_raw:
-        if not isinstance(sec, dict):
-            continue
-
-        t = sec.get("type")
-
-        # Normalizar checklist: items vienen como ["a\nb\nc"]
-        if t == "checklist":
-            items = sec.get("items") or []
-            new_items = []
-            for it in items:
-                if isinstance(it, str):
-                    for line in it.splitlines():
-                        line = line.strip()
-                        if line:
-                            new_items.append(line)
-                else:
-                    new_items.append(str(it))
-            sec["items"] = new_items
-
-        module_sections.append(sec)
-
-    # --- actividades del módulo (solo publicadas) ---
-    activities = (
-        Activities.query
-        .filter_by(module_id=module.id, is_published=True)
-        .order_by(Activities.position.asc(), Activities.id.asc())
-        .all()
-    )
-
-    can_access = (module.level is None) or ((profile.level or 1) >= (module.level or 1))
-
-    return render_template(
+    # --- versión publicada: 304 antes de tocar el contenido ---
+    snap = versions.published_snapshot(module)
+    etag = None
+    if snap is not None:
+        etag = versions.etag_for(snap["hash"], *_viewer_key(profile))
+        cached = versions.not_modified(etag, snap["created_at"])
+        if cached is not None:
+            return cached
+
+    view = services.module_view(module, profile)
+    html = render_template(
         "student/module_detail.html",
-        module=module,
-        activities=activities,
+        module=view.module,
+        activities=view.activities,
         profile=profile,
-        can_access=can_access,
-        module_sections=module_sections,   # <<< IMPORTANTE
+        can_access=view.can_access,
+        module_sections=view.sections,   # <<< IMPORTANTE
     )
+    if etag is None:
+        return html
+    return versions.with_cache_headers(make_response(html), etag, snap["created_at"])
 
 
-def _check_mission_completed(mission, profile, user_id):
-    """Devuelve True si el estudiante cumple la condición de la misión."""
-    t = (mission.condition_type or "").lower()
-    val = mission.condition_value
-
-    # 1) Llegar a cierto nivel
-    if t == "reach_level" and val is not None:
-        return (profile.level or 1) >= int(val)
-
-    # 2) Completar un módulo específico (todas sus actividades)
-    if t == "complete_module" and val is not None:
-        module = Modules.query.get(int(val))
-        if not module:
-            return False
-        total = len(module.activities)
-        if total == 0:
-            return False
-
-        done = (
-            Attempts.query.filter_by(user_id=user_id)
-            .join(Activities)
-            .filter(Activities.module_id == module.id)
-            .count()
-        )
-        return done >= total
-
-    # 3) Completar tu PRIMER módulo (cualquiera)
-    if t == "complete_any_module":
-        modules = Modules.query.all()
-        for m in modules:
-            total = len(m.activities)
-            if total == 0:
-                continue
-            done = (
-                Attempts.query.filter_by(user_id=user_id)
-                .join(Activities)
-                .filter(Activities.module_id == m.id)
-                .count()
-            )
-            if done >= total:
-                return True
-        return False
-
-    return False
-
-
-def _evaluate_missions_for_user(user_id):
-    """Crea/actualiza MissionProgress y devuelve (lista, resumen)."""
-    profile = _get_or_create_profile(user_id)
-    missions = Missions.query.filter_by(is_active=True).order_by(Missions.id.asc()).all()
-
-    rows = []
-    changed = False
-
-    for m in missions:
-        prog = MissionProgress.query.filter_by(mission_id=m.id, user_id=user_id).first()
-        if not prog:
-            prog = MissionProgress(mission_id=m.id, user_id=user_id)
-            db.session.add(prog)
-            changed = True
-
-        completed = _check_mission_completed(m, profile, user_id)
-        if completed and not prog.is_completed:
-            prog.is_completed = True
-            prog.completed_at = datetime.utcnow()
-            changed = True
-
-        rows.append((m, prog))
-
-    if changed:
-        db.session.commit()
-
-    summary = {
-        "total": len(rows),
-        "ready": sum(1 for m, p in rows if p.is_completed and not p.is_collected),
-        "completed": sum(1 for m, p in rows if p.is_completed),
-        "collected": sum(1 for m, p in rows if p.is_collected),
-    }
-    return rows, summary
-
-
-
-
-
-
-
+def _viewer_key(profile):
+    """Lo que el layout pinta del usuario (header + stats dock) y entra en el ETag."""
+    return (
+        current_user.id, current_user.name, current_user.role,
+        profile.level, profile.xp, profile.credit_score, profile.cash_balance, profile.energy,
+    )
@@ -0,0 +1,434 @@
+"""
+Lógica de los flujos del estudiante, compartida por las vistas HTML
+(`student/routes.py`) y la API JSON (`api/routes.py`).
+
+Aquí no hay flash, redirect ni render: las funciones reciben ids / modelos y
+devuelven datos. Lo que el estudiante no puede hacer (nivel insuficiente,
+sin intentos, misión no lista) se señala con `StudentFlowError`, y cada capa
+lo presenta a su manera (flash + redirect o JSON + status).
+"""
+import json
+from datetime import datetime
+from types import SimpleNamespace
+
+from app import db, versions, scoring, identity
+from app.models import (
+    Activities, Attempts, StudentProfiles, Modules, GroupMembers,
+    ModuleAssignments, GameSettings, Missions, MissionProgress,
+)
+
+
+class StudentFlowError(Exception):
+    """Acción no permitida; `status` es el código HTTP que usa la API."""
+
+    def __init__(self, message, status=400, module_id=None):
+        super().__init__(message)
+        self.message = message
+        self.status = status
+        self.module_id = module_id
+
+
+# --- perfil / progresión ---
+def get_or_create_profile(user_id):
+    prof = StudentProfiles.query.filter_by(user_id=user_id).first()
+    if not prof:
+        prof = StudentProfiles(user_id=user_id)
+        db.session.add(prof)
+        db.session.commit()
+        identity.invalidate(user_id)
+    return prof
+
+
+def get_settings():
+    s = GameSettings.query.get(1)
+    if not s:
+        s = GameSettings(id=1)
+        db.session.add(s); db.session.commit()
+    return s
+
+
+def xp_needed_for_next(level: int, s: GameSettings) -> int:
+    # simple arithmetic progression: base + growth*(level-1)
+    return int((s.xp_base or 100) + (level - 1) * (s.xp_growth or 50))
+
+
+def _apply_xp(profile, xp_gain, s) -> int:
+    """Suma XP y sube de nivel las veces que haga falta; devuelve cuántas."""
+    level_ups = 0
+    profile.xp = int((profile.xp or 0) + xp_gain)
+    while True:
+        need = xp_needed_for_next(int(profile.level or 1), s)
+        if profile.xp >= need:
+            profile.xp -= need
+            profile.level = int(profile.level or 1) + 1
+            level_ups += 1
+        else:
+            break
+    return level_ups
+
+
+# --- dashboard ---
+def dashboard_data(user_id) -> dict:
+    """
+    Módulos asignados a los grupos del estudiante (o publicados, si no hay
+    asignaciones), hasta 10 actividades publicadas de esos módulos y el
+    resumen de misiones.
+    """
+    profile = get_or_create_profile(user_id)
+
+    # --- 1) grupos del estudiante ---
+    my_memberships = GroupMembers.query.filter_by(user_id=user_id).all()
+    group_ids = [m.group_id for m in my_memberships]
+
+    # --- 2) módulos asignados a esos grupos ---
+    assigned_module_ids = []
+    if group_ids:
+        assigned_module_ids = [
+            ma.module_id
+            for ma in ModuleAssignments.query
+                .filter(ModuleAssignments.group_id.in_(group_ids))
+                .all()
+        ]
+
+    # --- 3) query de módulos a mostrar ---
+    q = Modules.query
+    if assigned_module_ids:
+        q = q.filter(Modules.id.in_(assigned_module_ids))
+    else:
+        # fallback: publicados (o null)
+        q = q.filter((Modules.is_published == True) | (Modules.is_published.is_(None)))
+
+    # Orden seguro en SQLite: usa COALESCE para nulls primero/último
+    modules = q.order_by(
+        db.func.coalesce(Modules.level, 9999).asc(),
+        Modules.id.desc()
+    ).all()
+
+    # --- 4) actividades de esos módulos (solo publicadas) ---
+    activities = []
+    if modules:
+        mids = [m.id for m in modules]
+        activities = (
+            Activities.query
+            .filter(Activities.module_id.in_(mids))
+            .filter((Activities.is_published == True) | (Activities.is_published.is_(None)))
+            .order_by(Activities.module_id.asc(), Activities.position.asc(), Activities.id.asc())
+            .limit(10)
+            .all()
+        )
+
+    mission_rows, mission_summary = evaluate_missions(user_id)
+    return {
+        "profile": profile,
+        "modules": modules,
+        "activities": activities,
+        "missions": mission_rows,
+        "mission_summary": mission_summary,
+    }
+
+
+# --- módulos ---
+def module_view(module, profile) -> SimpleNamespace:
+    """
+    Lo que ve el estudiante de un módulo: la versión publicada (inmutable) si
+    existe, o el borrador en vivo. `snapshot` es None en el segundo caso.
+    """
+    snap = versions.published_snapshot(module)
+    if snap is not None:
+        meta = snap["module"]
+        return SimpleNamespace(
+            snapshot=snap,
+            module=versions.as_view(meta),
+            activities=[versions.as_view(a) for a in snap["activities"]],
+            sections=snap["sections"],
+            can_access=(meta["level"] is None) or ((profile.level or 1) >= (meta["level"] or 1)),
+        )
+
+    # --- borrador / sin publicar: se arma en vivo desde el builder ---
+    raw = {}
+    if module.content_json:
+        try:
+            raw = json.loads(module.content_json)
+        except Exception:
+            raw = {}
+    activities = (
+        Activities.query
+        .filter_by(module_id=module.id, is_published=True)
+        .order_by(Activities.position.asc(), Activities.id.asc())
+        .all()
+    )
+    return SimpleNamespace(
+        snapshot=None,
+        module=module,
+        activities=activities,
+        sections=versions.normalize_sections(raw),
+        can_access=(module.level is None) or ((profile.level or 1) >= (module.level or 1)),
+    )
+
+
+# --- actividades ---
+def activity_context(a, user_id, profile=None) -> SimpleNamespace:
+    """
+    Estado de una actividad para el estudiante: versión publicada a jugar,
+    gate por nivel y límite de intentos. `a` es el modelo Activities.
+    """
+    s = get_settings()
+    profile = profile or get_or_create_profile(user_id)
+    module = Modules.query.get(a.module_id)
+
+    # Si el módulo tiene versión publicada, se juega (y se califica) esa versión
+    snap = versions.published_snapshot(module)
+    published = snap["activities_by_id"].get(a.id) if snap else None
+    if published is not None:
+        a = versions.as_view(published)
+
+    required_level = (module.level or 1) if module and module.level is not None else None
+    current_level = profile.level or 1
+
+    used = Attempts.query.filter_by(user_id=user_id, activity_id=a.id).count()
+    limit = a.attempt_limit if a.attempt_limit is not None else s.max_attempts_default
+
+    return SimpleNamespace(
+        activity=a,
+        module=module,
+        snapshot=snap,
+        published=published,
+        profile=profile,
+        settings=s,
+        quiz_like=scoring.is_quiz_like(a.type),
+        required_level=required_level,
+        locked=required_level is not None and current_level < required_level,
+        used=used,
+        limit=limit,
+        blocked=(limit is not None) and (used >= limit),
+        attempts_left=(None if limit is None else max(0, limit - used)),
+    )
+
+
+def level_error(ctx) -> StudentFlowError:
+    return StudentFlowError(
+        f"Necesitas nivel {ctx.required_level} para hacer esta actividad. "
+        f"Tu nivel actual es {ctx.profile.level or 1}.",
+        status=403, module_id=ctx.activity.module_id,
+    )
+
+
+def activity_content(ctx) -> dict:
+    if ctx.published is not None:
+        return ctx.published["content"]
+    if ctx.activity.content_json:
+        try:
+            return json.loads(ctx.activity.content_json)
+        except Exception:
+            return {}
+    return {}
+
+
+def _label(d, *keys):
+    for k in keys:
+        v = d.get(k)
+        if v:
+            return v
+    return None
+
+
+def public_content(ctx, content) -> dict:
+    """
+    Contenido para mostrar, sin puntajes ni efectos de las opciones (misma
+    lectura flexible que `activity_quiz.html`).
+    """
+    a = ctx.activity
+    if not ctx.quiz_like:
+        return {"text": content.get("text"), "html": content.get("html")}
+
+    if content.get("questions") or content.get("quiz"):
+        questions = content.get("questions") or (content.get("quiz") or {}).get("questions") or []
+    elif content.get("prompt") and content.get("options"):
+        questions = [{"text": content["prompt"], "options": content["options"]}]
+    else:
+        questions = []
+
+    out = []
+    for i, q in enumerate(questions):
+        q = q if isinstance(q, dict) else {"text": str(q)}
+        opts = []
+        for j, opt in enumerate(q.get("options") or q.get("choices") or []):
+            if isinstance(opt, dict):
+                key = opt.get("key") or j
+                label = _label(opt, "label", "text", "title", "value") or f"Opción {j + 1}"
+            else:
+                key, label = j, opt
+            opts.append({"key": str(key), "label": label})
+        out.append({
+            "index": i,
+            "text": _label(q, "text", "label", "title") or f"Pregunta {i + 1}",
+            "options": opts,
+        })
+    return {"questions": out, "type": (a.type or "quiz").lower()}
+
+
+def submit_attempt(ctx, user_id, answers: dict) -> dict:
+    """
+    Califica, aplica efectos al perfil, guarda el intento y devuelve el
+    resultado (el mismo dict que muestra `activity_result.html`).
+    """
+    a = ctx.activity
+    if ctx.locked:
+        raise level_error(ctx)
+    if ctx.blocked:
+        raise StudentFlowError(
+            "Ya alcanzaste el límite de intentos para esta actividad.",
+            status=409, module_id=a.module_id,
+        )
+
+    content = activity_content(ctx)
+    if ctx.quiz_like:
+        # solo índices de preguntas que existen (como el formulario q0, q1, ...)
+        n = len(content.get("questions", []))
+        answers = {k: v for k, v in answers.items() if k.isdigit() and int(k) < n}
+    else:
+        answers = {}
+
+    profile = ctx.profile
+    result = scoring.score_submission(a, content, answers)
+    score = result["score"]
+    delta_credit = result["delta_credit"]
+    delta_cash = result["delta_cash"]
+    delta_energy = result["delta_energy"]
+    xp_gain = result["xp"]
+
+    # --- Aplicar efectos al perfil ---
+    if delta_credit:
+        profile.credit_score = max(
+            300,
+            min(850, (profile.credit_score or 650) + delta_credit),
+        )
+    if delta_cash:
+        profile.cash_balance = (profile.cash_balance or 0.0) + delta_cash
+    if delta_energy:
+        profile.energy = max(0, (profile.energy or 100) + delta_energy)
+
+    # --- XP + level up ---
+    level_ups = _apply_xp(profile, xp_gain, ctx.settings)
+
+    # --- Guardar intento ---
+    att = Attempts(
+        user_id=user_id,
+        activity_id=a.id,
+        score=float(score),
+        answers_json=json.dumps(answers),
+        ended_at=datetime.utcnow(),
+    )
+    db.session.add(att)
+    db.session.commit()
+    identity.invalidate(user_id)
+
+    return {
+        "activity_id": a.id,
+        "title": a.title,
+        "score": int(score),
+        "xp": int(xp_gain),
+        "delta_credit": int(delta_credit),
+        "delta_cash": float(delta_cash),
+        "delta_energy": int(delta_energy),
+        "level_ups": int(level_ups),
+        "attempts_left": (max(0, (ctx.limit - (ctx.used + 1))) if ctx.limit is not None else None),
+    }
+
+
+# --- misiones ---
+def _module_completed(module, user_id) -> bool:
+    total = module.activities.count()
+    if total == 0:
+        return False
+    done = (
+        Attempts.query.filter_by(user_id=user_id)
+        .join(Activities)
+        .filter(Activities.module_id == module.id)
+        .count()
+    )
+    return done >= total
+
+
+def check_mission_completed(mission, profile, user_id):
+    """Devuelve True si el estudiante cumple la condición de la misión."""
+    t = (mission.condition_type or "").lower()
+    val = mission.condition_value
+
+    # 1) Llegar a cierto nivel
+    if t == "reach_level" and val is not None:
+        return (profile.level or 1) >= int(val)
+
+    # 2) Completar un módulo específico (todas sus actividades)
+    if t == "complete_module" and val is not None:
+        module = Modules.query.get(int(val))
+        return bool(module) and _module_completed(module, user_id)
+
+    # 3) Completar tu PRIMER módulo (cualquiera)
+    if t == "complete_any_module":
+        return any(_module_completed(m, user_id) for m in Modules.query.all())
+
+    return False
+
+
+def evaluate_missions(user_id):
+    """Crea/actualiza MissionProgress y devuelve (lista, resumen)."""
+    profile = get_or_create_profile(user_id)
+    missions = Missions.query.filter_by(is_active=True).order_by(Missions.id.asc()).all()
+
+    rows = []
+    changed = False
+
+    for m in missions:
+        prog = MissionProgress.query.filter_by(mission_id=m.id, user_id=user_id).first()
+        if not prog:
+            prog = MissionProgress(mission_id=m.id, user_id=user_id)
+            db.session.add(prog)
+            changed = True
+
+        completed = check_mission_completed(m, profile, user_id)
+        if completed and not prog.is_completed:
+            prog.is_completed = True
+            prog.completed_at = datetime.utcnow()
+            changed = True
+
+        rows.append((m, prog))
+
+    if changed:
+        db.session.commit()
+
+    summary = {
+        "total": len(rows),
+        "ready": sum(1 for m, p in rows if p.is_completed and not p.is_collected),
+        "completed": sum(1 for m, p in rows if p.is_completed),
+        "collected": sum(1 for m, p in rows if p.is_collected),
+    }
+    return rows, summary
+
+
+def collect_mission(user_id, mission) -> dict:
+    """Cobra la recompensa de una misión completada."""
+    profile = get_or_create_profile(user_id)
+    prog = MissionProgress.query.filter_by(
+        mission_id=mission.id,
+        user_id=user_id
+    ).first()
+
+    if not prog or not prog.is_completed:
+        raise StudentFlowError("Esta misión todavía no está completa.", status=409)
+    if prog.is_collected:
+        raise StudentFlowError("Ya cobraste la recompensa de esta misión.", status=409)
+
+    # aplicar recompensas
+    xp = int(mission.xp_reward or 0)
+    cash = float(mission.cash_reward or 0.0)
+    profile.cash_balance = float(profile.cash_balance or 0.0) + cash
+    # recalcular level-ups usando la misma lógica que las actividades
+    level_ups = _apply_xp(profile, xp, get_settings())
+
+    prog.is_collected = True
+    prog.collected_at = datetime.utcnow()
+
+    db.session.commit()
+    identity.invalidate(user_id)
+    return {"mission_id": mission.id, "xp": xp, "cash": cash, "level_ups": level_ups}
@@ -0,0 +1,354 @@
+"""
+Datos sintéticos para pruebas de carga (`flask seed --scale N`).
+
+Por cada unidad de escala:
+  3 admins, 100 profesores, 300 grupos (3 por profesor), 10.000 estudiantes
+  con perfil (cada uno en un grupo), 20 módulos publicados con secciones del
+  builder y 5 actividades tipo quiz cada uno, 4 módulos asignados por grupo,
+  100.000 intentos (10 por estudiante, sobre los módulos de su grupo),
+  ~30.000 filas de mission_progress y 50.000 request_log (la última semana,
+  con algo en la última hora para el p95).
+
+`--scale 10` son 1M de intentos y 100k estudiantes. Todo sale de un
+`random.Random(seed)`: con la misma semilla sobre la misma base se generan
+los mismos datos (las fechas son relativas al momento de la carga).
+
+Las filas van con ids explícitos (desde el máximo actual) para poder armar
+las FKs sin RETURNING, en bloques de `chunk_size`: COPY en PostgreSQL con
+psycopg2 e INSERT multi-fila en el resto. Al final se publican los módulos
+(`module_versions`), se reconcilian los contadores del dashboard, se ajustan
+las secuencias y se corre ANALYZE.
+
+Cuentas: admin{n} / profesor{n} / estudiante{n} con las contraseñas del seed demo
+(un solo hash para todas; ver `email_for`).
+"""
+import csv
+import io
+import json
+import math
+import random
+import time
+from datetime import datetime, timedelta
+
+from sqlalchemy import func, select, text
+
+from . import db
+from .models import (
+    Users, Modules, Activities, Attempts, StudentProfiles, Groups,
+    GroupMembers, ModuleAssignments, Missions, MissionProgress, RequestLog,
+    ROLE_ADMIN, ROLE_TEACHER, ROLE_STUDENT,
+)
+
+EMAIL_DOMAIN = "scale.econquest.test"
+PASSWORDS = {ROLE_ADMIN: "admin123", ROLE_TEACHER: "teacher123", ROLE_STUDENT: "student123"}
+
+# por unidad de escala
+ADMINS = 3
+TEACHERS = 100
+GROUPS_PER_TEACHER = 3
+STUDENTS = 10_000
+MODULES = 20
+ACTIVITIES_PER_MODULE = 5
+QUESTIONS_PER_ACTIVITY = 3
+ASSIGNMENTS_PER_GROUP = 4
+ATTEMPTS_PER_STUDENT = 10
+MISSIONS_PER_STUDENT = 3
+REQUEST_LOGS = 50_000
+
+_FIRST = ["Ana", "Luis", "María", "José", "Carmen", "Jorge", "Sofía", "Pedro", "Lucía", "Diego",
+          "Valeria", "Andrés", "Camila", "Javier", "Isabel", "Miguel", "Paula", "Carlos", "Elena", "Raúl"]
+_LAST = ["Rivera", "Santiago", "Colón", "Torres", "Vázquez", "Ortiz", "Morales", "Rosario", "Cruz",
+         "Ramos", "Díaz", "Reyes", "Medina", "Ruiz", "Figueroa", "Negrón", "Soto", "Acevedo"]
+_TOPICS = ["Presupuesto", "Ahorro", "Crédito", "Intereses", "Impuestos", "Inversión", "Seguros",
+           "Préstamos", "Tarjetas", "Nómina", "Inflación", "Deuda", "Vivienda", "Auto", "Emergencias"]
+_PATHS = [("/student/dashboard", 30), ("/student/module/{m}", 20), ("/student/activity/{a}", 20),
+          ("/auth/login", 8), ("/teacher/dashboard", 6), ("/teacher/gradebook/{g}", 5),
+          ("/api/student/dashboard", 6), ("/admin/dashboard", 2), ("/", 3)]
+
+
+def email_for(role: str, n: int) -> str:
+    """Email de la cuenta sintética n (1..) de ese rol."""
+    prefix = {ROLE_ADMIN: "admin", ROLE_TEACHER: "profesor"}.get(role, "estudiante")
+    return f"{prefix}{n}@{EMAIL_DOMAIN}"
+
+
+class _Loader:
+    """Inserta filas en bloques: COPY si el driver es psycopg2, si no executemany."""
+
+    def __init__(self, chunk_size: int):
+        self.chunk_size = chunk_size
+        dialect = db.session.connection().dialect
+        self.copy = dialect.name == "postgresql" and dialect.driver == "psycopg2"
+
+    def load(self, model, columns, rows) -> int:
+        table = model.__table__
+        self.conn = db.session.connection()  # la de la transacción actual
+        t0, n, batch = time.perf_counter(), 0, []
+        for row in rows:
+            batch.append(row)
+            if len(batch) >= self.chunk_size:
+                self._flush(table, columns, batch)
+                n += len(batch)
+                batch = []
+        if batch:
+            self._flush(table, columns, batch)
+            n += len(batch)
+        db.session.commit()
+        print(f"  {table.name}: {n} filas en {time.perf_counter() - t0:.1f} s")
+        return n
+
+    def _flush(self, table, columns, batch):
+        if self.copy:
+            buf = io.StringIO()
+            w = csv.writer(buf)
+            for row in batch:
+                w.writerow([_csv_value(v) for v in row])
+            buf.seek(0)
+            cur = self.conn.connection.driver_connection.cursor()
+            cur.copy_expert(f"COPY {table.name} ({', '.join(columns)}) FROM STDIN WITH (FORMAT csv)", buf)
+            cur.close()
+        else:
+            self.conn.execute(table.insert(), [dict(zip(columns, row)) for row in batch])
+
+
+def _csv_value(v):
+    if v is None:
+        return None  # vacío sin comillas = NULL
+    if isinstance(v, bool):
+        return "t" if v else "f"
+    if isinstance(v, datetime):
+        return v.isoformat(sep=" ")
+    return v
+
+
+def _next_id(model) -> int:
+    return (db.session.scalar(select(func.max(model.id))) or 0) + 1
+
+
+def _quiz_content(rng, topic, n):
+    questions = []
+    for q in range(QUESTIONS_PER_ACTIVITY):
+        best = rng.randrange(4)
+        questions.append({
+            "prompt": f"{topic} {n}.{q + 1}: ¿qué conviene hacer?",
+            "options": [
+                {"key": k, "label": f"Opción {k.upper()}",
+                 "points": 10 if i == best else 0,
+                 "delta_credit": 5 if i == best else -rng.randrange(1, 6),
+                 "delta_cash": 25.0 if i == best else -10.0}
+                for i, k in enumerate("abcd")
+            ],
+        })
+    return {"questions": questions, "xp_reward": 20}
+
+
+def _module_content(rng, topic):
+    """Secciones del builder: las que renderiza student/module_detail.html."""
+    steps = "\n".join(f"Paso {i + 1}: revisa tu {topic.lower()}" for i in range(rng.randrange(3, 7)))
+    return {"sections": [
+        {"type": "heading", "text": f"¿Qué es {topic.lower()}?"},
+        {"type": "paragraph", "text": f"{topic}: conceptos básicos y ejemplos de la vida diaria. " * 4},
+        {"type": "tip", "title": "Tip", "text": f"Compara antes de decidir sobre {topic.lower()}."},
+        {"type": "divider"},
+        {"type": "checklist", "title": "Antes de seguir", "items": [steps, "Completa la práctica"]},
+        {"type": "paragraph", "text": "Resumen del módulo. " * 6},
+    ]}
+
+
+def generate(scale: int, seed: int = 42, chunk_size: int = 10000) -> dict:
+    """Carga `scale` unidades de datos sintéticos. Devuelve filas por tabla."""
+    if db.session.scalar(select(Users.id).where(Users.email == email_for(ROLE_TEACHER, 1))):
+        raise RuntimeError(f"ya hay datos sintéticos ({email_for(ROLE_TEACHER, 1)}); usar una base limpia")
+
+    rng = random.Random(seed)
+    now = datetime.utcnow().replace(microsecond=0)
+    loader = _Loader(chunk_size)
+    counts = {}
+
+    n_teachers = TEACHERS * scale
+    n_groups = n_teachers * GROUPS_PER_TEACHER
+    n_students = STUDENTS * scale
+    n_modules = MODULES * scale
+    hashes = {}
+    for role, pw in PASSWORDS.items():
+        u = Users()
+        u.set_password(pw)  # un hash por rol: hashear 100k contraseñas tomaría horas
+        hashes[role] = u.hashed_pw
+
+    # --- usuarios ---
+    first_user = _next_id(Users)
+    teacher_ids = range(first_user, first_user + n_teachers)
+    student_ids = range(teacher_ids.stop, teacher_ids.stop + n_students)
+    admin_ids = range(student_ids.stop, student_ids.stop + ADMINS * scale)
+
+    def users():
+        for i, uid in enumerate(teacher_ids, 1):
+            yield (uid, f"{rng.choice(_FIRST)} {rng.choice(_LAST)}", email_for(ROLE_TEACHER, i),
+                   ROLE_TEACHER, "es", hashes[ROLE_TEACHER], now - timedelta(days=rng.randrange(90, 365)))
+        for i, uid in enumerate(student_ids, 1):
+            yield (uid, f"{rng.choice(_FIRST)} {rng.choice(_LAST)}", email_for(ROLE_STUDENT, i),
+                   ROLE_STUDENT, "es", hashes[ROLE_STUDENT], now - timedelta(days=rng.randrange(1, 180)))
+        for i, uid in enumerate(admin_ids, 1):
+            yield (uid, f"Admin {i}", email_for(ROLE_ADMIN, i), ROLE_ADMIN, "es", hashes[ROLE_ADMIN],
+                   now - timedelta(days=365))
+    counts["users"] = loader.load(Users, ["id", "name", "email", "role", "locale", "hashed_pw", "created_at"], users())
+
+    def profiles():
+        pid = _next_id(StudentProfiles)
+        for uid in student_ids:
+            level = min(10, 1 + int(rng.expovariate(0.5)))
+            yield (pid, uid, rng.randrange(500, 800), round(rng.uniform(0, 3000), 2),
+                   float(rng.choice([900, 1200, 1600, 2200])), rng.random() < 0.3, 0.0,
+                   level, rng.randrange(0, 100), rng.randrange(20, 101), now)
+            pid += 1
+    counts["student_profiles"] = loader.load(
+        StudentProfiles,
+        ["id", "user_id", "credit_score", "cash_balance", "salary_monthly", "has_car",
+         "car_payment_monthly", "level", "xp", "energy", "created_at"],
+        profiles())
+
+    # --- grupos ---
+    first_group = _next_id(Groups)
+    group_ids = range(first_group, first_group + n_groups)
+    counts["groups"] = loader.load(
+        Groups, ["id", "name", "grade_level", "section", "created_at", "teacher_id"],
+        ((gid, f"Grupo {i + 1}", str(9 + i % 4), "ABC"[i % 3], now - timedelta(days=120),
+          teacher_ids[i // GROUPS_PER_TEACHER]) for i, gid in enumerate(group_ids)))
+
+    student_group = {uid: group_ids[i % n_groups] for i, uid in enumerate(student_ids)}
+
+    def members():
+        mid = _next_id(GroupMembers)
+        for uid, gid in student_group.items():
+            yield (mid, gid, uid, now - timedelta(days=100))
+            mid += 1
+    counts["group_members"] = loader.load(GroupMembers, ["id", "group_id", "user_id", "created_at"], members())
+
+    # --- módulos y actividades (quiz) ---
+    first_module = _next_id(Modules)
+    module_ids = range(first_module, first_module + n_modules)
+    counts["modules"] = loader.load(
+        Modules, ["id", "title", "summary", "is_published", "level", "xp_reward", "content_version",
+                  "content_json"],
+        ((mid, f"{_TOPICS[i % len(_TOPICS)]} {i // len(_TOPICS) + 1}",
+          f"Módulo sintético de {_TOPICS[i % len(_TOPICS)].lower()}.", True, 1 + i % 5, 100, 0,
+          json.dumps(_module_content(rng, _TOPICS[i % len(_TOPICS)]), ensure_ascii=False))
+         for i, mid in enumerate(module_ids)))
+
+    activities_of = {}   # module_id -> [activity_id]
+    points_of = {}       # activity_id -> [[points por opción] por pregunta]
+
+    def activities():
+        aid = _next_id(Activities)
+        for i, mid in enumerate(module_ids):
+            topic = _TOPICS[i % len(_TOPICS)]
+            for pos in range(1, ACTIVITIES_PER_MODULE + 1):
+                content = _quiz_content(rng, topic, pos)
+                activities_of.setdefault(mid, []).append(aid)
+                points_of[aid] = [[o["points"] for o in q["options"]] for q in content["questions"]]
+                yield (aid, mid, pos, f"{topic}: práctica {pos}", "quiz", 10 * QUESTIONS_PER_ACTIVITY,
+                       True, json.dumps(content, ensure_ascii=False), None, 20, 0)
+                aid += 1
+    counts["activities"] = loader.load(
+        Activities,
+        ["id", "module_id", "position", "title", "type", "max_points", "is_published",
+         "content_json", "attempt_limit", "default_xp", "xp_on_finish"],
+        activities())
+
+    assigned = {}
+
+    def assignments():
+        aid = _next_id(ModuleAssignments)
+        for gid in group_ids:
+            assigned[gid] = rng.sample(list(module_ids), min(ASSIGNMENTS_PER_GROUP, n_modules))
+            for mid in assigned[gid]:
+                yield (aid, gid, mid, now + timedelta(days=rng.randrange(1, 30)))
+                aid += 1
+    counts["module_assignments"] = loader.load(
+        ModuleAssignments, ["id", "group_id", "module_id", "due_date"], assignments())
+
+    # --- intentos ---
+    def attempts():
+        aid = _next_id(Attempts)
+        for uid in student_ids:
+            pool = [a for m in assigned[student_group[uid]] for a in activities_of[m]]
+            for _ in range(ATTEMPTS_PER_STUDENT):
+                act = rng.choice(pool)
+                answers, score = {}, 0
+                for q, pts in enumerate(points_of[act]):
+                    k = rng.randrange(len(pts))
+                    answers[str(q)] = "abcd"[k]
+                    score += pts[k]
+                started = now - timedelta(minutes=rng.randrange(10, 90 * 24 * 60))
+                yield (aid, uid, act, float(score), json.dumps(answers), started,
+                       started + timedelta(seconds=rng.randrange(20, 600)))
+                aid += 1
+    counts["attempts"] = loader.load(
+        Attempts, ["id", "user_id", "activity_id", "score", "answers_json", "started_at", "ended_at"],
+        attempts())
+
+    # --- misiones ---
+    missions = [Missions(title=f"Llega al nivel {lvl}", condition_type="reach_level", condition_value=lvl,
+                         xp_reward=50 * lvl, cash_reward=100.0 * lvl, is_active=True, created_by=teacher_ids[0])
+                for lvl in (2, 3, 5, 8)]
+    missions += [Missions(title=f"Completa {_TOPICS[i % len(_TOPICS)]} {i // len(_TOPICS) + 1}",
+                          condition_type="complete_module", condition_value=mid,
+                          xp_reward=100, cash_reward=250.0, is_active=True, created_by=teacher_ids[0])
+                 for i, mid in enumerate(module_ids[:6])]
+    db.session.add_all(missions)
+    db.session.commit()
+    counts["missions"] = len(missions)
+    mission_ids = [m.id for m in missions]
+
+    def progress():
+        pid = _next_id(MissionProgress)
+        for uid in student_ids:
+            for mission_id in rng.sample(mission_ids, min(MISSIONS_PER_STUDENT, len(mission_ids))):
+                done = rng.random() < 0.4
+                collected = done and rng.random() < 0.7
+                at = now - timedelta(days=rng.randrange(0, 60)) if done else None
+                yield (pid, mission_id, uid, done, collected, at, at if collected else None)
+                pid += 1
+    counts["mission_progress"] = loader.load(
+        MissionProgress,
+        ["id", "mission_id", "user_id", "is_completed", "is_collected", "completed_at", "collected_at"],
+        progress())
+
+    # --- request_log (última semana; ~5% en la última hora) ---
+    paths, weights = zip(*_PATHS)
+    first_activity = min(points_of)
+
+    def request_logs():
+        rid = _next_id(RequestLog)
+        for _ in range(REQUEST_LOGS * scale):
+            path = rng.choices(paths, weights)[0].format(
+                m=rng.choice(module_ids), a=first_activity + rng.randrange(len(points_of)), g=rng.choice(group_ids))
+            ago = rng.randrange(0, 3600) if rng.random() < 0.05 else rng.randrange(0, 7 * 86400)
+            status = rng.choices((200, 302, 404, 500), (90, 6, 3, 1))[0]
+            yield (rid, "GET", path, status, int(math.exp(rng.gauss(3.5, 0.6))), now - timedelta(seconds=ago))
+            rid += 1
+    counts["request_log"] = loader.load(
+        RequestLog, ["id", "method", "path", "status_code", "duration_ms", "created_at"], request_logs())
+
+    _finish(module_ids)
+    return counts
+
+
+def _finish(module_ids) -> None:
+    from . import counters, versions
+    t0 = time.perf_counter()
+    for m in Modules.query.filter(Modules.id.in_(list(module_ids))).all():
+        versions.sync_publication(m, commit=False)
+    db.session.commit()
+    counters.reconcile()
+
+    conn = db.session.connection()
+    if conn.dialect.name == "postgresql":
+        # ids explícitos: las secuencias quedaron atrás
+        for model in (Users, StudentProfiles, Groups, GroupMembers, Modules, Activities,
+                      ModuleAssignments, Attempts, MissionProgress, RequestLog):
+            t = model.__table__.name
+            conn.execute(text(f"SELECT setval(pg_get_serial_sequence('{t}', 'id'), (SELECT MAX(id) FROM {t}))"))
+    conn.execute(text("ANALYZE"))
+    db.session.commit()
+    print(f"  publicación, contadores y ANALYZE en {time.perf_counter() - t0:.1f} s")
@@ -0,0 +1,166 @@
+"""
+Autosave por deltas para el constructor de módulos.
+
+El cliente manda operaciones estilo JSON-Patch (RFC 6902: add, remove,
+replace, move, copy, test) contra la versión de `content_json` que tiene
+cargada. El servidor las aplica y guarda con un UPDATE condicionado a esa
+versión: si otra pestaña/profesor guardó antes, el UPDATE no toca filas y
+se responde conflicto en vez de pisar el trabajo ajeno.
+"""
+import copy
+import json
+
+from sqlalchemy import update
+
+from app import db
+from app.models import Modules
+
+MAX_OPS = 200
+
+
+class PatchError(ValueError):
+    """Operación inválida o que no aplica al documento."""
+
+
+class VersionConflict(Exception):
+    def __init__(self, current_version):
+        super().__init__(f"content_version actual: {current_version}")
+        self.current_version = current_version
+
+
+def _tokens(path):
+    if not isinstance(path, str) or (path and not path.startswith("/")):
+        raise PatchError(f"path inválido: {path!r}")
+    if path == "":
+        return []
+    return [t.replace("~1", "/").replace("~0", "~") for t in path[1:].split("/")]
+
+
+def _index(container, token, allow_end=False):
+    if allow_end and token == "-":
+        return len(container)
+    if not token.isdigit() or (len(token) > 1 and token.startswith("0")):
+        raise PatchError(f"índice inválido: {token!r}")
+    i = int(token)
+    if i > len(container) or (i == len(container) and not allow_end):
+        raise PatchError(f"índice fuera de rango: {i}")
+    return i
+
+
+def _parent(doc, tokens):
+    if not tokens:
+        raise PatchError("no se puede operar sobre la raíz")
+    node = doc
+    for t in tokens[:-1]:
+        if isinstance(node, list):
+            node = node[_index(node, t)]
+        elif isinstance(node, dict) and t in node:
+            node = node[t]
+        else:
+            raise PatchError(f"ruta inexistente: /{'/'.join(tokens)}")
+    return node, tokens[-1]
+
+
+def _get(doc, tokens):
+    node = doc
+    for t in tokens:
+        if isinstance(node, list):
+            node = node[_index(node, t)]
+        elif isinstance(node, dict) and t in node:
+            node = node[t]
+        else:
+            raise PatchError(f"ruta inexistente: /{'/'.join(tokens)}")
+    return node
+
+
+def _add(doc, tokens, value):
+    parent, key = _parent(doc, tokens)
+    if isinstance(parent, list):
+        parent.insert(_index(parent, key, allow_end=True), value)
+    elif isinstance(parent, dict):
+        parent[key] = value
+    else:
+        raise PatchError("el destino no es contenedor")
+
+
+def _remove(doc, tokens):
+    parent, key = _parent(doc, tokens)
+    if isinstance(parent, list):
+        return parent.pop(_index(parent, key))
+    if isinstance(parent, dict) and key in parent:
+        return parent.pop(key)
+    raise PatchError(f"ruta inexistente: /{'/'.join(tokens)}")
+
+
+def apply_patch(doc, ops):
+    """Aplica `ops` sobre una copia de `doc` y la devuelve (todo o nada)."""
+    if not isinstance(ops, list):
+        raise PatchError("ops debe ser una lista")
+    if len(ops) > MAX_OPS:
+        raise PatchError(f"máximo {MAX_OPS} operaciones por guardado")
+
+    doc = copy.deepcopy(doc)
+    for op in ops:
+        if not isinstance(op, dict):
+            raise PatchError("cada operación debe ser un objeto")
+        kind = op.get("op")
+        tokens = _tokens(op.get("path"))
+        if kind == "add":
+            _add(doc, tokens, op.get("value"))
+        elif kind == "remove":
+            _remove(doc, tokens)
+        elif kind == "replace":
+            _remove(doc, tokens)
+            _add(doc, tokens, op.get("value"))
+        elif kind == "move":
+            src = _tokens(op.get("from"))
+            if tokens[:len(src)] == src and tokens != src:
+                raise PatchError("no se puede mover un nodo dentro de sí mismo")
+            _add(doc, tokens, _remove(doc, src))
+        elif kind == "copy":
+            _add(doc, tokens, copy.deepcopy(_get(doc, _tokens(op.get("from")))))
+        elif kind == "test":
+            if _get(doc, tokens) != op.get("value"):
+                raise PatchError(f"test falló en {op.get('path')}")
+        else:
+            raise PatchError(f"op desconocida: {kind!r}")
+    return doc
+
+
+def load_content(module) -> dict:
+    try:
+        data = json.loads(module.content_json or "{}")
+    except Exception:
+        data = {}
+    return data if isinstance(data, dict) else {}
+
+
+def autosave_module(module, base_version: int, ops) -> int:
+    """
+    Aplica `ops` al contenido del módulo si sigue en `base_version`.
+    Devuelve la nueva versión; lanza VersionConflict o PatchError.
+    """
+    current = module.content_version or 0
+    if base_version != current:
+        raise VersionConflict(current)
+
+    doc = apply_patch(load_content(module), ops)
+    if not ops:
+        return current
+
+    res = db.session.execute(
+        update(Modules)
+        .where(Modules.id == module.id, Modules.content_version == base_version)
+        .values(
+            content_json=json.dumps(doc, ensure_ascii=False, separators=(",", ":")),
+            content_version=base_version + 1,
+        )
+        .execution_options(synchronize_session=False)
+    )
+    if res.rowcount != 1:
+        db.session.rollback()
+        raise VersionConflict(
+            db.session.query(Modules.content_version).filter_by(id=module.id).scalar()
+        )
+    db.session.commit()
+    return base_version + 1
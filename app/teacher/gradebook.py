@@ -0,0 +1,185 @@
+"""
+Gradebook por grupo: matriz estudiante × actividad con el mejor puntaje,
+porcentajes de completado y distribución de puntajes por actividad.
+
+Todo sale de UNA consulta agregada sobre `attempts` (GROUP BY + ventanas),
+no de una consulta por celda. El resultado se cachea por grupo junto con una
+marca de frescura (`_freshness`: último intento de sus estudiantes, miembros
+y módulos asignados) que se vuelve a leer en cada request con una consulta
+chica: un intento nuevo, o un alta/baja en el grupo, hecho en cualquier
+worker invalida la entrada. `invalidate_all` (re-score, acciones en lote,
+que también cambian puntajes viejos) llega a todos los workers vía
+app/generations.py.
+"""
+from datetime import datetime
+
+from sqlalchemy import func, select
+
+from app import db, generations
+from app.cache import TTLCache
+from app.models import (
+    Users, Modules, Activities, Attempts, GroupMembers, ModuleAssignments,
+)
+
+# rangos (en % de max_points) para la distribución de puntajes
+BUCKETS = ((0, 20), (20, 40), (40, 60), (60, 80), (80, 101))
+BUCKET_LABELS = ["0-19", "20-39", "40-59", "60-79", "80-100"]
+
+# group_id -> (generación, marca de frescura, payload)
+_cache = TTLCache(ttl=300, maxsize=512)
+_GENERATION = "gradebook"
+
+
+def invalidate_group(group_id: int) -> None:
+    _cache.pop(group_id)
+
+
+def invalidate_all() -> None:
+    """Limpia la caché en todos los workers (commit propio)."""
+    _cache.clear()
+    generations.bump(_GENERATION)
+
+
+def _freshness(group_id: int) -> tuple:
+    """Cambia con cada intento nuevo de un miembro y con cada alta/baja de miembros o asignaciones."""
+    members = select(GroupMembers.user_id).where(GroupMembers.group_id == group_id)
+    in_group = GroupMembers.group_id == group_id
+    assigned = ModuleAssignments.group_id == group_id
+    return tuple(db.session.execute(select(
+        select(func.max(Attempts.id)).where(Attempts.user_id.in_(members)).scalar_subquery(),
+        select(func.count(GroupMembers.id)).where(in_group).scalar_subquery(),
+        select(func.sum(GroupMembers.user_id)).where(in_group).scalar_subquery(),
+        select(func.count(ModuleAssignments.id)).where(assigned).scalar_subquery(),
+        select(func.sum(ModuleAssignments.module_id)).where(assigned).scalar_subquery(),
+    )).one())
+
+
+def group_gradebook(group_id: int) -> dict:
+    gen = generations.current(_GENERATION)
+    mark = _freshness(group_id)  # antes de calcular: lo que entre después invalida
+    hit = _cache.get(group_id)
+    if hit is not None and hit[0] == gen and hit[1] == mark:
+        return hit[2]
+    payload = _compute(group_id)
+    _cache.set(group_id, (gen, mark, payload))
+    return payload
+
+
+def _group_activities(group_id: int):
+    """Actividades publicadas de los módulos asignados al grupo (o publicados, si no hay asignaciones)."""
+    assigned = select(ModuleAssignments.module_id).where(ModuleAssignments.group_id == group_id)
+    has_assignments = db.session.query(assigned.exists()).scalar()
+
+    q = Activities.query.join(Modules, Modules.id == Activities.module_id)
+    if has_assignments:
+        q = q.filter(Activities.module_id.in_(assigned))
+    else:
+        q = q.filter((Modules.is_published == True) | (Modules.is_published.is_(None)))
+    return (
+        q.filter((Activities.is_published == True) | (Activities.is_published.is_(None)))
+        .with_entities(Activities.id, Activities.title, Activities.module_id,
+                       Activities.max_points, Modules.title.label("module_title"))
+        .order_by(Activities.module_id.asc(), Activities.position.asc(), Activities.id.asc())
+        .all()
+    )
+
+
+def _compute(group_id: int):
+    members = select(GroupMembers.user_id).where(GroupMembers.group_id == group_id)
+    students = (
+        Users.query
+        .filter(Users.id.in_(members))
+        .with_entities(Users.id, Users.name)
+        .order_by(Users.name.asc(), Users.id.asc())
+        .all()
+    )
+    activities = _group_activities(group_id)
+
+    student_idx = {s.id: i for i, s in enumerate(students)}
+    activity_idx = {a.id: j for j, a in enumerate(activities)}
+    cells = [[None] * len(activities) for _ in students]
+
+    if students and activities:
+        per_cell = (
+            db.session.query(
+                Attempts.user_id.label("user_id"),
+                Attempts.activity_id.label("activity_id"),
+                func.max(Attempts.score).label("best"),
+                func.count(Attempts.id).label("tries"),
+            )
+            .filter(Attempts.user_id.in_(members))
+            .filter(Attempts.activity_id.in_(list(activity_idx)))
+            .group_by(Attempts.user_id, Attempts.activity_id)
+            .subquery()
+        )
+        rows = db.session.query(
+            per_cell.c.user_id,
+            per_cell.c.activity_id,
+            per_cell.c.best,
+            per_cell.c.tries,
+            func.rank().over(partition_by=per_cell.c.activity_id,
+                             order_by=per_cell.c.best.desc()).label("rank"),
+        ).all()
+
+        for r in rows:
+            i, j = student_idx.get(r.user_id), activity_idx.get(r.activity_id)
+            if i is None or j is None:
+                continue
+            cells[i][j] = {
+                "best": float(r.best or 0),
+                "tries": int(r.tries),
+                "rank": int(r.rank),
+            }
+
+    n_students = len(students)
+    activity_rows = []
+    for j, a in enumerate(activities):
+        column = [row[j]["best"] for row in cells if row[j] is not None]
+        # sin max_points usamos el mejor puntaje del grupo como referencia
+        top = float(a.max_points or (max(column) if column else 0) or 100)
+        dist = [0] * len(BUCKETS)
+        for best in column:
+            pct = best * 100.0 / top
+            for k, (lo, hi) in enumerate(BUCKETS):
+                if lo <= pct < hi:
+                    dist[k] += 1
+                    break
+            else:
+                dist[-1 if pct >= 100 else 0] += 1
+        activity_rows.append({
+            "id": a.id,
+            "title": a.title,
+            "module_id": a.module_id,
+            "module_title": a.module_title,
+            "max_points": a.max_points,
+            "attempted": len(column),
+            "completion_pct": round(len(column) * 100.0 / n_students, 1) if n_students else 0.0,
+            "mean": round(sum(column) / len(column), 2) if column else None,
+            "distribution": dict(zip(BUCKET_LABELS, dist)),
+        })
+
+    n_activities = len(activities)
+    student_rows = []
+    for i, s in enumerate(students):
+        done = [c for c in cells[i] if c is not None]
+        student_rows.append({
+            "id": s.id,
+            "name": s.name,
+            "completed": len(done),
+            "completion_pct": round(len(done) * 100.0 / n_activities, 1) if n_activities else 0.0,
+            "total_best": round(sum(c["best"] for c in done), 2),
+            "cells": cells[i],
+        })
+
+    payload = {
+        "group_id": group_id,
+        "generated_at": datetime.utcnow().isoformat(timespec="seconds"),
+        "activities": activity_rows,
+        "students": student_rows,
+        "buckets": BUCKET_LABELS,
+        "completion_pct": (
+            round(sum(r["completed"] for r in student_rows) * 100.0 / (n_students * n_activities), 1)
+            if n_students and n_activities else 0.0
+        ),
+    }
+    return payload
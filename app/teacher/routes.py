@@ -1,4 +1,4 @@
-from flask import Blueprint, render_template, request, redirect, url_for, flash, abort
+from flask import Blueprint, render_template, request, redirect, url_for, flash, abort, jsonify, current_app
 from flask_login import login_required, current_user
 from app import db
 from app.models import Groups, ModuleAssignments, Missions
@@ -8,9 +8,17 @@ from json import loads as _json_loads
 import json
 
 from app.models import Modules, Activities, GameSettings
+from app import versions, scoring, identity
+from . import gradebook, autosave
 
 teacher_bp = Blueprint("teacher", __name__, template_folder="../templates/teacher")
 
+def _republish(module_id):
+    """Si el módulo está publicado, congela una versión nueva (cambió una actividad)."""
+    m = Modules.query.get(module_id) if module_id else None
+    if m and m.is_published:
+        versions.sync_publication(m)
+
 def _require_teacher():
     if current_user.role not in ("teacher", "admin"):
         abort(403)
@@ -83,6 +91,8 @@ def module_create():
     )
     db.session.add(m)
     db.session.commit()
+    if m.is_published:
+        versions.sync_publication(m)
     flash("Módulo creado. Ahora puedes editar su contenido.", "success")
     # 👉 en vez de volver al dashboard, abre el constructor visual:
     return redirect(url_for("teacher.module_builder", module_id=m.id))
@@ -107,6 +117,7 @@ def module_update(module_id):
     m.summary = request.form.get("summary") or None
 
     db.session.commit()
+    versions.sync_publication(m)
     flash("Module updated.", "success")
     return redirect(url_for("teacher.dashboard") + "#modules")
 
@@ -171,6 +182,7 @@ def activity_create():
     )
     db.session.add(a)
     db.session.commit()
+    _republish(a.module_id)
     flash("Activity created.", "success")
     return redirect(url_for("teacher.dashboard") + "#activities")
 
@@ -201,16 +213,45 @@ def activity_update(activity_id):
     a.default_xp   = _int_or(a.default_xp, "default_xp")
 
     db.session.commit()
+    _republish(a.module_id)
+    if request.form.get("rescore"):
+        job_id = scoring.start_rescore_job(current_app._get_current_object(), a.id, current_user.id)
+        flash(f"Activity updated. Re-calificando intentos (job {job_id}).", "success")
+        return redirect(url_for("teacher.dashboard", rescore_job=job_id) + "#activities")
     flash("Activity updated.", "success")
     return redirect(url_for("teacher.dashboard") + "#activities")
 
+
+@teacher_bp.post("/activities/<int:activity_id>/rescore", endpoint="activity_rescore")
+@login_required
+@teacher_required
+def activity_rescore(activity_id):
+    a = Activities.query.get_or_404(activity_id)
+    job_id = scoring.start_rescore_job(current_app._get_current_object(), a.id, current_user.id)
+    if request.accept_mimetypes.best == "application/json":
+        return jsonify(job_id=job_id, status_url=url_for("teacher.api_rescore_status", job_id=job_id)), 202
+    flash(f"Re-calificando intentos (job {job_id}).", "success")
+    return redirect(url_for("teacher.dashboard", rescore_job=job_id) + "#activities")
+
+
+@teacher_bp.get("/api/rescore/<job_id>", endpoint="api_rescore_status")
+@login_required
+@teacher_required
+def api_rescore_status(job_id):
+    st = scoring.job_status(job_id, current_user)  # solo el que lo pidió (o un admin)
+    if not st:
+        abort(404)
+    return jsonify(st)
+
 @teacher_bp.post("/activities/<int:activity_id>/delete")
 @login_required
 @teacher_required
 def activity_delete(activity_id):
     a = Activities.query.get_or_404(activity_id)
+    module_id = a.module_id
     db.session.delete(a)
     db.session.commit()
+    _republish(module_id)
     flash("Activity deleted.", "success")
     # back to dashboard, activities section
     return redirect(url_for("teacher.dashboard") + "#activities")
@@ -288,6 +329,7 @@ def group_add_student(group_id):
         return redirect(url_for("teacher.dashboard") + "#groups")
     db.session.add(GroupMembers(group_id=g.id, user_id=s.id))
     db.session.commit()
+    gradebook.invalidate_group(g.id)
     flash("Student added to group.", "success")
     return redirect(url_for("teacher.dashboard") + "#groups")
 
@@ -302,10 +344,63 @@ def group_remove_student(group_id):
     ).first()
     if gm:
         db.session.delete(gm); db.session.commit()
+        gradebook.invalidate_group(group_id)
         flash("Student removed.", "success")
     return redirect(url_for("teacher.dashboard") + "#groups")
 
 
+# Gradebook (HTML + JSON)
+def _owned_group_or_403(group_id):
+    g = Groups.query.get_or_404(group_id)
+    if current_user.role != "admin" and g.teacher_id != current_user.id:
+        abort(403)
+    return g
+
+
+@teacher_bp.get("/groups/<int:group_id>/gradebook", endpoint="group_gradebook")
+@login_required
+@teacher_required
+def group_gradebook(group_id):
+    g = _owned_group_or_403(group_id)
+    return render_template("teacher/gradebook.html", group=g, book=gradebook.group_gradebook(g.id))
+
+
+@teacher_bp.get("/api/groups/<int:group_id>/gradebook", endpoint="api_group_gradebook")
+@login_required
+@teacher_required
+def api_group_gradebook(group_id):
+    g = _owned_group_or_403(group_id)
+    return jsonify(gradebook.group_gradebook(g.id))
+
+
+# Export (streaming) de intentos de mis grupos
+@teacher_bp.get("/export/attempts", endpoint="export_attempts")
+@login_required
+@teacher_required
+def export_attempts():
+    from sqlalchemy import select
+    from app.export import attempts_select, apply_filters, stream_attempts
+    from app.models import Attempts
+
+    group_id = request.args.get("group_id", type=int)
+    members = select(GroupMembers.user_id).join(Groups, Groups.id == GroupMembers.group_id)
+    if group_id:
+        _owned_group_or_403(group_id)
+        members = members.where(Groups.id == group_id)
+    elif current_user.role != "admin":
+        members = members.where(Groups.teacher_id == current_user.id)
+
+    stmt = apply_filters(attempts_select(), request.args)
+    if group_id or current_user.role != "admin":
+        stmt = stmt.where(Attempts.user_id.in_(members))
+    return stream_attempts(
+        stmt,
+        fmt=(request.args.get("format") or "csv").lower(),
+        gzip=request.args.get("gzip") in ("1", "true", "on"),
+        filename=f"attempts_group{group_id}" if group_id else "attempts",
+    )
+
+
 # Assign / unassign modules
 @teacher_bp.post("/assignments/create")
 @login_required
@@ -317,6 +412,8 @@ def assign_module():
     ma = ModuleAssignments(group_id=target_id if target_type == "group" else None,
                            module_id=module_id)
     db.session.add(ma); db.session.commit()
+    if ma.group_id:
+        gradebook.invalidate_group(ma.group_id)
     flash("Module assigned.", "success")
     return redirect(url_for("teacher.dashboard") + "#groups")
 
@@ -327,6 +424,8 @@ def assign_module():
 def unassign_module(assign_id):
     ma = ModuleAssignments.query.get_or_404(assign_id)
     db.session.delete(ma); db.session.commit()
+    if ma.group_id:
+        gradebook.invalidate_group(ma.group_id)
     flash("Assignment removed.", "success")
     return redirect(url_for("teacher.dashboard") + "#groups")
 
@@ -376,6 +475,7 @@ def student_edit_stats(user_id):
 
     # 5) Save & go back
     db.session.commit()
+    identity.invalidate(student.id)
     flash("Student stats updated.", "success")
     return redirect(url_for("teacher.dashboard") + "#students")
 
@@ -424,6 +524,7 @@ def students_add_to_group():
 
     db.session.add(GroupMembers(group_id=g.id, user_id=s.id))
     db.session.commit()
+    gradebook.invalidate_group(g.id)
     flash("Student added to group.", "success")
     return redirect(url_for("teacher.students_list"))
 
@@ -451,6 +552,7 @@ def activities_builder(module_id):
         )
         db.session.add(a)
         db.session.commit()
+        _republish(m.id)
         flash("MCQ game created.", "success")
         return redirect(url_for("teacher.activities_builder", module_id=m.id))
     return render_template("teacher/activity_builder.html", module=m)
@@ -505,10 +607,16 @@ def module_builder(module_id):
         m.xp_reward = request.form.get("xp_reward", type=int)
         m.is_published = bool(request.form.get("is_published"))
 
-        # JSON construido por el UI
+        # JSON construido por el UI (rechaza si otro guardado llegó antes)
+        if _stale_content_version(m):
+            db.session.rollback()
+            flash("El módulo fue modificado en otra pestaña. Recarga antes de guardar.", "error")
+            return redirect(url_for("teacher.module_builder", module_id=m.id))
         m.content_json = request.form.get("content_json") or "{}"
+        m.content_version = (m.content_version or 0) + 1
 
         db.session.commit()
+        versions.sync_publication(m)
         flash("Módulo guardado.", "success")
         # te dejo en el mismo builder
         return redirect(url_for("teacher.module_builder", module_id=m.id))
@@ -520,6 +628,31 @@ def module_builder(module_id):
     )
 
 
+def _stale_content_version(m):
+    """True si el form trae un content_version distinto al guardado."""
+    sent = request.form.get("content_version", type=int)
+    return sent is not None and sent != (m.content_version or 0)
+
+
+@teacher_bp.post("/api/modules/<int:module_id>/autosave", endpoint="module_autosave")
+@login_required
+@teacher_required
+def module_autosave(module_id):
+    """Guarda deltas JSON-Patch de content_json: {"version": n, "ops": [...]}."""
+    m = Modules.query.get_or_404(module_id)
+    data = request.get_json(silent=True) or {}
+    base = data.get("version")
+    if not isinstance(base, int):
+        return jsonify(msg="version requerida"), 400
+    try:
+        version = autosave.autosave_module(m, base, data.get("ops") or [])
+    except autosave.VersionConflict as e:
+        return jsonify(msg="conflicto de versión", version=e.current_version), 409
+    except autosave.PatchError as e:
+        return jsonify(msg=str(e), version=m.content_version or 0), 400
+    return jsonify(version=version)
+
+
 @teacher_bp.get("/modules/new", endpoint="module_new")
 @login_required
 @teacher_required
@@ -563,9 +696,15 @@ def module_edit(module_id):
         # viene del hidden <input id="content-json">
         raw_json = request.form.get("content_json")
         if raw_json:
+            if _stale_content_version(m):
+                db.session.rollback()
+                flash("El módulo fue modificado en otra pestaña. Recarga antes de guardar.", "error")
+                return redirect(url_for("teacher.module_edit", module_id=m.id))
             m.content_json = raw_json
+            m.content_version = (m.content_version or 0) + 1
 
         db.session.commit()
+        versions.sync_publication(m)
         flash("Módulo actualizado.", "success")
         return redirect(url_for("teacher.dashboard") + "#modules")
 
@@ -0,0 +1,179 @@
+"""
+Versiones publicadas (inmutables) de módulos + helpers de caché HTTP.
+
+Al publicar, el módulo y sus actividades publicadas se congelan en una fila
+de `module_versions` identificada por el hash de su contenido. Las vistas de
+estudiante leen esa foto (parseada una sola vez y cacheada en memoria), así
+que siguen viendo la misma versión mientras el profesor edita el borrador, y
+pueden contestar `If-None-Match` con 304 antes de parsear o renderizar nada.
+"""
+import hashlib
+import json
+from types import SimpleNamespace
+
+from flask import request, make_response, session as flask_session
+from flask_wtf.csrf import generate_csrf
+from sqlalchemy.exc import IntegrityError
+
+from . import db
+from .cache import TTLCache
+from .models import Modules, Activities, ModuleVersions
+
+# version_id -> snapshot parseado (las versiones nunca cambian)
+_snapshots = TTLCache(ttl=3600, maxsize=2048)
+
+
+def normalize_sections(raw) -> list:
+    """Secciones del builder listas para la plantilla (checklist: un ítem por línea)."""
+    sections = raw.get("sections", []) if isinstance(raw, dict) else []
+    out = []
+    for sec in sections:
+        if not isinstance(sec, dict):
+            continue
+        sec = dict(sec)
+        if sec.get("type") == "checklist":
+            items = []
+            for it in sec.get("items") or []:
+                if isinstance(it, str):
+                    items.extend(line.strip() for line in it.splitlines() if line.strip())
+                else:
+                    items.append(str(it))
+            sec["items"] = items
+        out.append(sec)
+    return out
+
+
+def _loads(raw):
+    if not raw:
+        return {}
+    try:
+        return json.loads(raw)
+    except Exception:
+        return {}
+
+
+def snapshot_module(m: Modules) -> dict:
+    activities = (
+        Activities.query
+        .filter_by(module_id=m.id, is_published=True)
+        .order_by(Activities.position.asc(), Activities.id.asc())
+        .all()
+    )
+    return {
+        "module": {
+            "id": m.id, "title": m.title, "summary": m.summary,
+            "level": m.level, "xp_reward": m.xp_reward,
+        },
+        "sections": normalize_sections(_loads(m.content_json)),
+        "activities": [
+            {
+                "id": a.id, "module_id": a.module_id, "title": a.title, "type": a.type,
+                "position": a.position, "max_points": a.max_points,
+                "attempt_limit": a.attempt_limit, "default_xp": a.default_xp,
+                "content": _loads(a.content_json),
+            }
+            for a in activities
+        ],
+    }
+
+
+def publish_module(m: Modules) -> ModuleVersions:
+    """Congela el estado actual; si ya existe una versión idéntica la reutiliza."""
+    snap = snapshot_module(m)
+    blob = json.dumps(snap, sort_keys=True, separators=(",", ":"), ensure_ascii=False)
+    digest = hashlib.sha256(blob.encode("utf-8")).hexdigest()
+
+    q = ModuleVersions.query.filter_by(module_id=m.id, content_hash=digest)
+    v = q.first()
+    if not v:
+        try:
+            with db.session.begin_nested():  # SAVEPOINT: un choque no tumba la transacción del llamador
+                v = ModuleVersions(module_id=m.id, content_hash=digest, snapshot_json=blob)
+                db.session.add(v)
+        except IntegrityError:
+            # otro worker insertó la misma versión entre el SELECT y el INSERT
+            v = q.one()
+    m.published_version_id = v.id
+    return v
+
+
+def publish_missing() -> int:
+    """Publica los módulos publicados que aún no tienen versión (datos viejos)."""
+    pending = Modules.query.filter(
+        Modules.is_published.is_(True), Modules.published_version_id.is_(None)
+    ).all()
+    for m in pending:
+        publish_module(m)
+    db.session.commit()
+    return len(pending)
+
+
+def sync_publication(m: Modules, commit: bool = True) -> None:
+    """Publica una versión nueva si el módulo está publicado; si no, quita el puntero."""
+    if m is None:
+        return
+    if m.is_published:
+        publish_module(m)
+    else:
+        m.published_version_id = None
+    if commit:
+        db.session.commit()
+
+
+def get_version(version_id: int):
+    """Snapshot parseado de una versión, o None."""
+    def load():
+        v = db.session.get(ModuleVersions, version_id)
+        if not v:
+            return None
+        snap = json.loads(v.snapshot_json)
+        snap["version_id"] = v.id
+        snap["hash"] = v.content_hash
+        snap["created_at"] = v.created_at
+        snap["activities_by_id"] = {a["id"]: a for a in snap["activities"]}
+        return snap
+    return _snapshots.get_or_set(version_id, load)
+
+
+def published_snapshot(m: Modules):
+    """
+    Versión publicada vigente del módulo, o None si no tiene (sin publicar, o
+    publicado antes de que existieran las versiones y sin `flask
+    publish-modules`): el llamador muestra el borrador en vivo. Solo lee; las
+    vistas de estudiante son GET y pueden ir a la réplica.
+    """
+    if m is None or not m.is_published or not m.published_version_id:
+        return None
+    return get_version(m.published_version_id)
+
+
+def as_view(d: dict):
+    """Acceso por atributo (a.title) para las plantillas."""
+    return SimpleNamespace(**d)
+
+
+def etag_for(*parts) -> str:
+    """ETag fuerte: versión publicada + todo lo del usuario que pinta la página."""
+    # los formularios llevan un token CSRF firmado a partir del token crudo de
+    # la sesión; se genera aquí para que exista antes del primer render
+    generate_csrf()
+    parts = parts + (flask_session.get("csrf_token"),)
+    return hashlib.sha1(repr(parts).encode("utf-8")).hexdigest()
+
+
+def not_modified(etag: str, last_modified=None):
+    """Respuesta 304 si el cliente ya tiene esta representación; si no, None."""
+    if flask_session.get("_flashes"):
+        return None  # hay mensajes pendientes que la copia cacheada no muestra
+    if request.if_none_match and request.if_none_match.contains(etag):
+        resp = make_response("", 304)
+        return with_cache_headers(resp, etag, last_modified)
+    return None
+
+
+def with_cache_headers(resp, etag: str, last_modified=None):
+    resp.set_etag(etag)
+    if last_modified is not None:
+        resp.last_modified = last_modified
+    resp.headers["Cache-Control"] = "private, no-cache"
+    return resp
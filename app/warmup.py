@@ -0,0 +1,173 @@
+"""
+Warm-up del worker: lo que el primer request pagaría, se paga al arrancar.
+
+Sin esto, después de cada deploy o reciclado (max_requests) los primeros
+requests de cada worker compilan plantillas Jinja, importan los módulos que
+las vistas cargan a demanda, crean GameSettings, parsean las versiones
+publicadas de los módulos y abren conexiones a la BD: el p95 salta justo
+después de cada deploy.
+
+Pasos (cada uno mide su tiempo; si falla se registra y se sigue):
+  imports     módulos que las vistas importan adentro de la función
+  templates   todas las plantillas de app/templates compiladas
+  settings    GameSettings (la crea si falta)
+  catalog     módulos publicados: snapshot parseado en `versions._snapshots`
+  revocation  filtro de Bloom de tokens revocados
+  pool        abre pool_size conexiones por engine y las devuelve al pool
+
+Con gunicorn y preload, el master corre los pasos de memoria (los workers
+los heredan con el fork) y cada worker abre su pool en post_fork; sin
+preload, cada worker corre todo (ver gunicorn.conf.py). GET /healthz/ready
+devuelve este estado: 503 hasta que el worker terminó el warm-up y pudo
+leer la BD. Con un servidor que no corre el warm-up al arrancar (`flask run`),
+el primer GET /healthz/ready lo corre (`run_once`).
+"""
+import importlib
+import os
+import threading
+import time
+from datetime import datetime
+
+from flask import current_app
+
+LAZY_MODULES = (
+    "app.admin.browser",
+    "app.admin.bulk",
+    "app.export",
+    "app.teacher.gradebook",
+    "app.scoring",
+    "app.presence",
+    "app.ratelimit",
+    "app.revocation",
+)
+
+MEMORY_STEPS = ("imports", "templates", "settings", "catalog", "revocation")
+ALL_STEPS = MEMORY_STEPS + ("pool",)
+
+# sin estos el worker no debería recibir tráfico
+REQUIRED_STEPS = ("settings", "pool")
+
+# estado por proceso (con preload, lo de MEMORY_STEPS viene del master)
+state = {
+    "ready": False,
+    "pid": None,
+    "started_at": None,
+    "finished_at": None,
+    "total_ms": 0.0,
+    "steps": {},
+}
+_once_lock = threading.Lock()
+
+
+def _imports():
+    for name in LAZY_MODULES:
+        importlib.import_module(name)
+    return len(LAZY_MODULES)
+
+
+def _templates():
+    app = current_app._get_current_object()
+    compiled, broken = 0, []
+    for name in app.jinja_env.list_templates(extensions=("html",)):
+        try:
+            app.jinja_env.get_template(name)
+            compiled += 1
+        except Exception:
+            # una plantilla rota falla en su request, no en el arranque
+            broken.append(name)
+            app.logger.warning("warm-up: no compila %s", name, exc_info=True)
+    return {"compiled": compiled, "broken": broken} if broken else compiled
+
+
+def _settings():
+    from .student.services import get_settings
+    get_settings()
+    return 1
+
+
+def _catalog():
+    from .models import Modules
+    from . import versions
+    modules = Modules.query.filter_by(is_published=True).all()
+    for m in modules:
+        versions.published_snapshot(m)
+    return len(modules)
+
+
+def _revocation():
+    from . import revocation
+    return revocation.rebuild().count
+
+
+def _pool():
+    from sqlalchemy.pool import QueuePool
+    from . import db, dbpool
+    opened = 0
+    for engine in db.engines.values():
+        pool = engine.pool
+        n = pool.size() if isinstance(pool, QueuePool) else 1
+        conns = []
+        try:
+            for _ in range(n):
+                conn = engine.connect()
+                conns.append(conn)
+                conn.exec_driver_sql("SELECT 1")
+        finally:
+            for conn in conns:
+                conn.close()
+        opened += len(conns)
+        if hasattr(pool, "metrics"):
+            # los checkouts del warm-up no son tráfico
+            pool.metrics = dbpool.PoolMetrics()
+    return opened
+
+
+_STEPS = {
+    "imports": _imports,
+    "templates": _templates,
+    "settings": _settings,
+    "catalog": _catalog,
+    "revocation": _revocation,
+    "pool": _pool,
+}
+
+
+def run(app, steps=ALL_STEPS, final: bool = True) -> dict:
+    """
+    Corre los pasos pedidos dentro de un app context y los suma a `state`.
+    Con `final`, marca el proceso como listo si los REQUIRED_STEPS salieron bien.
+    """
+    from . import db
+    if state["started_at"] is None:
+        state["started_at"] = datetime.utcnow().isoformat() + "Z"
+    with app.app_context():
+        for name in steps:
+            t0 = time.perf_counter()
+            try:
+                result = {"ok": True, "result": _STEPS[name]()}
+            except Exception as e:
+                db.session.rollback()
+                app.logger.warning("warm-up: falló %s", name, exc_info=True)
+                result = {"ok": False, "error": f"{type(e).__name__}: {e}"}
+            result["ms"] = round(1000 * (time.perf_counter() - t0), 1)
+            state["steps"][name] = result
+        db.session.remove()
+
+    state["total_ms"] = round(sum(s["ms"] for s in state["steps"].values()), 1)
+    if final:
+        state["pid"] = os.getpid()
+        state["finished_at"] = datetime.utcnow().isoformat() + "Z"
+        state["ready"] = all(state["steps"].get(n, {}).get("ok") for n in REQUIRED_STEPS)
+        log = app.logger.info if state["ready"] else app.logger.error
+        log("warm-up %s en %.0f ms (pid %d)", "listo" if state["ready"] else "incompleto",
+            state["total_ms"], state["pid"])
+    return state
+
+
+
+def run_once(app) -> dict:
+    """Corre el warm-up completo si nadie lo empezó en este proceso."""
+    with _once_lock:
+        if state["started_at"] is None:
+            run(app)
+    return state
@@ -0,0 +1,408 @@
+# bench_domain.py
+"""
+Benchmarks en proceso de los caminos calientes del dominio, sin servidor ni
+red: calificación de quizzes (la de play_activity), subida de nivel,
+evaluación de misiones, normalización de secciones de módulos, los datos y
+los planes de consulta del dashboard, y el render de los dashboards de
+estudiante y profesor.
+
+Corre sobre un dataset de `app/synthetic.py` en SQLite. La primera vez se
+genera en DATASET (seed demo + `generate(SCALE, SEED)`) y se reutiliza; cada
+corrida trabaja sobre una copia, así los casos que escriben (misiones,
+intentos) arrancan siempre del mismo estado y las corridas son comparables.
+
+Cada caso corre WARMUP veces sin medir y después N veces (ITERATIONS por el
+factor del caso); se reportan p50 / p95 / media en microsegundos y ops/s.
+Si hay un baseline, se compara el p50 de cada caso: más de THRESHOLD por
+encima (y más de MIN_DELTA_US, para no saltar por ruido en casos de pocos
+µs) es una regresión. Un plan del dashboard con seq scan también cuenta.
+
+Env vars (todas opcionales):
+  SCALE          default: 1        (unidades de synthetic.py)
+  SEED           default: 42
+  DATASET        default: bench/domain/dataset_s<SCALE>_seed<SEED>.db
+  ITERATIONS     default: 200
+  WARMUP         default: 20
+  CASES          default: (todos)  (comma-separated; ver CASES)
+  OUT_DIR        default: bench/domain
+  BASELINE       default: latest   (último <OUT_DIR>/*.json con la misma
+                                    SCALE/SEED; "none" o un path)
+  THRESHOLD      default: 0.25     (p50 25% más lento = regresión)
+  MIN_DELTA_US   default: 20
+
+Salida: <OUT_DIR>/<timestamp>.json y una tabla en stdout. Sale con 1 si hay
+regresiones (para CI).
+
+Ejemplo:
+  python bench_domain.py                       # baseline
+  THRESHOLD=0.15 python bench_domain.py        # compara contra el anterior
+"""
+
+import glob
+import json
+import os
+import random
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+# la app lee DATABASE_URL (y .env) al importar la config: que no apunte a otra base
+os.environ["DATABASE_URL"] = "sqlite://"
+
+from flask import template_rendered  # noqa: E402
+from flask_login import login_user  # noqa: E402
+
+from app import create_app, db  # noqa: E402
+from app.config import Config  # noqa: E402
+
+
+def _ts():
+    return datetime.now().strftime("%Y%m%d_%H%M%S")
+
+
+def _config(path):
+    return type("BenchConfig", (Config,), {
+        "SQLALCHEMY_DATABASE_URI": f"sqlite:///{os.path.abspath(path)}",
+        "SQLALCHEMY_BINDS": {},
+        "TESTING": True,
+        "WTF_CSRF_ENABLED": False,
+        "START_BACKGROUND_THREADS": False,
+    })
+
+
+def _build_dataset(path, scale, seed):
+    from app.seed import run_seed
+    from app.synthetic import generate
+    print(f"[domain] generando dataset scale={scale} seed={seed} en {path}")
+    tmp = path + ".tmp"
+    if os.path.exists(tmp):
+        os.remove(tmp)
+    app = create_app(_config(tmp), profile="cli")
+    with app.app_context():
+        db.create_all()
+        run_seed()
+        generate(scale, seed=seed)
+        db.session.remove()
+        db.engine.dispose()
+    os.replace(tmp, path)
+
+
+def _git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except Exception:
+        return None
+
+
+def _measure(fn, iterations, warmup):
+    for i in range(warmup):
+        fn(i)
+    samples = []
+    for i in range(warmup, warmup + iterations):
+        t0 = time.perf_counter()
+        fn(i)
+        samples.append(time.perf_counter() - t0)
+    samples.sort()
+    p95 = samples[min(len(samples) - 1, int(0.95 * len(samples)))]
+    mean = statistics.fmean(samples)
+    return {"n": len(samples), "p50_us": round(1e6 * statistics.median(samples), 1),
+            "p95_us": round(1e6 * p95, 1), "mean_us": round(1e6 * mean, 1),
+            "ops_s": round(1 / mean, 1) if mean else None}
+
+
+# --- datos compartidos por los casos ---
+class Ctx:
+    def __init__(self, app, rng):
+        from app.models import Activities, Missions, Modules, Users, ROLE_STUDENT, ROLE_TEACHER
+        from app.synthetic import EMAIL_DOMAIN
+        self.app, self.rng = app, rng
+        synthetic = Users.email.like(f"%@{EMAIL_DOMAIN}")
+        self.students = [u for (u,) in db.session.query(Users.id)
+                         .filter(synthetic, Users.role == ROLE_STUDENT).order_by(Users.id)]
+        self.teachers = [u for (u,) in db.session.query(Users.id)
+                         .filter(synthetic, Users.role == ROLE_TEACHER).order_by(Users.id)]
+        if not self.students or not self.teachers:
+            raise SystemExit("[domain] el dataset no tiene datos sintéticos; borrar DATASET y reintentar")
+        self.quizzes = [a for a in Activities.query.filter(Activities.type == "quiz").order_by(Activities.id)
+                        if json.loads(a.content_json or "{}").get("questions")]
+        self.modules = Modules.query.filter(Modules.content_json.isnot(None)).order_by(Modules.id).all()
+        self.missions = Missions.query.filter_by(is_active=True).count()
+
+    def student(self, i):
+        # un estudiante distinto por iteración: cada uno arranca "en frío"
+        return self.students[i % len(self.students)]
+
+
+def case_quiz_score(c):
+    """scoring.score_submission con la tabla de opciones ya armada (como play_activity)."""
+    from app import scoring
+    items = []
+    for a in c.quizzes[:200]:
+        content = json.loads(a.content_json)
+        table = scoring.option_table(content)
+        answers = {str(q): c.rng.choice(list(opts)) for q, opts in enumerate(table)}
+        items.append((a, content, answers, table))
+
+    def run(i):
+        a, content, answers, table = items[i % len(items)]
+        scoring.score_submission(a, content, answers, table)
+    return run, 10
+
+
+def case_quiz_score_cold(c):
+    """Lo mismo, parseando content_json y armando la tabla en cada envío."""
+    from app import scoring
+    items = []
+    for a in c.quizzes[:200]:
+        n = len(json.loads(a.content_json)["questions"])
+        items.append((a, {str(q): c.rng.choice("abcd") for q in range(n)}))
+
+    def run(i):
+        a, answers = items[i % len(items)]
+        scoring.score_submission(a, json.loads(a.content_json), answers)
+    return run, 10
+
+
+def case_quiz_submit(c):
+    """activity_context + submit_attempt: el POST de play_activity sin el request (escribe)."""
+    from app.models import Activities, GroupMembers, ModuleAssignments, Modules
+    from app.student import services
+    pairs = []
+    for uid in c.students[:2000]:
+        gids = [g for (g,) in db.session.query(GroupMembers.group_id).filter_by(user_id=uid)]
+        candidates = (Activities.query.join(Modules, Modules.id == Activities.module_id)
+                      .join(ModuleAssignments, ModuleAssignments.module_id == Modules.id)
+                      .filter(ModuleAssignments.group_id.in_(gids), Modules.level == 1)
+                      .order_by(Activities.id))
+        for a in candidates:
+            ctx = services.activity_context(a, uid)
+            if not ctx.locked and not ctx.blocked:
+                pairs.append((uid, a.id))  # un envío por estudiante: no llega al límite de intentos
+                break
+    if not pairs:
+        return None, 0
+
+    def run(i):
+        uid, aid = pairs[i % len(pairs)]
+        ctx = services.activity_context(db.session.get(Activities, aid), uid)
+        n = len(services.activity_content(ctx).get("questions", []))
+        services.submit_attempt(ctx, uid, {str(q): "abcd"[(i + q) % 4] for q in range(n)})
+    return run, 1
+
+
+def case_leveling(c):
+    """_apply_xp con varias subidas de nivel sobre un perfil en memoria."""
+    from types import SimpleNamespace
+    from app.student.services import _apply_xp, get_settings
+    s = get_settings()
+    gains = [c.rng.randrange(20, 2500) for _ in range(256)]
+
+    def run(i):
+        _apply_xp(SimpleNamespace(xp=i % 100, level=1 + i % 5), gains[i % len(gains)], s)
+    return run, 10
+
+
+def case_missions(c):
+    """evaluate_missions de un estudiante (crea el progreso que falte y hace commit)."""
+    from app.student.services import evaluate_missions
+
+    def run(i):
+        evaluate_missions(c.student(i))
+        db.session.expire_all()
+    return run, 1
+
+
+def case_sections(c):
+    """versions.normalize_sections sobre el content_json de los módulos."""
+    from app import versions
+    raws = [json.loads(m.content_json) for m in c.modules] or [{"sections": []}]
+
+    def run(i):
+        versions.normalize_sections(raws[i % len(raws)])
+    return run, 10
+
+
+def case_dashboard_data(c):
+    """services.dashboard_data: las consultas del dashboard del estudiante."""
+    from app.student.services import dashboard_data
+
+    def run(i):
+        dashboard_data(c.student(i))
+        db.session.expire_all()
+    return run, 1
+
+
+def _render_case(c, endpoint, path, user_id):
+    """Corre la vista una vez y devuelve un render del mismo template con el mismo contexto."""
+    from app.models import Users
+    seen = []
+
+    def record(sender, template, context, **extra):
+        seen.append((template, dict(context)))
+
+    rc = c.app.test_request_context(path)
+    rc.push()
+    c.cleanup.append(rc.pop)
+    login_user(db.session.get(Users, user_id))
+    with template_rendered.connected_to(record, c.app):
+        c.app.view_functions[endpoint]()
+    template, context = seen[-1]
+
+    def run(i):
+        template.render(context)
+    return run, 1
+
+
+def case_render_student(c):
+    """Render de student/dashboard.html con el contexto ya armado (sin consultas de la vista)."""
+    return _render_case(c, "student_ui.dashboard", "/student/dashboard", c.students[0])
+
+
+def case_render_teacher(c):
+    """Render de teacher/dashboard.html (módulos, grupos y roster del profesor)."""
+    return _render_case(c, "teacher.dashboard", "/teacher/dashboard", c.teachers[0])
+
+
+CASES = {
+    "quiz.score": case_quiz_score,
+    "quiz.score_cold": case_quiz_score_cold,
+    "quiz.submit": case_quiz_submit,
+    "leveling.apply_xp": case_leveling,
+    "missions.evaluate": case_missions,
+    "sections.normalize": case_sections,
+    "dashboard.data": case_dashboard_data,
+    "render.student_dashboard": case_render_student,
+    "render.teacher_dashboard": case_render_teacher,
+}
+
+
+def _plans():
+    from app.plans import check
+    t0 = time.perf_counter()
+    results = check()
+    return {"ms": round(1000 * (time.perf_counter() - t0), 1),
+            "queries": {r["name"]: {"ok": r["ok"], "skipped": r["skipped"], "seq_scans": r["seq_scans"]}
+                        for r in results}}
+
+
+def _baseline(spec, out_dir, scale, seed, current):
+    if spec.lower() == "none":
+        return None, None
+    if spec.lower() != "latest":
+        with open(spec) as f:
+            return spec, json.load(f)
+    for path in sorted(glob.glob(os.path.join(out_dir, "2*.json")), reverse=True):
+        if os.path.abspath(path) == os.path.abspath(current):
+            continue
+        with open(path) as f:
+            data = json.load(f)
+        if data["meta"]["scale"] == scale and data["meta"]["seed"] == seed:
+            return path, data
+    return None, None
+
+
+def _compare(result, base, threshold, min_delta_us):
+    regressions = []
+    for name, r in result["cases"].items():
+        b = (base or {}).get("cases", {}).get(name)
+        if not b:
+            r["baseline_p50_us"] = r["change_pct"] = None
+            continue
+        delta = r["p50_us"] - b["p50_us"]
+        r["baseline_p50_us"] = b["p50_us"]
+        r["change_pct"] = round(100.0 * delta / b["p50_us"], 1) if b["p50_us"] else None
+        if b["p50_us"] and delta > threshold * b["p50_us"] and delta > min_delta_us:
+            regressions.append(f"{name}: p50 {b['p50_us']} -> {r['p50_us']} µs (+{r['change_pct']}%)")
+    for name, q in result["plans"]["queries"].items():
+        if not q["ok"]:
+            regressions.append(f"plan {name}: seq scan en {', '.join(q['seq_scans'])}")
+    return regressions
+
+
+def main():
+    scale      = int(os.getenv("SCALE", "1"))
+    seed       = int(os.getenv("SEED", "42"))
+    out_dir    = os.getenv("OUT_DIR", os.path.join("bench", "domain"))
+    dataset    = os.getenv("DATASET", os.path.join(out_dir, f"dataset_s{scale}_seed{seed}.db"))
+    iterations = int(os.getenv("ITERATIONS", "200"))
+    warmup     = int(os.getenv("WARMUP", "20"))
+    only       = [c.strip() for c in os.getenv("CASES", "").split(",") if c.strip()]
+    threshold  = float(os.getenv("THRESHOLD", "0.25"))
+    min_delta  = float(os.getenv("MIN_DELTA_US", "20"))
+    unknown = [c for c in only if c not in CASES]
+    if unknown:
+        raise SystemExit(f"[domain] casos desconocidos: {', '.join(unknown)} (hay: {', '.join(CASES)})")
+    os.makedirs(out_dir, exist_ok=True)
+
+    if not os.path.exists(dataset):
+        _build_dataset(dataset, scale, seed)
+
+    work_dir = tempfile.mkdtemp(prefix="bench_domain_")
+    work = os.path.join(work_dir, "work.db")
+    shutil.copyfile(dataset, work)
+    app = create_app(_config(work))
+    out_path = os.path.join(out_dir, f"{_ts()}.json")
+    result = {"meta": {"timestamp": _ts(), "git_commit": _git_commit(), "python": sys.version.split()[0],
+                       "scale": scale, "seed": seed, "iterations": iterations, "warmup": warmup,
+                       "dataset": dataset},
+              "cases": {}}
+    try:
+        with app.app_context():
+            from app import warmup as app_warmup
+            app_warmup.run(app)
+            c = Ctx(app, random.Random(seed))
+            c.cleanup = []
+            for name, setup in CASES.items():
+                if only and name not in only:
+                    continue
+                fn, factor = setup(c)
+                if fn is None:
+                    print(f"[domain] {name}: sin datos, se omite")
+                    continue
+                n = max(1, iterations * factor)
+                print(f"[domain] {name} x{n}")
+                result["cases"][name] = _measure(fn, n, warmup)
+                for pop in reversed(c.cleanup):
+                    pop()
+                c.cleanup = []
+                db.session.rollback()
+            print("[domain] planes del dashboard (plans.check)")
+            result["plans"] = _plans()
+            db.session.remove()
+            db.engine.dispose()
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+    base_path, base = _baseline(os.getenv("BASELINE", "latest"), out_dir, scale, seed, out_path)
+    regressions = _compare(result, base, threshold, min_delta)
+    result["baseline"] = base_path
+    result["threshold"] = threshold
+    result["regressions"] = regressions
+    with open(out_path, "w") as f:
+        json.dump(result, f, indent=2)
+
+    lines = ["| caso | p50_us | p95_us | ops_s | baseline_p50_us | cambio_% |", "|---|---|---|---|---|---|"]
+    lines += [f"| {name} | {r['p50_us']} | {r['p95_us']} | {r['ops_s']} | "
+              f"{'-' if r['baseline_p50_us'] is None else r['baseline_p50_us']} | "
+              f"{'-' if r['change_pct'] is None else r['change_pct']} |"
+              for name, r in result["cases"].items()]
+    bad_plans = [n for n, q in result["plans"]["queries"].items() if not q["ok"]]
+    lines += ["", f"plans.check: {len(result['plans']['queries'])} consultas en {result['plans']['ms']} ms, "
+              + (f"con seq scan: {', '.join(bad_plans)}" if bad_plans else "sin seq scans")]
+    print()
+    print("\n".join(lines))
+    print(f"\n[domain] resultados en {out_path}" + (f" (baseline: {base_path})" if base_path else " (sin baseline)"))
+    if regressions:
+        print(f"[domain] REGRESIONES (umbral {threshold:.0%}):")
+        for r in regressions:
+            print(f"  - {r}")
+        raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,142 @@
+# bench_startup.py
+"""
+Mide el arranque: tiempo de import (python -X importtime), create_app con
+cada perfil ("web" / "cli") y el wall-clock de comandos `flask`, cada cosa en
+un proceso nuevo y REPEAT veces (se reporta la mediana).
+
+Los comandos `flask` se corren dos veces: con APP_PROFILE=web (como antes,
+toda la app) y sin APP_PROFILE (run.py elige "cli" para todo lo que no sea
+run/routes/shell; ver get_profile en app/config.py).
+
+Env vars (todas opcionales):
+  REPEAT       default: 5
+  COMMANDS     default: "seed --help;db --help"  (separados por ';')
+  TOP          default: 15   (módulos más lentos en el reporte de importtime)
+  OUT_DIR      default: bench/startup_<timestamp>
+
+DATABASE_URL y demás pasan tal cual; `db current` u otros comandos que tocan
+la BD se pueden agregar a COMMANDS si hay una base a mano.
+
+Salida: <OUT_DIR>/importtime.txt (crudo), startup.json y summary.md.
+
+Ejemplo:
+  REPEAT=10 COMMANDS="seed --help;db current" python bench_startup.py
+"""
+
+import json
+import os
+import shlex
+import statistics
+import subprocess
+import sys
+import time
+from datetime import datetime
+
+CREATE_APP = (
+    "import time; t0 = time.perf_counter(); "
+    "from app import create_app; from app.config import get_config; "
+    "t1 = time.perf_counter(); create_app(get_config(), profile={profile!r}); "
+    "t2 = time.perf_counter(); print(t1 - t0, t2 - t1)"
+)
+
+
+def _ts():
+    return datetime.now().strftime("%Y%m%d_%H%M%S")
+
+
+def _median_ms(values):
+    return round(1000 * statistics.median(values), 1) if values else None
+
+
+def _importtime(out_dir, top):
+    """`import app` con -X importtime: total y los módulos con más tiempo propio."""
+    proc = subprocess.run([sys.executable, "-X", "importtime", "-c", "import app"],
+                          capture_output=True, text=True)
+    raw = proc.stderr
+    with open(os.path.join(out_dir, "importtime.txt"), "w") as f:
+        f.write(raw)
+    rows = []
+    for line in raw.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, cum_us, name = line[len("import time:"):].split("|")
+        rows.append((name.strip(), int(self_us), int(cum_us)))
+    total = next((cum for name, _, cum in rows if name == "app"), None)
+    slowest = sorted(rows, key=lambda r: r[1], reverse=True)[:top]
+    return {
+        "import_app_ms": round(total / 1000, 1) if total else None,
+        "slowest_self_ms": [{"module": n, "self_ms": round(s / 1000, 1), "cumulative_ms": round(c / 1000, 1)}
+                            for n, s, c in slowest],
+    }
+
+
+def _create_app(profile, repeat):
+    imports, builds = [], []
+    for _ in range(repeat):
+        out = subprocess.run([sys.executable, "-c", CREATE_APP.format(profile=profile)],
+                             capture_output=True, text=True, check=True).stdout.split()
+        imports.append(float(out[0]))
+        builds.append(float(out[1]))
+    return {"import_ms": _median_ms(imports), "create_app_ms": _median_ms(builds),
+            "total_ms": _median_ms([a + b for a, b in zip(imports, builds)])}
+
+
+def _flask(command, profile, repeat):
+    env = dict(os.environ)
+    env.pop("APP_PROFILE", None)
+    if profile:
+        env["APP_PROFILE"] = profile
+    args = [sys.executable, "-m", "flask", "--app", "run.py"] + shlex.split(command)
+    times, rc = [], 0
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        rc = subprocess.run(args, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL).returncode
+        times.append(time.perf_counter() - t0)
+    return {"wall_ms": _median_ms(times), "exit_code": rc}
+
+
+def main():
+    repeat   = int(os.getenv("REPEAT", "5"))
+    commands = [c.strip() for c in os.getenv("COMMANDS", "seed --help;db --help").split(";") if c.strip()]
+    top      = int(os.getenv("TOP", "15"))
+    out_dir  = os.getenv("OUT_DIR", os.path.join("bench", f"startup_{_ts()}"))
+    os.makedirs(out_dir, exist_ok=True)
+
+    print("[startup] importtime de `import app`")
+    result = {"repeat": repeat, "python": sys.version.split()[0], "importtime": _importtime(out_dir, top)}
+
+    result["create_app"] = {}
+    for profile in ("web", "cli"):
+        print(f"[startup] create_app(profile={profile!r}) x{repeat}")
+        result["create_app"][profile] = _create_app(profile, repeat)
+
+    result["commands"] = []
+    for cmd in commands:
+        print(f"[startup] flask {cmd} x{repeat} (web / auto)")
+        web, auto = _flask(cmd, "web", repeat), _flask(cmd, None, repeat)
+        saved = round(100.0 * (web["wall_ms"] - auto["wall_ms"]) / web["wall_ms"], 1) if web["wall_ms"] else None
+        result["commands"].append({"command": cmd, "web": web, "auto": auto, "saved_pct": saved})
+
+    with open(os.path.join(out_dir, "startup.json"), "w") as f:
+        json.dump(result, f, indent=2)
+
+    ca = result["create_app"]
+    lines = [f"`import app`: {result['importtime']['import_app_ms']} ms (repeat={repeat}, medianas)", "",
+             "| perfil | import_ms | create_app_ms | total_ms |", "|---|---|---|---|"]
+    lines += [f"| {p} | {ca[p]['import_ms']} | {ca[p]['create_app_ms']} | {ca[p]['total_ms']} |" for p in ca]
+    lines += ["", "| comando | web_ms | auto_ms | ahorro_% |", "|---|---|---|---|"]
+    lines += [f"| flask {c['command']} | {c['web']['wall_ms']} | {c['auto']['wall_ms']} | {c['saved_pct']} |"
+              for c in result["commands"]]
+    lines += ["", "| módulo | self_ms | cumulative_ms |", "|---|---|---|"]
+    lines += [f"| {m['module']} | {m['self_ms']} | {m['cumulative_ms']} |"
+              for m in result["importtime"]["slowest_self_ms"]]
+    table = "\n".join(lines)
+    with open(os.path.join(out_dir, "summary.md"), "w") as f:
+        f.write(table + "\n")
+    print()
+    print(table)
+    print(f"\n[startup] resultados en {out_dir}")
+
+
+if __name__ == "__main__":
+    main()
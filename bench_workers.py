@@ -0,0 +1,172 @@
+# bench_workers.py
+"""
+Compara los modelos de worker de gunicorn (sync / gthread / gevent) con la
+misma carga de Locust, uno detrás del otro, y deja throughput y p95 lado a lado.
+
+Para cada modelo: levanta `gunicorn -c gunicorn.conf.py run:app` con
+GUNICORN_WORKER_CLASS=<modelo>, espera a que responda, corre Locust headless
+(locustfile.py) y lo apaga con SIGTERM (graceful).
+
+Env vars (todas opcionales):
+  MODELS           default: sync,gthread,gevent
+  BENCH_PORT       default: 8010
+  USERS            default: 100
+  SPAWN_RATE       default: 20
+  DURATION         default: 1m       (formato Locust)
+  TAGS             default: (unset)  (comma-separated, como run_locust.py)
+  LOCUSTFILE       default: locustfile.py
+  OUT_DIR          default: bench/<timestamp>
+  READY_PATH       default: /healthz/ready
+  READY_TIMEOUT    default: 60       (segundos esperando que gunicorn responda)
+  LOCUST_OPTS      default: (unset)  flags extra para locust
+
+El resto del entorno (WEB_CONCURRENCY, GUNICORN_THREADS, DATABASE_URL,
+APP_ENV, DB_POOL_SIZE...) pasa tal cual a gunicorn. Si todos los usuarios de
+Locust entran con la misma cuenta, subir LOGIN_RATE_ACCOUNT / LOGIN_RATE_IP
+(p. ej. "100000/60") para medir los workers y no el limitador de login.
+
+Salida: <OUT_DIR>/<modelo>_stats.csv (Locust) y <OUT_DIR>/summary.csv/.md.
+
+Ejemplo:
+  APP_ENV=production USERS=200 DURATION=2m MODELS=sync,gthread python bench_workers.py
+"""
+
+import csv
+import os
+import shlex
+import signal
+import subprocess
+import sys
+import time
+import urllib.request
+from datetime import datetime
+
+
+def _ts():
+    return datetime.now().strftime("%Y%m%d_%H%M%S")
+
+
+def _available(model):
+    if model != "gevent":
+        return True
+    return subprocess.run([sys.executable, "-c", "import gevent"], capture_output=True).returncode == 0
+
+
+def _wait_ready(url, timeout, proc):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        if proc.poll() is not None:
+            return False
+        try:
+            with urllib.request.urlopen(url, timeout=2) as r:
+                if r.status < 500:
+                    return True
+        except Exception:
+            time.sleep(0.5)
+    return False
+
+
+def _stop(proc, grace=35):
+    if proc.poll() is None:
+        proc.send_signal(signal.SIGTERM)
+        try:
+            proc.wait(timeout=grace)
+        except subprocess.TimeoutExpired:
+            proc.kill()
+            proc.wait()
+
+
+def _aggregated(stats_csv):
+    if not os.path.exists(stats_csv):
+        return None
+    with open(stats_csv, newline="") as f:
+        for row in csv.DictReader(f):
+            if row.get("Name") == "Aggregated":
+                return row
+    return None
+
+
+def main():
+    models      = [m.strip() for m in os.getenv("MODELS", "sync,gthread,gevent").split(",") if m.strip()]
+    port        = os.getenv("BENCH_PORT", "8010")
+    users       = os.getenv("USERS", "100")
+    spawn_rate  = os.getenv("SPAWN_RATE", "20")
+    duration    = os.getenv("DURATION", "1m")
+    tags        = os.getenv("TAGS", "").strip()
+    locustfile  = os.getenv("LOCUSTFILE", "locustfile.py")
+    out_dir     = os.getenv("OUT_DIR", os.path.join("bench", _ts()))
+    ready_path  = os.getenv("READY_PATH", "/healthz/ready")
+    ready_to    = float(os.getenv("READY_TIMEOUT", "60"))
+    locust_opts = os.getenv("LOCUST_OPTS", "").strip()
+
+    os.makedirs(out_dir, exist_ok=True)
+    host = f"http://127.0.0.1:{port}"
+    results = []
+
+    for model in models:
+        if not _available(model):
+            print(f"[{model}] omitido: gevent no está instalado (pip install gevent psycogreen)")
+            continue
+
+        env = dict(os.environ, GUNICORN_WORKER_CLASS=model, GUNICORN_BIND=f"127.0.0.1:{port}",
+                   GUNICORN_ACCESSLOG=os.getenv("GUNICORN_ACCESSLOG", ""))
+        log = open(os.path.join(out_dir, f"{model}_gunicorn.log"), "w")
+        server = subprocess.Popen(["gunicorn", "-c", "gunicorn.conf.py", "run:app"],
+                                  env=env, stdout=log, stderr=subprocess.STDOUT)
+        try:
+            if not _wait_ready(host + ready_path, ready_to, server):
+                print(f"[{model}] gunicorn no respondió; ver {log.name}")
+                continue
+
+            prefix = os.path.join(out_dir, model)
+            args = ["locust", "-f", locustfile, "--host", host, "--headless",
+                    "-u", users, "-r", spawn_rate, "-t", duration,
+                    "--csv", prefix, "--only-summary"]
+            for t in [t.strip() for t in tags.split(",") if t.strip()]:
+                args += ["--tags", t]
+            if locust_opts:
+                args += shlex.split(locust_opts)
+            print(f"[{model}] Running:", " ".join(shlex.quote(a) for a in args))
+            subprocess.call(args)
+        finally:
+            _stop(server)
+            log.close()
+
+        row = _aggregated(prefix + "_stats.csv")
+        if row is None:
+            print(f"[{model}] sin resultados de Locust")
+            continue
+        total = int(row["Request Count"] or 0)
+        fails = int(row["Failure Count"] or 0)
+        results.append({
+            "model": model,
+            "rps": round(float(row["Requests/s"] or 0), 1),
+            "p50_ms": row["50%"],
+            "p95_ms": row["95%"],
+            "p99_ms": row["99%"],
+            "requests": total,
+            "failures_pct": round(100.0 * fails / total, 2) if total else 0.0,
+        })
+
+    if not results:
+        print("Sin resultados.")
+        sys.exit(1)
+
+    cols = ["model", "rps", "p50_ms", "p95_ms", "p99_ms", "requests", "failures_pct"]
+    with open(os.path.join(out_dir, "summary.csv"), "w", newline="") as f:
+        w = csv.DictWriter(f, fieldnames=cols)
+        w.writeheader()
+        w.writerows(results)
+
+    lines = ["| " + " | ".join(cols) + " |", "|" + "---|" * len(cols)]
+    lines += ["| " + " | ".join(str(r[c]) for c in cols) + " |" for r in results]
+    table = "\n".join(lines)
+    with open(os.path.join(out_dir, "summary.md"), "w") as f:
+        f.write(f"users={users} spawn_rate={spawn_rate} duration={duration} tags={tags or '-'}\n\n{table}\n")
+    print()
+    print(table)
+    print(f"\n[cfg] resultados en {out_dir}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,129 @@
+# gunicorn.conf.py
+"""
+Configuración de gunicorn (Procfile: `gunicorn -c gunicorn.conf.py run:app`).
+
+Env vars (todas opcionales):
+  GUNICORN_WORKER_CLASS        sync | gthread | gevent        (default: gthread)
+  WEB_CONCURRENCY              workers        (default según el modelo y los CPUs)
+  GUNICORN_THREADS             hilos por worker con gthread   (default: 4)
+  GUNICORN_WORKER_CONNECTIONS  greenlets por worker con gevent (default: 100)
+  GUNICORN_PRELOAD             1 = carga la app en el master antes del fork (default: 1)
+  GUNICORN_TIMEOUT             s sin heartbeat antes de matar un worker (default: 30)
+  GUNICORN_GRACEFUL_TIMEOUT    s para terminar requests en curso al reciclar/apagar (default: 30)
+  GUNICORN_KEEPALIVE           s de keep-alive; > idle timeout del balanceador (default: 5)
+  GUNICORN_MAX_REQUESTS        recicla el worker tras N requests, 0 = nunca (default: 2000)
+  GUNICORN_MAX_REQUESTS_JITTER (default: 200)
+  GUNICORN_BIND / PORT         (default: 0.0.0.0:$PORT o 0.0.0.0:8000)
+
+Conexiones: cada worker tiene su pool (DB_POOL_SIZE + DB_MAX_OVERFLOW, ver
+ProductionConfig); workers × eso debe quedar bajo max_connections de Postgres.
+Con gthread, DB_POOL_SIZE >= GUNICORN_THREADS evita esperar conexión (ver
+/admin/api/db-pool). gevent necesita `pip install gevent psycogreen`.
+
+Varios workers (el default es más de uno): la app no asume que el siguiente
+request cae en el mismo proceso.
+  - Estado compartido en la BD: jobs de re-score y de lotes (`background_jobs`,
+    cualquier worker contesta el poll), revocación de JWT y presencia
+    (re-sincronizan cada JWT_REVOCATION_SYNC_SECONDS / PRESENCE_FLUSH_SECONDS),
+    e `invalidate_all` del gradebook y de la identidad (`cache_generations`,
+    llega a los demás workers en CACHE_SYNC_SECONDS). El gradebook de un
+    grupo además compara en cada lectura una marca de frescura de la BD.
+  - Por proceso: el resto de las cachés (perfil del usuario en la identidad,
+    snapshots de versiones) viven hasta su TTL en los otros workers; los
+    cambios de rol, nombre o borrado de usuarios usan `invalidate_all`;
+    los límites de login se multiplican por el número de workers; la marca
+    read-your-writes de la API JWT en la réplica es del worker que escribió.
+  - Un job corre en un hilo del worker que lo lanzó: si ese worker se recicla
+    (GUNICORN_MAX_REQUESTS, timeout) el job se corta y a los 10 min sin progreso se informa como error.
+WEB_CONCURRENCY=1 deja todo en un proceso.
+"""
+import multiprocessing
+import os
+
+worker_class = os.getenv("GUNICORN_WORKER_CLASS", "gthread").strip().lower()
+if worker_class not in ("sync", "gthread", "gevent"):
+    raise RuntimeError(f"GUNICORN_WORKER_CLASS inválido: {worker_class!r}")
+
+if worker_class == "gevent":
+    # antes de importar la app: con preload, los locks y sockets del master
+    # tienen que ser los de gevent (si no, un lock tomado durante I/O bloquea el worker)
+    from gevent import monkey
+    monkey.patch_all()
+
+# los hilos de fondo (reaper) arrancan en cada worker (post_fork), no en el master:
+# un hilo vivo al momento del fork puede dejar locks tomados en los hijos
+os.environ["START_BACKGROUND_THREADS"] = "0"
+
+_cpus = multiprocessing.cpu_count()
+_default_workers = {"sync": 2 * _cpus + 1, "gthread": _cpus + 1, "gevent": _cpus}[worker_class]
+
+bind = os.getenv("GUNICORN_BIND") or f"0.0.0.0:{os.getenv('PORT', '8000')}"
+workers = int(os.getenv("WEB_CONCURRENCY", str(_default_workers)))
+threads = int(os.getenv("GUNICORN_THREADS", "4")) if worker_class == "gthread" else 1
+worker_connections = int(os.getenv("GUNICORN_WORKER_CONNECTIONS", "100"))
+preload_app = os.getenv("GUNICORN_PRELOAD", "1") in ("1", "true", "True")
+
+# --- timeouts: un worker trabado se mata a los `timeout` s; al reciclar o en
+# SIGTERM cada worker tiene `graceful_timeout` s para terminar lo que tiene ---
+timeout = int(os.getenv("GUNICORN_TIMEOUT", "30"))
+graceful_timeout = int(os.getenv("GUNICORN_GRACEFUL_TIMEOUT", "30"))
+keepalive = int(os.getenv("GUNICORN_KEEPALIVE", "5"))
+max_requests = int(os.getenv("GUNICORN_MAX_REQUESTS", "2000"))
+max_requests_jitter = int(os.getenv("GUNICORN_MAX_REQUESTS_JITTER", "200"))
+
+# heartbeat en tmpfs: en contenedores /tmp puede estar en disco y trabar el worker
+if os.path.isdir("/dev/shm"):
+    worker_tmp_dir = "/dev/shm"
+
+accesslog = os.getenv("GUNICORN_ACCESSLOG", "-") or None  # "" = sin access log
+loglevel = os.getenv("GUNICORN_LOGLEVEL", "info")
+proc_name = "econquest"
+
+
+def when_ready(server):
+    # con preload la app ya está cargada en el master: los cachés en memoria se
+    # calientan una vez y los workers los heredan (copy-on-write)
+    if preload_app:
+        from app import warmup
+        st = warmup.run(server.app.wsgi(), warmup.MEMORY_STEPS, final=False)
+        server.log.info("app precargada y caliente en %.0f ms (%s, %d workers)", st["total_ms"], worker_class, workers)
+
+
+def post_fork(server, worker):
+    app = worker.app.wsgi()  # la del master con preload; si no, se carga acá
+    from app import db
+    with app.app_context():
+        # las conexiones abiertas en el master no se comparten entre procesos:
+        # se sueltan sin cerrarlas (close=False) y cada worker abre las suyas
+        for engine in db.engines.values():
+            engine.dispose(close=False)
+    from app import passwords
+    passwords.reset_after_fork()
+
+    if worker_class == "gevent":
+        try:
+            from psycogreen.gevent import patch_psycopg
+            patch_psycopg()  # sin esto psycopg2 bloquea todo el loop en cada consulta
+        except ImportError:
+            server.log.warning("gevent sin psycogreen: las consultas bloquean el worker")
+
+    # conexiones propias del worker (y todo lo demás si no hubo preload);
+    # hasta acá /healthz/ready responde 503
+    from app import warmup
+    warmup.run(app, ("pool",) if preload_app else warmup.ALL_STEPS)
+
+    if not app.testing:
+        from app.reaper import start_scheduler
+        start_scheduler(app)
+
+
+def worker_exit(server, worker):
+    # salida ordenada (reciclado por max_requests, HUP, SIGTERM)
+    try:
+        app = worker.app.wsgi()
+    except Exception:
+        return
+    with app.app_context():
+        from app import presence, passwords
+        presence.store.flush()  # last_seen pendientes a la BD
+        passwords.shutdown()
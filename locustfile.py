@@ -1,27 +1,87 @@
 # locustfile.py
 """
-EconQuest Locust test (resilient) con POST de actividad correcto.
-- Hace login por formulario (CSRF) y por JWT.
-- Para /student/activity/<id>:
-  GET (extrae csrf + radios q0,q1,...) -> POST con respuestas válidas.
+EconQuest Locust test: personas de estudiante, profesor y admin, cada usuario
+simulado con su propia cuenta.
+
+Personas (peso por defecto, como el tráfico real):
+  StudentUser  90  dashboard, módulo, actividad GET -> POST (formulario con
+                   CSRF) y la API JSON con JWT (dashboard, actividad, intento)
+  TeacherUser   9  dashboard, gradebook, guardados del builder (autosave
+                   JSON-Patch) y altas/bajas de estudiantes en sus grupos
+  AdminUser     1  dashboard, heartbeat (/admin/api/ping) y Data Browser
+
+Cuentas: el pool de `flask seed --scale N` (app/synthetic.py):
+estudiante{n}, profesor{n} y admin{n}@scale.econquest.test. Cada usuario toma
+la siguiente cuenta libre de su rol; si el pool no alcanza se reutilizan
+(con un aviso). Con POOL=0 todos entran como LOCUST_EMAIL (solo estudiantes,
+como antes). Con varios workers de Locust, POOL_WORKERS=<n> reparte el pool
+para que no repitan cuentas (cada worker usa su worker_index).
+
+Tiempos de espera por períodos de clase: el reloj se divide en períodos de
+PERIOD_SECONDS y los primeros BURST_SECONDS de cada uno (suena el timbre: todos
+abren el dashboard y la actividad) usan BURST_WAIT; el resto, CALM_WAIT. Los
+períodos van con el reloj de pared, así que las ráfagas coinciden entre workers.
+
+Todas las cuentas entran desde la IP de Locust: subir LOGIN_RATE_IP en el
+servidor (p. ej. "100000/60") para medir la app y no el limitador de login.
+
 Env:
-  ECONQUEST_HOST, LOCUST_EMAIL, LOCUST_PASSWORD
+  ECONQUEST_HOST      default: http://localhost:5000
+  POOL                default: 1
+  ACCOUNT_DOMAIN      default: scale.econquest.test
+  STUDENT_ACCOUNTS    default: 10000   (10000 por unidad de --scale)
+  TEACHER_ACCOUNTS    default: 100
+  ADMIN_ACCOUNTS      default: 3
+  STUDENT_PASSWORD, TEACHER_PASSWORD, ADMIN_PASSWORD  (las del seed)
+  POOL_WORKERS        default: 1
+  STUDENT_WEIGHT, TEACHER_WEIGHT, ADMIN_WEIGHT        default: 90, 9, 1
+  PERIOD_SECONDS      default: 300
+  BURST_SECONDS       default: 60
+  BURST_WAIT          default: 0.5,2   (segundos, min,max)
+  CALM_WAIT           default: 4,15
+  LOCUST_EMAIL, LOCUST_PASSWORD       (solo con POOL=0)
+
+Tags: ui, quiz, api, teacher, builder, roster, admin (TAGS en run_locust.py).
 """
 
+import itertools
 import os
 import re
 import random
+import time
 from bs4 import BeautifulSoup  # pip install beautifulsoup4
-from locust import HttpUser, task, between
+from locust import HttpUser, task, tag
 
 ECONQUEST_HOST = os.getenv("ECONQUEST_HOST", "http://localhost:5000")
 LOCUST_EMAIL = os.getenv("LOCUST_EMAIL", "student@econquest.local")
 LOCUST_PASSWORD = os.getenv("LOCUST_PASSWORD", "student123")
 
+POOL = os.getenv("POOL", "1").strip() not in ("0", "false", "False", "no")
+ACCOUNT_DOMAIN = os.getenv("ACCOUNT_DOMAIN", "scale.econquest.test")
+POOL_WORKERS = max(1, int(os.getenv("POOL_WORKERS", "1")))
+
+
+def _range(name, default):
+    lo, hi = (float(x) for x in os.getenv(name, default).split(","))
+    return lo, hi
+
+
+PERIOD_SECONDS = float(os.getenv("PERIOD_SECONDS", "300"))
+BURST_SECONDS = float(os.getenv("BURST_SECONDS", "60"))
+BURST_WAIT = _range("BURST_WAIT", "0.5,2")
+CALM_WAIT = _range("CALM_WAIT", "4,15")
+
 # Regex tolerantes para CSRF en formularios
 RE_CSRF_A = re.compile(r'name=["\']csrf_token["\'][^>]*value=["\']([^"\']+)["\']', re.I)
 RE_CSRF_B = re.compile(r'value=["\']([^"\']+)["\'][^>]*name=["\']csrf_token["\']', re.I)
 RE_ACTIVITY_LINK = re.compile(r'href="/student/activity/(\d+)"')
+RE_MODULE_LINK = re.compile(r'href="/student/module/(\d+)"')
+RE_TEACHER_MODULE = re.compile(r'href="/teacher/modules/(\d+)/edit"')
+RE_GRADEBOOK_LINK = re.compile(r'href="/teacher/groups/(\d+)/gradebook"')
+RE_CONTENT_VERSION = re.compile(r'id="content-version"[^>]*value="(\d+)"')
+RE_BEFORE_CURSOR = re.compile(r'before=(\d+)')
+ADMIN_MODELS = ("users", "attempts", "modules", "activities", "groups", "group_members", "auth_sessions")
+
 
 def extract_csrf(html: str):
     m = RE_CSRF_A.search(html) or RE_CSRF_B.search(html)
@@ -39,7 +99,6 @@ def extract_questions_and_csrf(html: str):
         token = extract_csrf(html)
 
     # Preguntas q0, q1...
-    # Tomamos la PRIMERA opción disponible por pregunta (rápido y suficiente para la prueba)
     answers = {}
     radios = soup.select('input[type="radio"][name^="q"]')
     if radios:
@@ -58,33 +117,99 @@ def extract_questions_and_csrf(html: str):
 
     return token, answers
 
+def extract_roster(html: str):
+    """[(group_id, student_id)] de los formularios "Quitar del grupo" del dashboard del profesor."""
+    soup = BeautifulSoup(html, "html.parser")
+    out = []
+    for form in soup.select('form[action*="/remove-student"]'):
+        m = re.search(r"/groups/(\d+)/remove-student", form.get("action", ""))
+        sid = form.select_one('input[name="student_id"]')
+        if m and sid and sid.get("value"):
+            out.append((m.group(1), sid["value"]))
+    return out
+
+
+# --- pool de cuentas ---
+class AccountPool:
+    """Reparte las cuentas sintéticas de un rol: una por usuario simulado."""
+
+    def __init__(self, prefix, size_env, default_size, password_env, default_password):
+        self.prefix = prefix
+        self.size = max(1, int(os.getenv(size_env, default_size)))
+        self.password = os.getenv(password_env, default_password)
+        self._next = itertools.count()
+        self._warned = False
+
+    def take(self, environment):
+        worker = getattr(environment.runner, "worker_index", 0) or 0
+        n = worker + next(self._next) * POOL_WORKERS
+        if n >= self.size:
+            if not self._warned:
+                print(f"[locust] pool de {self.prefix} agotado ({self.size} cuentas); se reutilizan")
+                self._warned = True
+            n %= self.size
+        return f"{self.prefix}{n + 1}@{ACCOUNT_DOMAIN}", self.password
+
+
+STUDENTS = AccountPool("estudiante", "STUDENT_ACCOUNTS", "10000", "STUDENT_PASSWORD", "student123")
+TEACHERS = AccountPool("profesor", "TEACHER_ACCOUNTS", "100", "TEACHER_PASSWORD", "teacher123")
+ADMINS = AccountPool("admin", "ADMIN_ACCOUNTS", "3", "ADMIN_PASSWORD", "admin123")
+
+
+def class_period_wait(user):
+    """Espera corta al inicio de cada período de clase, larga el resto."""
+    in_burst = (time.time() % PERIOD_SECONDS) < BURST_SECONDS
+    return random.uniform(*(BURST_WAIT if in_burst else CALM_WAIT))
+
+
 class EconQuestUser(HttpUser):
+    abstract = True
     host = ECONQUEST_HOST
-    wait_time = between(1, 3)
+    wait_time = class_period_wait
+    pool = None
 
-    token = None
     session_ok = False
 
     def on_start(self):
-        # 1) Intento de login por formulario (sesión Flask-Login)
+        if POOL and self.pool is not None:
+            self.email, self.password = self.pool.take(self.environment)
+        else:
+            self.email, self.password = LOCUST_EMAIL, LOCUST_PASSWORD
+        self.session_ok = self._form_login()
+
+    def _form_login(self) -> bool:
+        """Login por formulario (sesión Flask-Login); True si no volvió al login."""
         try:
             r = self.client.get("/auth/login", name="/auth/login (GET)", allow_redirects=True)
             csrf = extract_csrf(r.text)
-            if csrf:
-                payload = {"email": LOCUST_EMAIL, "password": LOCUST_PASSWORD, "csrf_token": csrf}
-                res = self.client.post("/auth/login", data=payload, name="/auth/login (POST)", allow_redirects=True)
-                if res.status_code in (200, 302):
-                    self.session_ok = True
-            else:
+            if not csrf:
                 print("[locust] CSRF no encontrado en /auth/login; se continúa sin cookie de sesión.")
+                return False
+            payload = {"email": self.email, "password": self.password, "csrf_token": csrf}
+            with self.client.post("/auth/login", data=payload, name="/auth/login (POST)",
+                                  allow_redirects=True, catch_response=True) as res:
+                if res.status_code == 200 and "/auth/login" not in res.url:
+                    return True
+                res.failure(f"login rechazado para {self.email} ({res.status_code})")
         except Exception as e:
             print(f"[locust] Excepción login formulario: {e}")
+        return False
+
+
+class StudentUser(EconQuestUser):
+    weight = int(os.getenv("STUDENT_WEIGHT", "90"))
+    pool = STUDENTS
+
+    token = None
 
-        # 2) JWT para /auth/api/*
+    def on_start(self):
+        super().on_start()
+        self.activity_ids, self.module_ids = [], []
+        # JWT para /api/* y /auth/api/*
         try:
             api = self.client.post(
                 "/auth/api/login",
-                json={"email": LOCUST_EMAIL, "password": LOCUST_PASSWORD},
+                json={"email": self.email, "password": self.password},
                 name="/auth/api/login"
             )
             if api.status_code == 200:
@@ -99,50 +224,44 @@ class EconQuestUser(HttpUser):
     def _auth_headers(self):
         return {"Authorization": f"Bearer {self.token}"} if self.token else {}
 
-    @task(2)
+    @tag("ui")
+    @task(1)
     def view_home(self):
         self.client.get("/", name="/")
 
-    @task(3)
+    @tag("ui")
+    @task(4)
     def view_student_dashboard(self):
-        if self.session_ok:
-            self.client.get("/student/dashboard", name="/student/dashboard")
-        else:
-            if self.token:
-                self.client.get("/auth/api/me", headers=self._auth_headers(), name="/auth/api/me (fallback)")
+        if not self.session_ok:
+            return
+        dash = self.client.get("/student/dashboard", name="/student/dashboard")
+        # las actividades y módulos asignados a su grupo
+        self.activity_ids = RE_ACTIVITY_LINK.findall(dash.text) or self.activity_ids
+        self.module_ids = RE_MODULE_LINK.findall(dash.text) or self.module_ids
 
-    @task(1)
-    def api_me(self):
-        if self.token:
-            self.client.get("/auth/api/me", headers=self._auth_headers(), name="/auth/api/me")
+    @tag("ui")
+    @task(2)
+    def view_module(self):
+        if self.session_ok and self.module_ids:
+            self.client.get(f"/student/module/{random.choice(self.module_ids)}", name="/student/module/<id>")
 
+    @tag("ui", "quiz")
     @task(3)
     def play_activity(self):
-        """Flujo completo GET->POST con CSRF y respuestas q*.
-           - intenta descubrir un activity_id desde el dashboard
-           - fallback a un ID fijo si no encuentra
-        """
+        """Flujo completo GET->POST con CSRF y respuestas q*, sobre una actividad del dashboard."""
         if not self.session_ok:
             return  # sin sesión de Flask-Login, el POST fallará por CSRF
-
-        # Descubrir una actividad desde el dashboard del alumno (si existe)
-        act_id = None
-        try:
-            dash = self.client.get("/student/dashboard", name="/student/dashboard (harvest)")
-            m = RE_ACTIVITY_LINK.findall(dash.text)
-            if m:
-                act_id = random.choice(m)  # elige una de las actividades listadas
-        except Exception:
-            pass
-
-        if not act_id:
-            act_id = "2"  # <- fallback; cambia si lo necesitas
+        if not self.activity_ids:
+            self.view_student_dashboard()
+        if not self.activity_ids:
+            return
+        act_id = random.choice(self.activity_ids)
 
         # GET actividad (para obtener csrf + radios q*)
         r = self.client.get(f"/student/activity/{act_id}", name="/student/activity/<id> (GET)")
         csrf, answers = extract_questions_and_csrf(r.text)
         if not csrf or not answers:
-            # evita 400 por datos incompletos
+            # sin formulario: límite de intentos o nivel; evita 400 por datos incompletos
             return
 
         answers["csrf_token"] = csrf
@@ -155,3 +274,142 @@ class EconQuestUser(HttpUser):
             name="/student/activity/<id> (POST)",
             allow_redirects=True
         )
+
+    @tag("api")
+    @task(2)
+    def api_dashboard(self):
+        if not self.token:
+            return
+        r = self.client.get("/api/student/dashboard", headers=self._auth_headers(), name="/api/student/dashboard")
+        if r.status_code == 200:
+            self.activity_ids = [str(a["id"]) for a in r.json().get("activities", [])] or self.activity_ids
+
+    @tag("api", "quiz")
+    @task(1)
+    def api_attempt(self):
+        """GET de la actividad por la API y POST del intento (409/403 = límite o nivel, esperado)."""
+        if not self.token or not self.activity_ids:
+            return
+        act_id = random.choice(self.activity_ids)
+        with self.client.get(f"/api/student/activities/{act_id}", headers=self._auth_headers(),
+                             name="/api/student/activities/<id>", catch_response=True) as r:
+            if r.status_code == 403:
+                r.success()  # gate por nivel
+        if r.status_code != 200 or r.json().get("blocked"):
+            return
+        questions = (r.json().get("content") or {}).get("questions") or []
+        answers = {str(q["index"]): random.choice(q["options"])["key"] for q in questions if q.get("options")}
+        with self.client.post(f"/api/student/activities/{act_id}/attempts", json={"answers": answers},
+                              headers=self._auth_headers(), name="/api/student/activities/<id>/attempts",
+                              catch_response=True) as res:
+            if res.status_code in (201, 403, 409):
+                res.success()
+
+    @tag("api")
+    @task(1)
+    def api_me(self):
+        if self.token:
+            self.client.get("/auth/api/me", headers=self._auth_headers(), name="/auth/api/me")
+
+
+class TeacherUser(EconQuestUser):
+    abstract = not POOL  # con POOL=0 solo corren estudiantes
+    weight = int(os.getenv("TEACHER_WEIGHT", "9"))
+    pool = TEACHERS
+
+    def on_start(self):
+        super().on_start()
+        self.module_ids, self.group_ids, self.roster = [], [], []
+        self.csrf = None
+
+    @tag("teacher")
+    @task(5)
+    def view_dashboard(self):
+        if not self.session_ok:
+            return
+        r = self.client.get("/teacher/dashboard", name="/teacher/dashboard")
+        self.module_ids = RE_TEACHER_MODULE.findall(r.text) or self.module_ids
+        self.group_ids = RE_GRADEBOOK_LINK.findall(r.text) or self.group_ids
+        self.roster = extract_roster(r.text) or self.roster
+        self.csrf = extract_csrf(r.text) or self.csrf
+
+    @tag("teacher")
+    @task(3)
+    def view_gradebook(self):
+        if self.session_ok and self.group_ids:
+            self.client.get(f"/teacher/groups/{random.choice(self.group_ids)}/gradebook",
+                            name="/teacher/groups/<id>/gradebook")
+
+    @tag("teacher", "builder")
+    @task(2)
+    def builder_save(self):
+        """Abre el builder y guarda un delta como el autosave del UI (409 = otro profesor guardó antes)."""
+        if not self.session_ok:
+            return
+        if not self.module_ids:
+            self.view_dashboard()
+        if not self.module_ids:
+            return
+        mid = random.choice(self.module_ids)
+        r = self.client.get(f"/teacher/modules/{mid}/builder", name="/teacher/modules/<id>/builder")
+        csrf, version = extract_csrf(r.text), RE_CONTENT_VERSION.search(r.text)
+        if not csrf or not version:
+            return
+        ops = [{"op": "add", "path": "/notes", "value": f"{self.email} {time.time():.0f}"}]
+        with self.client.post(f"/teacher/api/modules/{mid}/autosave",
+                              json={"version": int(version.group(1)), "ops": ops},
+                              headers={"X-CSRFToken": csrf}, name="/teacher/api/modules/<id>/autosave",
+                              catch_response=True) as res:
+            if res.status_code in (200, 409):
+                res.success()
+
+    @tag("teacher", "roster")
+    @task(1)
+    def roster_edit(self):
+        """Quita un estudiante de su grupo y lo vuelve a agregar (el roster queda igual)."""
+        if not self.session_ok or not self.roster or not self.csrf:
+            return
+        group_id, student_id = random.choice(self.roster)
+        data = {"student_id": student_id, "csrf_token": self.csrf}
+        self.client.post(f"/teacher/groups/{group_id}/remove-student", data=data,
+                         name="/teacher/groups/<id>/remove-student", allow_redirects=False)
+        self.client.post(f"/teacher/groups/{group_id}/add-student", data=data,
+                         name="/teacher/groups/<id>/add-student", allow_redirects=False)
+
+
+class AdminUser(EconQuestUser):
+    abstract = not POOL
+    weight = int(os.getenv("ADMIN_WEIGHT", "1"))
+    pool = ADMINS
+
+    def on_start(self):
+        super().on_start()
+        self.cursors = {}
+
+    @tag("admin")
+    @task(3)
+    def view_dashboard(self):
+        if self.session_ok:
+            self.client.get("/admin/dashboard", name="/admin/dashboard")
+
+    @tag("admin")
+    @task(6)
+    def ping(self):
+        # el layout de admin hace este POST cada 20 s mientras la pestaña está abierta
+        if self.session_ok:
+            self.client.post("/admin/api/ping", headers={"X-Requested-With": "fetch"}, name="/admin/api/ping")
+
+    @tag("admin")
+    @task(3)
+    def data_browser(self):
+        """Una tabla del Data Browser; a veces la página siguiente (keyset)."""
+        if not self.session_ok:
+            return
+        model = random.choice(ADMIN_MODELS)
+        cursor = self.cursors.get(model)
+        if cursor and random.random() < 0.5:
+            r = self.client.get(f"/admin/data/{model}?before={cursor}", name="/admin/data/<model>?before")
+        else:
+            r = self.client.get(f"/admin/data/{model}", name="/admin/data/<model>")
+        m = RE_BEFORE_CURSOR.search(r.text)
+        self.cursors[model] = m.group(1) if m else None
@@ -0,0 +1,44 @@
+"""module_versions + modules.published_version_id
+
+Revision ID: 8e41b6c0a3f7
+Revises: 5c0e7a4f2d91
+Create Date: 2026-10-19 11:40:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '8e41b6c0a3f7'
+down_revision = '5c0e7a4f2d91'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('module_versions',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('module_id', sa.Integer(), nullable=False),
+    sa.Column('content_hash', sa.String(length=64), nullable=False),
+    sa.Column('snapshot_json', sa.Text(), nullable=False),
+    sa.Column('created_at', sa.DateTime(), nullable=False),
+    sa.ForeignKeyConstraint(['module_id'], ['modules.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('id'),
+    sa.UniqueConstraint('module_id', 'content_hash', name='uq_module_versions_module_hash')
+    )
+    with op.batch_alter_table('module_versions', schema=None) as batch_op:
+        batch_op.create_index(batch_op.f('ix_module_versions_module_id'), ['module_id'], unique=False)
+
+    with op.batch_alter_table('modules', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('published_version_id', sa.Integer(), nullable=True))
+
+
+def downgrade():
+    with op.batch_alter_table('modules', schema=None) as batch_op:
+        batch_op.drop_column('published_version_id')
+
+    with op.batch_alter_table('module_versions', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_module_versions_module_id'))
+
+    op.drop_table('module_versions')
@@ -0,0 +1,52 @@
+"""background_jobs and cache_generations
+
+Revision ID: 9b3e5d7a1c42
+Revises: f2b7c94d1e08
+Create Date: 2026-10-19 19:30:00.000000
+
+Job state (rescore, bulk actions) and cache generations shared by all
+gunicorn workers.
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '9b3e5d7a1c42'
+down_revision = 'f2b7c94d1e08'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('background_jobs',
+    sa.Column('id', sa.String(length=32), nullable=False),
+    sa.Column('kind', sa.String(length=32), nullable=False),
+    sa.Column('requested_by', sa.Integer(), nullable=True),
+    sa.Column('state', sa.String(length=16), nullable=False),
+    sa.Column('params_json', sa.Text(), nullable=True),
+    sa.Column('stats_json', sa.Text(), nullable=True),
+    sa.Column('error', sa.Text(), nullable=True),
+    sa.Column('started_at', sa.DateTime(), nullable=False),
+    sa.Column('updated_at', sa.DateTime(), nullable=False),
+    sa.Column('finished_at', sa.DateTime(), nullable=True),
+    sa.PrimaryKeyConstraint('id')
+    )
+    with op.batch_alter_table('background_jobs', schema=None) as batch_op:
+        batch_op.create_index(batch_op.f('ix_background_jobs_requested_by'), ['requested_by'], unique=False)
+        batch_op.create_index(batch_op.f('ix_background_jobs_started_at'), ['started_at'], unique=False)
+
+    op.create_table('cache_generations',
+    sa.Column('name', sa.String(length=40), nullable=False),
+    sa.Column('value', sa.BigInteger(), nullable=False),
+    sa.PrimaryKeyConstraint('name')
+    )
+
+
+def downgrade():
+    op.drop_table('cache_generations')
+    with op.batch_alter_table('background_jobs', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_background_jobs_started_at'))
+        batch_op.drop_index(batch_op.f('ix_background_jobs_requested_by'))
+
+    op.drop_table('background_jobs')
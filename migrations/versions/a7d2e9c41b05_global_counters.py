@@ -0,0 +1,32 @@
+"""global_counters for the admin dashboard
+
+Revision ID: a7d2e9c41b05
+Revises: 8e41b6c0a3f7
+Create Date: 2026-10-19 13:05:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'a7d2e9c41b05'
+down_revision = '8e41b6c0a3f7'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('global_counters',
+    sa.Column('name', sa.String(length=40), nullable=False),
+    sa.Column('shard', sa.SmallInteger(), nullable=False),
+    sa.Column('value', sa.BigInteger(), nullable=False),
+    sa.PrimaryKeyConstraint('name', 'shard')
+    )
+    # la tabla arranca vacía: `flask counters-reconcile` (o el hilo de tareas
+    # periódicas, cada COUNTERS_RECONCILE_SECONDS) la llena con los conteos
+    # exactos; mientras tanto el dashboard muestra la estimación del catálogo
+
+
+def downgrade():
+    op.drop_table('global_counters')
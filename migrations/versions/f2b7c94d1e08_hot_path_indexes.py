@@ -0,0 +1,60 @@
+"""hot-path composite indexes
+
+Revision ID: f2b7c94d1e08
+Revises: c3f8a1d2e6b4
+Create Date: 2026-10-19 18:10:00.000000
+
+On PostgreSQL the indexes are built with CREATE INDEX CONCURRENTLY, outside
+the migration transaction, so writes to attempts/request_log keep going.
+A concurrent build that fails leaves an INVALID index behind: drop it with
+DROP INDEX CONCURRENTLY and run `flask db upgrade` again (if_not_exists
+skips the ones that are already there).
+
+Tables missing from the migration chain (mission_progress and request_log
+come from create_all in some environments) are skipped.
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'f2b7c94d1e08'
+down_revision = 'c3f8a1d2e6b4'
+branch_labels = None
+depends_on = None
+
+
+INDEXES = [
+    ('ix_attempts_user_activity', 'attempts', ['user_id', 'activity_id']),
+    ('ix_group_members_user_id', 'group_members', ['user_id']),
+    ('ix_group_members_group_user', 'group_members', ['group_id', 'user_id']),
+    ('ix_module_assignments_group_id', 'module_assignments', ['group_id']),
+    ('ix_mission_progress_user_mission', 'mission_progress', ['user_id', 'mission_id']),
+    ('ix_activities_module_published_position', 'activities', ['module_id', 'is_published', 'position']),
+    ('ix_request_log_path_created_at', 'request_log', ['path', 'created_at']),
+]
+
+
+def _existing(tables):
+    if op.get_context().as_sql:
+        return set(tables)  # offline --sql: nothing to inspect
+    return set(sa.inspect(op.get_bind()).get_table_names()) & set(tables)
+
+
+def upgrade():
+    with op.get_context().autocommit_block():
+        present = _existing(t for _, t, _ in INDEXES)
+        for name, table, columns in INDEXES:
+            if table not in present:
+                continue
+            op.create_index(name, table, columns, unique=False, if_not_exists=True,
+                            postgresql_concurrently=True)
+
+
+def downgrade():
+    with op.get_context().autocommit_block():
+        present = _existing(t for _, t, _ in INDEXES)
+        for name, table, _ in reversed(INDEXES):
+            if table not in present:
+                continue
+            op.drop_index(name, table_name=table, if_exists=True, postgresql_concurrently=True)
@@ -1,4 +1,7 @@
 from app import create_app
-app = create_app()
+from app.config import get_config, get_profile
+app = create_app(get_config(), profile=get_profile())
 if __name__ == "__main__":
+    from app import warmup
+    warmup.run(app)
     app.run(host="0.0.0.0", port=5000, debug=True)
@@ -14,8 +14,8 @@ Env vars (all optional):
   CSV_PREFIX       default: auto timestamped
   HTML_REPORT      default: auto timestamped
   LOCUSTFILE       default: locustfile.py
-  LOCUST_EMAIL     default: student@econquest.local
-  LOCUST_PASSWORD  default: student123
+  LOCUST_EMAIL     default: student@econquest.local  (only with POOL=0)
+  LOCUST_PASSWORD  default: student123               (only with POOL=0)
   STEP_LOAD        default: 0        (1 to enable --step-load)
   STEP_USERS       default: 50       (users added per step when STEP_LOAD=1)
   STEP_TIME        default: 30s      (duration per step when STEP_LOAD=1)